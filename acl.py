@@ -0,0 +1,124 @@
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from db import get_cursor
+
+COLLAB_DB = "collaborations.db"
+
+ACL_LIST_ENTRIES = int(os.environ.get("ACL_LIST_ENTRIES", "4096"))
+ACL_TASK_ENTRIES = int(os.environ.get("ACL_TASK_ENTRIES", "65536"))
+
+# what a user (by account id) may do in one list, creator is only set for task checks
+Access = namedtuple("Access", "list_id member owner creator")
+
+
+class CollabACL:
+    # list -> (owner, members) and task -> (list, creator), filled on first use.
+    # members are only ever added (there is no way to leave or delete a list) and a task
+    # never changes list or creator, so a cached entry can only be missing grants made by
+    # another worker: a "no" is always checked against the database before it is given
+    def __init__(self, max_lists=ACL_LIST_ENTRIES, max_tasks=ACL_TASK_ENTRIES):
+        self.max_lists = max_lists
+        self.max_tasks = max_tasks
+        self._lists = OrderedDict()
+        self._tasks = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, entries, key, value, limit):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > limit:
+            entries.popitem(last=False)
+
+    def _cached(self, entries, key):
+        with self._lock:
+            value = entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def _load_list(self, list_id):
+        with get_cursor(COLLAB_DB) as cursor:
+            cursor.execute("SELECT owner_id FROM collab_lists WHERE id = ?", (list_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            cursor.execute("SELECT user_id FROM collab_members WHERE list_id = ?", (list_id,))
+            entry = (row[0], frozenset(member for member, in cursor.fetchall()))
+        with self._lock:
+            self._remember(self._lists, list_id, entry, self.max_lists)
+        return entry
+
+    def _load_task(self, task_id):
+        with get_cursor(COLLAB_DB) as cursor:
+            cursor.execute("SELECT list_id, creator_id FROM collab_tasks WHERE id = ?", (task_id,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        self.task_created(task_id, row[0], row[1])
+        return tuple(row)
+
+    def for_list(self, user_id, list_id):
+        # None when the list does not exist
+        entry = self._cached(self._lists, list_id)
+        if entry is None or user_id not in entry[1]:
+            entry = self._load_list(list_id)
+            if entry is None:
+                return None
+        owner, members = entry
+        return Access(list_id, user_id in members, user_id == owner, False)
+
+    def for_task(self, user_id, task_id):
+        # None when the task does not exist (as far as this worker knows, see task_deleted)
+        task = self._cached(self._tasks, task_id) or self._load_task(task_id)
+        if task is None:
+            return None
+        list_id, creator_id = task
+        access = self.for_list(user_id, list_id)
+        if access is None:
+            return None
+        return access._replace(creator=user_id == creator_id)
+
+    def list_created(self, list_id, owner, members):
+        with self._lock:
+            self._remember(self._lists, list_id, (owner, frozenset(members)), self.max_lists)
+
+    def members_added(self, list_id, user_ids):
+        with self._lock:
+            entry = self._lists.get(list_id)
+            if entry is not None:
+                self._lists[list_id] = (entry[0], entry[1] | set(user_ids))
+
+    def task_created(self, task_id, list_id, creator_id):
+        with self._lock:
+            self._remember(self._tasks, task_id, (list_id, creator_id), self.max_tasks)
+
+    def task_deleted(self, task_id):
+        # another worker's delete is noticed when the write finds no row
+        with self._lock:
+            self._tasks.pop(task_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._lists.clear()
+            self._tasks.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "lists": len(self._lists),
+                "tasks": len(self._tasks),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+collab_acl = CollabACL()
@@ -1,9 +1,20 @@
 from flask import Flask, render_template, request, redirect, url_for, session, flash
 import sqlite3
-from werkzeug.security import generate_password_hash, check_password_hash
-from database import init_db, init_tasks_db, init_collaborations_db
+from db import get_cursor
+from cache import board_cache, user_cache, user_key, list_key
+from events import event_bus
+from http_cache import apply_cache_policy, static_url_defaults
+import assets
+import metrics
+import profiling
+import archive
+from hashing import HashingBusy, hash_password, verify_password, needs_rehash
+from database import init_all
 from personal_tasks import personal_bp
 from collaboration import collab_bp
+from sync import sync_bp
+from search import search_bp
+from due import due_bp
 from functools import wraps
 
 app = Flask(__name__)
@@ -11,11 +22,19 @@ app.secret_key = "supersecretkey"
 
 app.register_blueprint(personal_bp)
 app.register_blueprint(collab_bp)
+app.register_blueprint(sync_bp)
+app.register_blueprint(search_bp)
+app.register_blueprint(due_bp)
+
+# bring every database up to the current schema, also under gunicorn
+init_all()
 
 DB_NAME = "accounts.db"
 TASK_DB = "todo.db"
 COLLAB_DB = "collaborations.db"
 
+BUSY_ERROR = "The server is busy, please try again in a moment."
+
 def login_required(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
@@ -25,12 +44,21 @@ def login_required(f):
         return f(*args, **kwargs)
     return wrapper
 
+# auth pages stay no-store, board pages opt into ETags with @conditional,
+# static files are cached forever under their content-hashed URL
+app.url_defaults(static_url_defaults)
+assets.init_app(app)
+
+# registered before the other hooks so timing covers them, /metrics is prometheus text
+metrics.init_app(app)
+# opt-in cProfile/stack sampling of chosen endpoints, report at /admin/profiles
+profiling.init_app(app)
+# completed tasks move to the archive tables in the background, see archive.py
+archive.init_app(app)
+
 @app.after_request
-def add_no_cache_headers(response):
-    response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, private, post-check=0, pre-check=0"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
-    return response
+def add_cache_headers(response):
+    return apply_cache_policy(response)
 
 @app.before_request
 def check_sensitive_pages():
@@ -39,10 +67,31 @@ def check_sensitive_pages():
         flash("Session expired. Please log in again.")
         return redirect(url_for("login"))
 
+@app.before_request
+def load_user_id():
+    # tasks and lists are owned by account id, sessions from before that only carry the name
+    if "username" in session and "user_id" not in session:
+        user = user_cache.get(session["username"])
+        if not user:
+            session.clear()
+            return
+        session["user_id"] = user["id"]
+
 @app.route("/")
 def home():
     return redirect(url_for("login"))
 
+def upgrade_hash(user_id, old_hash, password):
+    # best effort: the password is already verified, a busy pool or a locked
+    # database only means the upgrade waits for the next login
+    try:
+        new_hash = hash_password(password)
+        with get_cursor(DB_NAME) as cursor:
+            cursor.execute("UPDATE accounts SET password = ? WHERE id = ? AND password = ?",
+                           (new_hash, user_id, old_hash))
+    except (HashingBusy, sqlite3.Error) as e:
+        app.logger.warning("password hash upgrade for account %s skipped: %s", user_id, e)
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     message = session.pop("message", None)
@@ -52,16 +101,22 @@ def login():
         username = request.form["username"]
         password = request.form["password"]
 
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT password FROM accounts WHERE username = ?", (username,))
+        with get_cursor(DB_NAME) as cursor:
+            cursor.execute("SELECT id, password FROM accounts WHERE username = ?", (username,))
             row = cursor.fetchone()
 
-        if row and check_password_hash(row[0], password):
-            session["username"] = username
-            return redirect(url_for("personal.profile"))
-        else:
-            error = "Invalid username or password."
+        try:
+            if row and verify_password(row[1], password):
+                # hashes made under older KDF settings are upgraded while we have the plaintext
+                if needs_rehash(row[1]):
+                    upgrade_hash(row[0], row[1], password)
+                session["username"] = username
+                session["user_id"] = row[0]
+                return redirect(url_for("personal.profile"))
+            else:
+                error = "Invalid username or password."
+        except HashingBusy:
+            return render_template("accounts.html", error=BUSY_ERROR, message=message), 503
 
     return render_template("accounts.html", error=error, message=message)
 
@@ -90,17 +145,19 @@ def register():
             error = "Please enter a valid email address."
             return render_template("register.html", message=message, error=error)
 
-        hashed_password = generate_password_hash(password)
-        hashed_security_question = generate_password_hash(security_question)
+        try:
+            hashed_password = hash_password(password)
+            hashed_security_question = hash_password(security_question)
+        except HashingBusy:
+            return render_template("register.html", message=message, error=BUSY_ERROR), 503
 
         try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
+            with get_cursor(DB_NAME) as cursor:
                 cursor.execute("""
                     INSERT INTO accounts (full_name, email, username, password, security_question)
                     VALUES (?, ?, ?, ?, ?)
                 """, (full_name, email, username, hashed_password, hashed_security_question))
-                conn.commit()
+            user_cache.invalidate(username)
             session["message"] = "Account created successfully! You can now log in."
             return redirect(url_for("login"))
         except sqlite3.IntegrityError:
@@ -121,11 +178,13 @@ def edit_password():
             error = "Password must be at least 8 characters long."
             return render_template("editpassword.html", message=message, error=error)
 
-        hashed_password = generate_password_hash(new_password)
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
+        try:
+            hashed_password = hash_password(new_password)
+        except HashingBusy:
+            return render_template("editpassword.html", username=username, message=message, error=BUSY_ERROR), 503
+        with get_cursor(DB_NAME) as cursor:
             cursor.execute("UPDATE accounts SET password = ? WHERE username = ?", (hashed_password, username))
-            conn.commit()
+        user_cache.invalidate(username)
 
         session.clear()
         session["message"] = "Password updated successfully! Please login again."
@@ -140,8 +199,7 @@ def forgot_password():
         username = request.form["username"]
         answer = request.form["securityQuestion"]
 
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
+        with get_cursor(DB_NAME) as cursor:
             cursor.execute("SELECT security_question FROM accounts WHERE username = ?", (username,))
             row = cursor.fetchone()
 
@@ -149,7 +207,12 @@ def forgot_password():
             error = "User not found."
             return render_template("forgotpassword.html", error=error)
 
-        if check_password_hash(row[0], answer):
+        try:
+            correct = verify_password(row[0], answer)
+        except HashingBusy:
+            return render_template("forgotpassword.html", error=BUSY_ERROR), 503
+
+        if correct:
             flash("Security answer correct. Please set your new password.")
             return redirect(url_for("edit_password"))
         else:
@@ -163,42 +226,53 @@ def edit_profile():
     message = None
     error = None
     username = session["username"]
+    user_id = session["user_id"]
 
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT full_name, email, username FROM accounts WHERE username = ?", (username,))
-        user = cursor.fetchone()
-
-    if not user:
+    user_data = user_cache.get(username)
+    if not user_data:
         session.clear()
         flash("User not found.")
         return redirect(url_for("login"))
 
-    user_data = {"full_name": user[0], "email": user[1], "username": user[2]}
-
     if request.method == "POST":
         new_name = request.form["fullName"]
         new_username = request.form["username"]
         new_email = request.form["email"]
         new_password = request.form["password"]
 
+        hashed_password = None
+        if new_password.strip() != "":
+            if len(new_password) < 8:
+                error = "Password must be at least 8 characters long."
+                return render_template("editprofile.html", user=user_data, error=error, message=message)
+            # hash before opening the write transaction so it is not held during the KDF
+            try:
+                hashed_password = hash_password(new_password)
+            except HashingBusy:
+                return render_template("editprofile.html", user=user_data, error=BUSY_ERROR, message=message), 503
+
         try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                if new_password.strip() == "":
+            with get_cursor(DB_NAME) as cursor:
+                if hashed_password is None:
                     cursor.execute("""
-                        UPDATE accounts SET full_name=?, username=?, email=? WHERE username=?
-                    """, (new_name, new_username, new_email, username))
+                        UPDATE accounts SET full_name=?, username=?, email=? WHERE id=?
+                    """, (new_name, new_username, new_email, user_id))
                 else:
-                    if len(new_password) < 8:
-                        error = "Password must be at least 8 characters long."
-                        return render_template("editprofile.html", user=user_data, error=error, message=message)
-                    hashed_password = generate_password_hash(new_password)
                     cursor.execute("""
-                        UPDATE accounts SET full_name=?, username=?, email=?, password=? WHERE username=?
-                    """, (new_name, new_username, new_email, hashed_password, username))
-                conn.commit()
-
+                        UPDATE accounts SET full_name=?, username=?, email=?, password=? WHERE id=?
+                    """, (new_name, new_username, new_email, hashed_password, user_id))
+
+            # the sidebar on the cached board shows these details
+            user_cache.invalidate(username, new_username)
+            board_cache.bump(user_key(user_id))
+            if new_username != username:
+                # ownership is by id, only the names shown on the user's lists change
+                with get_cursor(COLLAB_DB) as cursor:
+                    cursor.execute("SELECT list_id FROM collab_members WHERE user_id = ?", (user_id,))
+                    list_ids = [row[0] for row in cursor.fetchall()]
+                for list_id in list_ids:
+                    board_cache.bump(list_key(list_id))
+                    event_bus.publish(list_key(list_id), "resync", {})
             session["username"] = new_username
             message = "Profile updated successfully!"
             user_data.update({"full_name": new_name, "email": new_email, "username": new_username})
@@ -209,7 +283,4 @@ def edit_profile():
     return render_template("editprofile.html", user=user_data, error=error, message=message)
 
 if __name__ == "__main__":
-    init_db()
-    init_tasks_db()
-    init_collaborations_db()
     app.run(debug=True)
@@ -0,0 +1,184 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from writes import write
+from cache import board_cache, user_key, list_key
+from events import event_bus
+from acl import collab_acl
+from boards import SCOPE_COLUMNS, PAGE_SIZE, encode_cursor, end_position, archive_sql, id_placeholders
+
+TASK_DB = "todo.db"
+COLLAB_DB = "collaborations.db"
+
+# completed tasks leave the board for {table}_archive in the same file once they have
+# been completed this long, so the board tables and their indexes only hold live work.
+# same file so a move is one transaction, it is never lost or doubled halfway
+ARCHIVE_AFTER_DAYS = float(os.environ.get("ARCHIVE_AFTER_DAYS", "30"))
+# seconds between runs of the background job in each worker, 0 turns it off
+ARCHIVE_INTERVAL = float(os.environ.get("ARCHIVE_INTERVAL", "3600"))
+# tasks moved per transaction, then the job idles for ARCHIVE_YIELD of the time it wrote
+# (like imports) so requests get the write lock in between
+ARCHIVE_CHUNK = max(1, int(os.environ.get("ARCHIVE_CHUNK", "200")))
+ARCHIVE_YIELD = 0.5
+
+DAY = 24 * 60 * 60
+NOW = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+# columns copied to the archive and back, the rest (status, position, rev) is the board's
+ARCHIVE_COLUMNS = {
+    "tasks": ("id", "user_id", "name", "priority", "date", "time", "completed_at"),
+    "collab_tasks": ("id", "list_id", "name", "priority", "date", "time", "creator_id", "created_at", "completed_at"),
+}
+
+# archived pages are newest completed first
+ARCHIVE_ORDER = ("completed_at", "id")
+
+logger = logging.getLogger(__name__)
+
+
+def archive_chunk(cursor, table, cutoff, limit=ARCHIVE_CHUNK):
+    # moves up to limit tasks completed before cutoff, returns their (id, scope value).
+    # the delete leaves tombstones, so synced clients drop them like deleted tasks
+    cursor.execute(archive_sql(table), (cutoff, limit))
+    rows = cursor.fetchall()
+    if not rows:
+        return rows
+
+    ids = [row[0] for row in rows]
+    columns = ", ".join(ARCHIVE_COLUMNS[table])
+    cursor.execute(f"""
+        INSERT INTO {table}_archive ({columns}, archived_at)
+        SELECT {columns}, {NOW} FROM {table} WHERE id IN ({id_placeholders(ids)})
+    """, ids)
+    cursor.execute(f"DELETE FROM {table} WHERE id IN ({id_placeholders(ids)})", ids)
+    return rows
+
+
+def archive_table(db_file, table, cutoff, after_chunk=None, chunk=ARCHIVE_CHUNK):
+    # one short transaction per chunk until nothing is left, returns how many were moved
+    archived = 0
+    while True:
+        started = time.perf_counter()
+        rows = write(db_file, lambda cursor: archive_chunk(cursor, table, cutoff, chunk))
+        archived += len(rows)
+        if rows and after_chunk:
+            after_chunk(rows)
+        if len(rows) < chunk:
+            return archived
+        time.sleep((time.perf_counter() - started) * ARCHIVE_YIELD)
+
+
+def _personal_archived(rows):
+    for user_id in {row[1] for row in rows}:
+        board_cache.bump(user_key(user_id))
+
+
+def _collab_archived(rows):
+    for task_id, _ in rows:
+        collab_acl.task_deleted(task_id)
+    for list_id in {row[1] for row in rows}:
+        board_cache.bump(list_key(list_id))
+        # one resync for open boards instead of an event per archived task
+        event_bus.publish(list_key(list_id), "resync", {})
+
+
+def archive_all(days=ARCHIVE_AFTER_DAYS, chunk=ARCHIVE_CHUNK, now=None):
+    cutoff = int((time.time() if now is None else now) - days * DAY)
+    return {
+        "tasks": archive_table(TASK_DB, "tasks", cutoff, _personal_archived, chunk),
+        "collab_tasks": archive_table(COLLAB_DB, "collab_tasks", cutoff, _collab_archived, chunk),
+    }
+
+
+def fetch_archived(cursor, table, columns, scope_value, after=None, limit=PAGE_SIZE):
+    # keyset pages like the boards, columns must include completed_at and id
+    sql = f"SELECT {columns} FROM {table}_archive WHERE {SCOPE_COLUMNS[table]} = ?"
+    args = [scope_value]
+    if after is not None:
+        sql += " AND (completed_at, id) < (?, ?)"
+        args.extend(after)
+    sql += " ORDER BY completed_at DESC, id DESC LIMIT ?"
+    args.append(limit + 1)
+
+    cursor.row_factory = sqlite3.Row
+    rows = cursor.execute(sql, args).fetchall()
+    next_cursor = encode_cursor(rows[limit - 1], ARCHIVE_ORDER) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def restore(cursor, table, task_id, scope_value, returning):
+    # back to the end of the completed column of its board, completed as of now so the
+    # job leaves it there for another ARCHIVE_AFTER_DAYS. None when it is not in that
+    # scope's archive, otherwise the restored row's `returning` columns
+    columns = ", ".join(column for column in ARCHIVE_COLUMNS[table] if column != "completed_at")
+    cursor.execute(f"""
+        INSERT INTO {table} ({columns}, status, position, completed_at)
+        SELECT {columns}, 'completed', {end_position(table)}, {NOW}
+        FROM {table}_archive WHERE id = ? AND {SCOPE_COLUMNS[table]} = ?
+        RETURNING {returning}
+    """, (scope_value, "completed", task_id, scope_value))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+
+    cursor.execute(f"DELETE FROM {table}_archive WHERE id = ?", (task_id,))
+    # clients that synced the archiving get it back as a change, not a change and a delete
+    cursor.execute(f"DELETE FROM {table}_deleted WHERE task_id = ?", (task_id,))
+    return row
+
+
+_started_pid = None
+_started_lock = threading.Lock()
+
+
+def _run():
+    while True:
+        try:
+            archive_all()
+        except Exception:
+            # e.g. the database stayed locked, the next run picks up where this one stopped
+            logger.exception("archiving completed tasks failed")
+        time.sleep(ARCHIVE_INTERVAL)
+
+
+def _start():
+    global _started_pid
+
+    # gunicorn forks workers after the app is imported, threads do not survive that,
+    # so each worker starts its own job with its first request
+    if _started_pid == os.getpid():
+        return
+    with _started_lock:
+        if _started_pid == os.getpid():
+            return
+        _started_pid = os.getpid()
+    threading.Thread(target=_run, daemon=True).start()
+
+
+def init_app(app):
+    if ARCHIVE_INTERVAL > 0:
+        app.before_request(_start)
+
+
+def main():
+    # python archive.py [--days 30]  ->  one run now, e.g. from cron with ARCHIVE_INTERVAL=0
+    parser = argparse.ArgumentParser(description="Move long completed tasks to the archive")
+    parser.add_argument("--days", type=float, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--chunk", type=int, default=ARCHIVE_CHUNK)
+    args = parser.parse_args()
+
+    from database import init_all
+
+    init_all()
+    started = time.perf_counter()
+    archived = archive_all(args.days, max(1, args.chunk))
+    print(f"Archived {archived['tasks']} tasks and {archived['collab_tasks']} collaboration tasks "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
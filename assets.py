@@ -0,0 +1,269 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from flask import request, send_from_directory, url_for
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST = os.path.join(DIST_DIR, "manifest.json")
+
+# same order base.html used to link them in
+CSS_FILES = [
+    "editprofile.css",
+    "style.css",
+    "collab.css",
+    "sidebar.css",
+    "collabview.css",
+    "addtask.css",
+    "register.css",
+    "login.css",
+]
+JS_ENTRY = "main.js"
+
+# variable fonts cover every weight the static TTFs ship separately
+FONTS = [
+    "Instrument Sans/InstrumentSans-VariableFont_wdth,wght.ttf",
+    "Instrument Sans/InstrumentSans-Italic-VariableFont_wdth,wght.ttf",
+]
+# basic latin, latin-1 and common punctuation
+FONT_UNICODES = "U+0000-00FF,U+0131,U+0152-0153,U+02C6,U+02DA,U+02DC,U+2000-206F,U+20AC,U+2122"
+
+COMPRESSIBLE = (".js", ".css", ".svg", ".json")
+
+
+def _hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+_IMPORT = re.compile(r"^import\s*\{([^}]*)\}\s*from\s*['\"]\./([\w.-]+)['\"];?\s*$", re.M)
+_EXPORT = re.compile(r"^export\s+(async\s+)?function\s+(\w+)", re.M)
+
+
+def _read_module(name, modules, order):
+    # post-order walk of the import graph, each module is listed once
+    if name in modules:
+        return
+    with open(os.path.join(STATIC_DIR, name), encoding="utf-8") as f:
+        source = f.read()
+
+    imports = [(m.group(2), [n.strip() for n in m.group(1).split(",") if n.strip()])
+               for m in _IMPORT.finditer(source)]
+    body = _IMPORT.sub("", source)
+    exports = [m.group(2) for m in _EXPORT.finditer(body)]
+    body = _EXPORT.sub(lambda m: f"{m.group(1) or ''}function {m.group(2)}", body)
+    if re.search(r"^\s*(import|export)\b", body, re.M):
+        raise ValueError(f"{name}: only 'import {{ ... }} from './x.js'' and 'export function' are supported")
+
+    modules[name] = (imports, exports, body)
+    for dependency, _ in imports:
+        _read_module(dependency, modules, order)
+    order.append(name)
+
+
+def bundle_js(entry=JS_ENTRY):
+    # every module keeps its own scope. imports become hoisted forwarding
+    # functions, so circular imports (taskEvents <-> taskDeletion) resolve
+    # at call time exactly like live ES module bindings of exported functions
+    modules, order = {}, []
+    _read_module(entry, modules, order)
+
+    parts = ['"use strict";', "const __modules = {};"]
+    for name in order:
+        imports, exports, body = modules[name]
+        forwards = []
+        for dependency, names in imports:
+            for imported in names:
+                local = imported
+                if " as " in imported:
+                    imported, local = [n.strip() for n in imported.split(" as ")]
+                forwards.append(
+                    f"function {local}(...args) {{ return __modules[{json.dumps(dependency)}].{imported}(...args); }}"
+                )
+        export_list = ", ".join(exports)
+        parts.append(
+            f"// {name}\n__modules[{json.dumps(name)}] = (function () {{\n"
+            + "\n".join(forwards) + "\n" + body
+            + f"\nreturn {{ {export_list} }};\n}})();"
+        )
+    return "(function () {\n" + "\n".join(parts) + "\n})();\n"
+
+
+def minify_js(source):
+    try:
+        import rjsmin
+        return rjsmin.jsmin(source)
+    except ImportError:
+        pass
+    # conservative fallback: drop indentation, blank lines and whole-line comments
+    lines = []
+    for line in source.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("//"):
+            continue
+        lines.append(stripped)
+    return "\n".join(lines) + "\n"
+
+
+def minify_css(source):
+    try:
+        import rcssmin
+        return rcssmin.cssmin(source)
+    except ImportError:
+        pass
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+    source = re.sub(r"\s+", " ", source)
+    source = re.sub(r"\s*([{};,>])\s*", r"\1", source)
+    source = re.sub(r"([{;])\s*([\w-]+)\s*:\s*", r"\1\2:", source)
+    return source.replace(";}", "}").strip() + "\n"
+
+
+_CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+
+
+def bundle_css(files=CSS_FILES, font_urls=None):
+    font_urls = font_urls or {}
+    parts = []
+    for name in files:
+        path = os.path.join(STATIC_DIR, name)
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+
+        def rewrite(match):
+            url = match.group(2)
+            if re.match(r"^(data:|https?:|/|#)", url):
+                return match.group(0)
+            # the bundle lives in static/dist, so re-anchor relative urls
+            target = os.path.normpath(os.path.join(os.path.dirname(path), url))
+            relative = os.path.relpath(target, ROOT).replace(os.sep, "/")
+            if relative in font_urls:
+                return f"url('{font_urls[relative]}')"
+            return f"url('/{relative}')"
+
+        parts.append(f"/* {name} */\n" + _CSS_URL.sub(rewrite, source))
+    return "\n".join(parts)
+
+
+def build_fonts():
+    try:
+        from fontTools import subset
+    except ImportError:
+        print("fonttools not installed, skipping WOFF2 fonts (pip install fonttools brotli)")
+        return {}
+
+    converted = {}
+    for font in FONTS:
+        options = subset.Options()
+        options.flavor = "woff2"
+        options.layout_features = ["*"]
+        loaded = subset.load_font(os.path.join(ROOT, font), options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=subset.parse_unicodes(FONT_UNICODES))
+        subsetter.subset(loaded)
+
+        tmp = os.path.join(DIST_DIR, "font.tmp")
+        subset.save_font(loaded, tmp, options)
+        with open(tmp, "rb") as f:
+            data = f.read()
+        os.remove(tmp)
+
+        stem = os.path.splitext(os.path.basename(font))[0].split("-")[0]
+        style = "-Italic" if "Italic" in font else ""
+        converted[font] = _write(f"{stem}{style}.woff2", data)
+    return converted
+
+
+def _write(name, data):
+    hashed = _hashed_name(name, data)
+    path = os.path.join(DIST_DIR, hashed)
+    with open(path, "wb") as f:
+        f.write(data)
+
+    if hashed.endswith(COMPRESSIBLE):
+        with gzip.open(path + ".gz", "wb", compresslevel=9) as f:
+            f.write(data)
+        try:
+            import brotli
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(data, quality=11))
+        except ImportError:
+            pass
+    return hashed
+
+
+def build():
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+
+    fonts = build_fonts()
+    font_urls = {font: f"/static/dist/{hashed}" for font, hashed in fonts.items()}
+
+    manifest = {font: hashed for font, hashed in fonts.items()}
+    manifest["app.js"] = _write("app.js", minify_js(bundle_js()).encode())
+    manifest["app.css"] = _write("app.css", minify_css(bundle_css(font_urls=font_urls)).encode())
+
+    with open(MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    for source, hashed in sorted(manifest.items()):
+        size = os.path.getsize(os.path.join(DIST_DIR, hashed))
+        print(f"{source} -> dist/{hashed} ({size} bytes)")
+    return manifest
+
+
+_manifest = {}
+
+
+def load_manifest():
+    global _manifest
+    try:
+        with open(MANIFEST) as f:
+            _manifest = json.load(f)
+    except (OSError, ValueError):
+        _manifest = {}
+    return _manifest
+
+
+def asset_url(name):
+    # hashed bundle url, or None when the build has not been run (templates fall back)
+    hashed = _manifest.get(name)
+    return url_for("asset", filename=hashed) if hashed else None
+
+
+def serve_asset(filename):
+    # serve the precompressed variant the browser accepts, built next to the original
+    accepted = request.accept_encodings
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if accepted[encoding] and os.path.exists(os.path.join(DIST_DIR, filename + suffix)):
+            response = send_from_directory(DIST_DIR, filename + suffix)
+            response.mimetype = _mimetype(filename)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(DIST_DIR, filename)
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+def _mimetype(filename):
+    return {
+        ".js": "text/javascript",
+        ".css": "text/css",
+        ".json": "application/json",
+        ".svg": "image/svg+xml",
+    }.get(os.path.splitext(filename)[1], "application/octet-stream")
+
+
+def init_app(app):
+    load_manifest()
+    app.add_url_rule("/static/dist/<path:filename>", "asset", serve_asset)
+    app.jinja_env.globals["asset_url"] = asset_url
+
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,45 @@
+import argparse
+
+from benchmarks import report
+
+# usage: python -m benchmarks.compare before.json after.json
+
+
+def _change(before, after):
+    if not before or after is None:
+        return "     n/a"
+    return f"{(after - before) / before * 100:+7.1f}%"
+
+
+def compare(before, after):
+    print(f"{'endpoint':34} {'req/s':>17} {'p50':>17} {'p95':>17} {'p99':>17}")
+    labels = sorted(set(before["endpoints"]) | set(after["endpoints"]))
+    rows = [(label, before["endpoints"].get(label), after["endpoints"].get(label)) for label in labels]
+    rows.append(("TOTAL", before["total"], after["total"]))
+
+    for label, old, new in rows:
+        if old is None or new is None:
+            print(f"{label:34} only in {'after' if old is None else 'before'}")
+            continue
+        cells = []
+        for key in ("throughput", "p50_ms", "p95_ms", "p99_ms"):
+            cells.append(f"{new[key] or 0:>8.1f} {_change(old[key], new[key])}")
+        print(f"{label:34} " + " ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two saved benchmark runs")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    before, after = report.load(args.before), report.load(args.after)
+    for name, run in (("before", before), ("after", after)):
+        config = run["config"]
+        print(f"{name}: {run['environment']['commit']} {config['target']} "
+              f"x{config['concurrency']} for {config['seconds']}s")
+    compare(before, after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+from benchmarks import report, seed
+
+# usage: python -m benchmarks.load [--target client|gunicorn] [--seconds 30] [--concurrency 8]
+#                                  [--data DIR] [--out results.json] [seed options]
+# without --data a fresh temp directory is seeded first. every virtual user logs in as
+# its own seeded user and runs the MIX until time is up
+
+# weight, operation
+MIX = [
+    (20, "board"),
+    (12, "tasks_page"),
+    (8, "add"),
+    (8, "edit"),
+    (10, "drag"),
+    (4, "delete"),
+    (12, "collab_board"),
+    (6, "collab_page"),
+    (5, "collab_add"),
+    (6, "collab_drag"),
+    (5, "search"),
+    (1, "login"),
+]
+
+
+class ClientSession:
+    # Flask test client, in process: measures the app without any server in front
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json=None, form=None):
+        response = self.client.open(path, method=method, json=json, data=form)
+        return response.status_code, response.get_data()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPSession:
+    def __init__(self, base):
+        self.base = base
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method, path, json=None, form=None):
+        headers, data = {}, None
+        if json is not None:
+            headers["Content-Type"] = "application/json"
+            data = _dumps(json)
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+        req = urllib.request.Request(self.base + path, data=data, method=method, headers=headers)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except (urllib.error.URLError, OSError):
+            return 0, b""
+
+
+def _dumps(value):
+    return json.dumps(value).encode()
+
+
+class VirtualUser:
+    def __init__(self, session, username, rng):
+        self.session = session
+        self.username = username
+        self.rng = rng
+        self.task_ids = []
+        self.list_id = None
+        self.collab_task_ids = []
+
+    def call(self, label, method, path, **kwargs):
+        started = time.perf_counter()
+        status, body = self.session.request(method, path, **kwargs)
+        return label, time.perf_counter() - started, status, body
+
+    def setup(self):
+        self.login()
+        _, _, _, body = self.call("", "GET", "/tasks?status=backlog&limit=200")
+        self.task_ids = [task["id"] for task in json.loads(body)["tasks"]]
+
+        _, _, _, body = self.call("", "GET", "/get_collab_lists")
+        lists = json.loads(body)
+        if lists:
+            self.list_id = self.rng.choice(lists)["id"]
+            _, _, _, body = self.call("", "GET", f"/collaboration/{self.list_id}/tasks?status=backlog&limit=200")
+            self.collab_task_ids = [task["id"] for task in json.loads(body)["tasks"]]
+
+    def login(self):
+        return self.call("POST /login", "POST", "/login",
+                         form={"username": self.username, "password": seed.PASSWORD})
+
+    def task_fields(self):
+        name, priority, date, time_, _ = seed.random_task(self.rng)
+        return {"name": name, "priority": priority, "date": date, "time": time_}
+
+    def run(self, operation):
+        rng = self.rng
+        if operation.startswith("collab") and self.list_id is None:
+            operation = "board"
+        if operation in ("edit", "drag", "delete") and not self.task_ids:
+            operation = "add"
+        if operation == "collab_drag" and not self.collab_task_ids:
+            operation = "collab_add"
+
+        if operation == "board":
+            return self.call("GET /profile", "GET", "/profile")
+        if operation == "tasks_page":
+            return self.call("GET /tasks", "GET", f"/tasks?status={rng.choice(seed.STATUSES)}")
+        if operation == "add":
+            result = self.call("POST /add_task", "POST", "/add_task", json=self.task_fields())
+            if result[2] == 200:
+                self.task_ids.append(json.loads(result[3])["id"])
+            return result
+        if operation == "edit":
+            return self.call("PUT /edit_task", "PUT", f"/edit_task/{rng.choice(self.task_ids)}",
+                             json=self.task_fields())
+        if operation == "drag":
+            return self.call("PUT /update_task_status", "PUT", f"/update_task_status/{rng.choice(self.task_ids)}",
+                             json={"status": rng.choice(seed.STATUSES)})
+        if operation == "delete":
+            task_id = self.task_ids.pop(rng.randrange(len(self.task_ids)))
+            return self.call("DELETE /delete_task", "DELETE", f"/delete_task/{task_id}")
+        if operation == "collab_board":
+            return self.call("GET /collaboration/<id>", "GET", f"/collaboration/{self.list_id}")
+        if operation == "collab_page":
+            return self.call("GET /collaboration/<id>/tasks", "GET",
+                             f"/collaboration/{self.list_id}/tasks?status={rng.choice(seed.STATUSES)}")
+        if operation == "collab_add":
+            result = self.call("POST /add_collab_task", "POST", f"/add_collab_task/{self.list_id}",
+                               json=self.task_fields())
+            if result[2] == 200:
+                self.collab_task_ids.append(json.loads(result[3])["id"])
+            return result
+        if operation == "collab_drag":
+            return self.call("PUT /update_collab_task_status", "PUT",
+                             f"/update_collab_task_status/{rng.choice(self.collab_task_ids)}",
+                             json={"status": rng.choice(seed.STATUSES)})
+        if operation == "search":
+            return self.call("GET /search", "GET", f"/search?q={rng.choice(seed.WORDS)[:3]}")
+        return self.login()
+
+
+def drive(make_session, users, seconds, warmup, random_seed):
+    samples = {}
+    lock = threading.Lock()
+    weights = [weight for weight, _ in MIX]
+    operations = [operation for _, operation in MIX]
+    start_barrier = threading.Barrier(len(users) + 1)
+    state = {"recording": False, "stop": False}
+
+    def worker(index, username):
+        rng = random.Random(random_seed * 1000 + index)
+        user = VirtualUser(make_session(), username, rng)
+        user.setup()
+        start_barrier.wait()
+        while not state["stop"]:
+            label, took, status, _ = user.run(rng.choices(operations, weights)[0])
+            if state["recording"]:
+                with lock:
+                    samples.setdefault(label, []).append((took, status))
+
+    threads = [threading.Thread(target=worker, args=(i, name), daemon=True) for i, name in enumerate(users)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+
+    time.sleep(warmup)
+    state["recording"] = True
+    time.sleep(seconds)
+    state["recording"] = False
+    state["stop"] = True
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(data_dir, workers, threads):
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app:app", "--bind", f"127.0.0.1:{port}",
+         "--workers", str(workers), "--worker-class", "gthread", "--threads", str(threads),
+         "--pythonpath", seed.ROOT, "--log-level", "warning"],
+        cwd=data_dir,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup (is it installed?)")
+        if HTTPSession(base).request("GET", "/login")[0] == 200:
+            return process, base
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn did not start within 30s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the app with a realistic traffic mix")
+    parser.add_argument("--target", choices=["client", "gunicorn"], default="client")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--concurrency", type=int, default=8, help="virtual users")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--data", help="already seeded directory to run against (it gets modified)")
+    parser.add_argument("--out", help="write the results as JSON")
+    seed.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.data:
+        data_dir = os.path.abspath(args.data)
+        dataset = {"directory": data_dir}
+    else:
+        data_dir = tempfile.mkdtemp(prefix="bench-")
+        dataset = seed.seed_from_args(data_dir, args)
+    user_count = dataset.get("users", args.users)
+    users = [seed.username(n % user_count) for n in range(args.concurrency)]
+
+    server = None
+    if args.target == "client":
+        os.chdir(data_dir)
+        sys.path.insert(0, seed.ROOT)
+        from app import app
+        make_session = lambda: ClientSession(app)
+    else:
+        server, base = start_gunicorn(data_dir, args.workers, args.threads)
+        make_session = lambda: HTTPSession(base)
+
+    try:
+        samples = drive(make_session, users, args.seconds, args.warmup, args.random_seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    endpoints, total = report.summarize(samples, args.seconds)
+    report.print_table(endpoints, total)
+
+    if args.out:
+        report.save(args.out, {
+            "config": {
+                "target": args.target,
+                "seconds": args.seconds,
+                "concurrency": args.concurrency,
+                "workers": args.workers if args.target == "gunicorn" else None,
+                "threads": args.threads if args.target == "gunicorn" else None,
+                "mix": dict((operation, weight) for weight, operation in MIX),
+                "dataset": dataset,
+            },
+            "environment": report.environment(),
+            "endpoints": endpoints,
+            "total": total,
+        })
+
+
+if __name__ == "__main__":
+    main()
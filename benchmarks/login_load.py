@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+from benchmarks.report import percentile
+
+# usage: python -m benchmarks.login_load [--seconds 10] [--logins 8] [--readers 4]
+# runs the app once with inline hashing and once with the hashing pool,
+# hammering /login while measuring GET /tasks, which never hashes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "benchmark-password"
+
+
+def _client():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+
+def _post(opener, url, fields):
+    data = urllib.parse.urlencode(fields).encode()
+    try:
+        with opener.open(url, data=data) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def run_once(seconds, logins, readers):
+    # relative DB paths: work in a scratch directory so the real databases are untouched
+    os.chdir(tempfile.mkdtemp(prefix="login-load-"))
+    sys.path.insert(0, ROOT)
+    from werkzeug.serving import make_server
+    import hashing
+    from app import app
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    opener = _client()
+    _post(opener, base + "/register", {
+        "fullName": "Bench", "email": "bench@example.com", "username": "bench",
+        "password": PASSWORD, "securityQuestion": "answer",
+    })
+    _post(opener, base + "/login", {"username": "bench", "password": PASSWORD})
+
+    stop = threading.Event()
+    login_statuses = []
+    read_latencies = []
+    lock = threading.Lock()
+
+    def login_loop():
+        client = _client()
+        while not stop.is_set():
+            status = _post(client, base + "/login", {"username": "bench", "password": PASSWORD})
+            with lock:
+                login_statuses.append(status)
+
+    def read_loop():
+        while not stop.is_set():
+            started = time.perf_counter()
+            with opener.open(base + "/tasks?status=backlog") as response:
+                response.read()
+            with lock:
+                read_latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(logins)]
+    threads += [threading.Thread(target=read_loop) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+    hashing.shutdown()
+
+    return {
+        "hash_workers": hashing.HASH_WORKERS,
+        "logins": len(login_statuses),
+        "logins_rejected": sum(1 for status in login_statuses if status == 503),
+        "reads_per_second": len(read_latencies) / seconds,
+        "read_p50_ms": percentile(read_latencies, 50),
+        "read_p95_ms": percentile(read_latencies, 95),
+        "read_mean_ms": statistics.mean(read_latencies) * 1000 if read_latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Non-auth throughput under concurrent login load")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--logins", type=int, default=8, help="threads posting /login")
+    parser.add_argument("--readers", type=int, default=4, help="threads reading /tasks")
+    parser.add_argument("--workers", type=int, default=None, help="HASH_WORKERS for the pooled run")
+    parser.add_argument("--single", action="store_true", help="run once with the current environment")
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_once(args.seconds, args.logins, args.readers)))
+        return
+
+    results = []
+    pooled = str(args.workers) if args.workers is not None else os.environ.get("HASH_WORKERS", "")
+    for label, workers in (("inline", "0"), ("pool", pooled)):
+        env = dict(os.environ)
+        env.pop("HASH_WORKERS", None)
+        if workers:
+            env["HASH_WORKERS"] = workers
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.login_load", "--single",
+             "--seconds", str(args.seconds), "--logins", str(args.logins), "--readers", str(args.readers)],
+            cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["mode"] = label
+        results.append(result)
+
+    print(f"{'mode':8} {'workers':>7} {'logins':>7} {'503s':>5} {'reads/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in results:
+        print(f"{r['mode']:8} {r['hash_workers']:>7} {r['logins']:>7} {r['logins_rejected']:>5} "
+              f"{r['reads_per_second']:>8.1f} {r['read_p50_ms'] or 0:>8.1f} {r['read_p95_ms'] or 0:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
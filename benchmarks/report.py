@@ -0,0 +1,77 @@
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    # nearest-rank on a sorted copy, in milliseconds
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000
+
+
+def summarize(samples, seconds):
+    # samples: label -> list of (seconds taken, status code)
+    endpoints = {}
+    everything = []
+    for label, entries in sorted(samples.items()):
+        latencies = [took for took, _ in entries]
+        everything.extend(entries)
+        endpoints[label] = _stats(latencies, entries, seconds)
+    total = _stats([took for took, _ in everything], everything, seconds)
+    return endpoints, total
+
+
+def _stats(latencies, entries, seconds):
+    return {
+        "requests": len(entries),
+        "errors": sum(1 for _, status in entries if status >= 500 or status == 0),
+        "rejected": sum(1 for _, status in entries if 400 <= status < 500),
+        "throughput": len(entries) / seconds if seconds else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else None,
+        "max_ms": max(latencies) * 1000 if latencies else None,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def print_table(endpoints, total):
+    print(f"{'endpoint':34} {'reqs':>7} {'err':>5} {'4xx':>5} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, s in [*endpoints.items(), ("TOTAL", total)]:
+        print(f"{label:34} {s['requests']:>7} {s['errors']:>5} {s['rejected']:>5} {s['throughput']:>8.1f} "
+              f"{s['p50_ms'] or 0:>8.1f} {s['p95_ms'] or 0:>8.1f} {s['p99_ms'] or 0:>8.1f}")
+
+
+def save(path, result):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    print(f"Saved {path}")
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,144 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# usage: python -m benchmarks.seed --dir /tmp/bench [--users 100 --tasks-per-user 200 ...]
+# creates accounts.db, todo.db and collaborations.db at the current schema and fills them.
+# every user is user<N> with password PASSWORD
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "benchmark-password"
+
+WORDS = [
+    "buy", "groceries", "milk", "report", "meeting", "call", "email", "fix", "bug",
+    "deploy", "review", "plan", "write", "docs", "clean", "garage", "pay", "bills",
+    "book", "flight", "prepare", "slides", "budget", "update", "website", "order",
+]
+PRIORITIES = ["high", "mid", "low"]
+STATUSES = ["backlog", "in-progress", "completed"]
+
+
+def username(n):
+    return f"user{n}"
+
+
+def random_task(rng):
+    return (
+        " ".join(rng.choices(WORDS, k=rng.randint(2, 5))),
+        rng.choice(PRIORITIES),
+        f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        f"{rng.randint(0, 23):02d}:{rng.choice(['00', '15', '30', '45'])}",
+        rng.choices(STATUSES, weights=[5, 2, 3])[0],
+    )
+
+
+def positioned(rows, scope=0, status=5):
+    # appends each row's place in its (scope, status) column, like adding them one by one
+    counts = {}
+    for row in rows:
+        key = (row[scope], row[status])
+        counts[key] = counts.get(key, 0) + 1
+        yield (*row, float(counts[key]))
+
+
+def seed(directory, users=100, tasks_per_user=200, lists=20, members_per_list=10,
+         tasks_per_list=500, random_seed=1):
+    # relative DB paths, so everything happens inside the target directory
+    os.makedirs(directory, exist_ok=True)
+    os.chdir(directory)
+    for name in ("accounts.db", "todo.db", "collaborations.db"):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(name + suffix):
+                os.remove(name + suffix)
+
+    sys.path.insert(0, ROOT)
+    import database
+    from db import get_cursor
+    from hashing import PASSWORD_HASH_METHOD
+    from werkzeug.security import generate_password_hash
+
+    database.init_all()
+    rng = random.Random(random_seed)
+    users = max(users, members_per_list, 1)
+    started = time.perf_counter()
+
+    # one hash for everyone, the KDF would otherwise dominate seeding
+    password = generate_password_hash(PASSWORD, PASSWORD_HASH_METHOD)
+    answer = generate_password_hash("answer", PASSWORD_HASH_METHOD)
+    with get_cursor(database.DB_NAME) as cursor:
+        cursor.executemany("""
+            INSERT INTO accounts (full_name, email, username, password, security_question)
+            VALUES (?, ?, ?, ?, ?)
+        """, ((f"User {n}", f"{username(n)}@example.com", username(n), password, answer)
+              for n in range(users)))
+        cursor.execute("SELECT username, id FROM accounts")
+        ids = dict(cursor.fetchall())
+
+    def user_id(n):
+        return ids[username(n)]
+
+    with get_cursor(database.TASK_DB) as cursor:
+        cursor.executemany("""
+            INSERT INTO tasks (user_id, name, priority, date, time, status, position)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, positioned((user_id(n), *random_task(rng)) for n in range(users) for _ in range(tasks_per_user)))
+
+    with get_cursor(database.COLLAB_DB) as cursor:
+        for list_number in range(lists):
+            owner = rng.randrange(users)
+            cursor.execute("""
+                INSERT INTO collab_lists (list_name, description, owner_id)
+                VALUES (?, ?, ?)
+            """, (f"List {list_number}", "Benchmark list", user_id(owner)))
+            list_id = cursor.lastrowid
+
+            others = [n for n in rng.sample(range(users), members_per_list) if n != owner]
+            members = [owner, *others[:max(members_per_list - 1, 0)]]
+            cursor.executemany(
+                "INSERT INTO collab_members (list_id, user_id) VALUES (?, ?)",
+                [(list_id, user_id(n)) for n in members],
+            )
+            cursor.executemany("""
+                INSERT INTO collab_tasks (list_id, name, priority, date, time, status, creator_id, position)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, positioned((list_id, *random_task(rng), user_id(rng.choice(members))) for _ in range(tasks_per_list)))
+
+    elapsed = time.perf_counter() - started
+    print(f"Seeded {users} users, {users * tasks_per_user} tasks, {lists} lists "
+          f"({lists * tasks_per_list} tasks) in {directory} in {elapsed:.1f}s")
+    return {
+        "users": users,
+        "tasks_per_user": tasks_per_user,
+        "lists": lists,
+        "members_per_list": members_per_list,
+        "tasks_per_list": tasks_per_list,
+        "random_seed": random_seed,
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--tasks-per-user", type=int, default=200)
+    parser.add_argument("--lists", type=int, default=20)
+    parser.add_argument("--members-per-list", type=int, default=10)
+    parser.add_argument("--tasks-per-list", type=int, default=500)
+    parser.add_argument("--random-seed", type=int, default=1)
+
+
+def seed_from_args(directory, args):
+    return seed(directory, args.users, args.tasks_per_user, args.lists,
+                args.members_per_list, args.tasks_per_list, args.random_seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the app databases with synthetic data")
+    parser.add_argument("--dir", required=True, help="directory for the databases")
+    add_arguments(parser)
+    args = parser.parse_args()
+    seed_from_args(os.path.abspath(args.dir), args)
+
+
+if __name__ == "__main__":
+    main()
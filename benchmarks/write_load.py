@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.report import percentile
+
+# usage: python -m benchmarks.write_load [--seconds 5] [--writers 1,4,16] [--processes 4]
+# inserts tasks like POST /add_task does, from N concurrent writers spread over up to
+# --processes processes (standing in for gunicorn workers), once with every write in
+# its own transaction (WRITE_QUEUE=0) and once through the group-commit queue.
+# --synchronous FULL fsyncs every commit, as a database without WAL's NORMAL mode would
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_once(data, seconds, threads, start_at, synchronous):
+    os.chdir(data)
+    sys.path.insert(0, ROOT)
+    import db
+    from writes import write
+    from boards import end_position
+
+    db.PRAGMAS = tuple(p for p in db.PRAGMAS if "synchronous" not in p) + (f"PRAGMA synchronous={synchronous}",)
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def insert(cursor, name):
+        return cursor.execute(
+            f"INSERT INTO tasks (user_id, name, priority, date, time, position) "
+            f"VALUES (?, ?, ?, ?, ?, {end_position('tasks')})",
+            (1, name, "mid", "2025-01-01", "09:00", 1, "backlog")).lastrowid
+
+    def loop(n):
+        mine, failed = [], []
+        while time.time() < start_at:
+            time.sleep(0.001)
+        deadline = start_at + seconds
+        count = 0
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                write("todo.db", lambda cursor: insert(cursor, f"task {os.getpid()}-{n}-{count}"))
+                mine.append(time.perf_counter() - started)
+            except sqlite3.OperationalError as e:
+                failed.append(str(e))
+            count += 1
+        with lock:
+            latencies.extend(mine)
+            errors.extend(failed)
+
+    workers = [threading.Thread(target=loop, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return {"latencies": latencies, "errors": errors}
+
+
+def run_config(writers, processes, seconds, queued, synchronous):
+    data = tempfile.mkdtemp(prefix="write-load-")
+    subprocess.run([sys.executable, "-c", "from database import init_all; init_all()"],
+                   cwd=data, env={**os.environ, "PYTHONPATH": ROOT}, check=True, capture_output=True)
+
+    env = {**os.environ, "WRITE_QUEUE": "1" if queued else "0"}
+    processes = max(1, min(processes, writers))
+    per_process = [writers // processes + (i < writers % processes) for i in range(processes)]
+    start_at = time.time() + 2
+    children = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.write_load", "--single", "--data", data,
+             "--seconds", str(seconds), "--threads", str(threads), "--start-at", str(start_at),
+             "--synchronous", synchronous],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True,
+        )
+        for threads in per_process
+    ]
+
+    latencies, errors = [], []
+    for child in children:
+        output, _ = child.communicate()
+        result = json.loads(output.strip().splitlines()[-1])
+        latencies.extend(result["latencies"])
+        errors.extend(result["errors"])
+
+    with sqlite3.connect(os.path.join(data, "todo.db")) as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    return {
+        "mode": "queue" if queued else "direct",
+        "writers": writers,
+        "processes": processes,
+        "writes_per_second": len(latencies) / seconds,
+        "stored": stored,
+        "errors": len(errors),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies) * 1000 if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write throughput with and without group commit")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--writers", default="1,4,16", help="comma separated writer counts")
+    parser.add_argument("--processes", type=int, default=4, help="processes the writers are spread over")
+    parser.add_argument("--synchronous", choices=["NORMAL", "FULL"], default="NORMAL")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    parser.add_argument("--threads", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_once(args.data, args.seconds, args.threads, args.start_at, args.synchronous)))
+        return
+
+    print(f"{'mode':7} {'writers':>7} {'procs':>5} {'writes/s':>9} {'errors':>6} "
+          f"{'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+    for writers in (int(n) for n in args.writers.split(",")):
+        for queued in (False, True):
+            r = run_config(writers, args.processes, args.seconds, queued, args.synchronous)
+            print(f"{r['mode']:7} {r['writers']:>7} {r['processes']:>5} {r['writes_per_second']:>9.1f} "
+                  f"{r['errors']:>6} {r['p50_ms'] or 0:>7.2f} {r['p99_ms'] or 0:>7.2f} {r['max_ms'] or 0:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+import base64
+import json
+import re
+import sqlite3
+from datetime import date as _date
+
+STATUSES = ("backlog", "in-progress", "completed")
+
+# the order users arrange their columns in (see positions.py), id breaks ties.
+# the board indexes end in position, so they serve both ORDER BY and keyset seeks
+SORT_COLUMNS = ("position", "id")
+TASK_ORDER = ", ".join(SORT_COLUMNS)
+
+# the column a table's boards belong to, columns are (scope, status)
+SCOPE_COLUMNS = {"tasks": "user_id", "collab_tasks": "list_id"}
+POSITION_STEP = 1.0
+
+# collaboration tasks store the creator's account id, the name is read from the
+# attached accounts.db so a rename shows everywhere. no commas, changes_sql counts them
+CREATED_BY = "(SELECT a.username FROM accounts.accounts a WHERE a.id = creator_id) AS created_by"
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def split_by_status(rows):
+    # one pass over already ordered rows, unknown or missing status goes to backlog
+    board = {status: [] for status in STATUSES}
+    backlog = board["backlog"]
+    for row in rows:
+        board.get(row["status"], backlog).append(row)
+    return board
+
+
+def encode_cursor(row, columns=SORT_COLUMNS):
+    key = json.dumps([row[column] for column in columns], separators=(",", ":"))
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, columns=SORT_COLUMNS):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != len(columns):
+        raise ValueError("Invalid cursor")
+    # every sort key is numeric or NULL, anything else would be bound into the seek as is
+    if not all(value is None or type(value) in (int, float) for value in key):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def page_limit(value):
+    try:
+        limit = int(value) if value is not None else PAGE_SIZE
+    except ValueError:
+        raise ValueError("Invalid limit")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _page_sql(table, columns, scope):
+    return f"""
+        SELECT {columns}, {TASK_ORDER} FROM {table}
+        WHERE {scope} AND status = ?
+    """
+
+
+def fetch_page(cursor, table, columns, scope, params, status, after=None, limit=PAGE_SIZE):
+    # keyset pagination: seek past the last row's sort key instead of using OFFSET
+    sql = _page_sql(table, columns, scope)
+    args = [*params, status]
+    if after is not None:
+        sql += f" AND ({TASK_ORDER}) > (?, ?)"
+        args.extend(after)
+    sql += f" ORDER BY {TASK_ORDER} LIMIT ?"
+    args.append(limit + 1)
+
+    cursor.row_factory = sqlite3.Row
+    rows = cursor.execute(sql, args).fetchall()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def fetch_first_pages(cursor, table, columns, scope, params, limit=PAGE_SIZE):
+    # first page of every column in one statement, each arm is a bounded index range
+    arms = " UNION ALL ".join(
+        f"SELECT * FROM ({_page_sql(table, columns, scope)} ORDER BY {TASK_ORDER} LIMIT ?)"
+        for _ in STATUSES
+    )
+    args = []
+    for status in STATUSES:
+        args.extend([*params, status, limit + 1])
+
+    cursor.row_factory = sqlite3.Row
+    board = split_by_status(cursor.execute(arms, args))
+
+    cursors = {}
+    for status, rows in board.items():
+        cursors[status] = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        del rows[limit:]
+    return board, cursors
+
+
+def task_json(row, fields):
+    # rows are selected with the columns in `fields` order, plain tuples or sqlite3.Row
+    return dict(zip(fields, row))
+
+
+def changes_sql(table, columns, scope_column):
+    # live rows and tombstones after a rev, merged in rev order.
+    # columns starts with id, tombstones fill the rest with NULL
+    blanks = ", ".join("NULL" for _ in columns.split(",")[1:])
+    return f"""
+        SELECT rev, 0 AS deleted, {columns} FROM {table}
+        WHERE {scope_column} = ? AND rev > ?
+        UNION ALL
+        SELECT rev, 1 AS deleted, task_id, {blanks} FROM {table}_deleted
+        WHERE {scope_column} = ? AND rev > ?
+        ORDER BY rev LIMIT ?
+    """
+
+
+def fetch_changes(cursor, table, columns, scope_column, scope_value, since, limit=PAGE_SIZE):
+    # returns (changed rows, deleted ids, rev to continue from, more), or None when
+    # since is ahead of this database (restored from a backup), the client must start over.
+    # the counter is read first, anything committed meanwhile is sent again next time
+    cursor.execute("SELECT rev FROM change_counter")
+    current = cursor.fetchone()[0]
+    if since > current:
+        return None
+
+    cursor.execute(changes_sql(table, columns, scope_column),
+                   (scope_value, since, scope_value, since, limit + 1))
+    rows = cursor.fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    rev = rows[-1][0] if more else max(current, rows[-1][0] if rows else since)
+    changed = [row[2:] for row in rows if not row[1]]
+    deleted = [row[2] for row in rows if row[1]]
+    return changed, deleted, rev, more
+
+
+def end_position(table):
+    # after the last card of a column, bound as (scope value, status)
+    return (f"(SELECT COALESCE(MAX(position), 0) + {POSITION_STEP} FROM {table} "
+            f"WHERE {SCOPE_COLUMNS[table]} = ? AND status = ?)")
+
+
+def status_sql(table, where="id = ?"):
+    # a status change puts the card at the end of its new column, setting the status it
+    # already has keeps its place. bound as (status, status, status, *where)
+    scope = SCOPE_COLUMNS[table]
+    return f"""
+        UPDATE {table} SET status = ?, position = CASE WHEN status IS ? THEN position ELSE (
+            SELECT COALESCE(MAX(c.position), 0) + {POSITION_STEP} FROM {table} c
+            WHERE c.{scope} = {table}.{scope} AND c.status = ?
+        ) END
+        WHERE {where}
+    """
+
+
+def export_sql(table, columns, scope_column, archived_columns=None):
+    # one chunk of a full export, in id order so the next chunk starts after the last id.
+    # with archived_columns the {table}_archive rows are merged in, bound as
+    # (scope value, id, scope value, id, limit). an id is only ever in one of the two
+    archived = f"""
+        UNION ALL
+        SELECT {archived_columns} FROM {table}_archive
+        WHERE {scope_column} = ? AND id > ?
+    """ if archived_columns else ""
+    return f"""
+        SELECT {columns} FROM {table}
+        WHERE {scope_column} = ? AND id > ?{archived}
+        ORDER BY id LIMIT ?
+    """
+
+
+def archive_sql(table):
+    # tasks completed before ?, oldest first, served by the partial idx_*_completed index
+    return f"""
+        SELECT id, {SCOPE_COLUMNS[table]} FROM {table}
+        WHERE status = 'completed' AND completed_at < ?
+        ORDER BY completed_at LIMIT ?
+    """
+
+
+def due_sql(table, columns, scope, since=True, seek=""):
+    # open tasks with due_at in [?, ?), or only before ? without since, in due order.
+    # served by the partial idx_*_due index, seek is an extra condition to continue a page
+    lower = "due_at >= ? AND " if since else ""
+    return f"""
+        SELECT {columns} FROM {table}
+        WHERE {scope} AND status != 'completed' AND {lower}due_at < ?{seek}
+        ORDER BY due_at, id LIMIT ?
+    """
+
+
+PRIORITIES = ("high", "mid", "low")
+TASK_FIELDS = ("name", "priority", "date", "time")
+
+# what the board's date and time inputs send, anything else is refused before it is stored
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}\Z")
+_TIME = re.compile(r"(?:[01]\d|2[0-3]):[0-5]\d\Z")
+
+BATCH_OPS = ("create", "edit", "status", "delete")
+MAX_BATCH_SIZE = 500
+
+
+def valid_date(value):
+    if not isinstance(value, str) or not _DATE.match(value):
+        return False
+    try:
+        _date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def valid_time(value):
+    return isinstance(value, str) and _TIME.match(value) is not None
+
+
+def field_error(data):
+    # the reason a task's priority, date or time can't be stored, None if they can.
+    # each may be missing, an empty date or time is what the board sends for none
+    if data.get("priority") not in (None, *PRIORITIES):
+        return "Invalid priority"
+    if data.get("date") not in (None, "") and not valid_date(data["date"]):
+        return "Invalid date, expected YYYY-MM-DD"
+    if data.get("time") not in (None, "") and not valid_time(data["time"]):
+        return "Invalid time, expected HH:MM"
+    return None
+
+
+def validate_operation(op):
+    if not isinstance(op, dict):
+        return "Operation must be an object"
+
+    kind = op.get("op")
+    if kind not in BATCH_OPS:
+        return "Unknown operation"
+    if kind != "create" and type(op.get("id")) is not int:
+        return "Task id required"
+    if kind == "create" and not op.get("name"):
+        return "Task name required"
+    if kind == "edit":
+        if not any(field in op for field in TASK_FIELDS):
+            return "Nothing to edit"
+        if "name" in op and not op["name"]:
+            return "Task name required"
+    if kind in ("create", "edit"):
+        error = field_error(op)
+        if error:
+            return error
+    if kind == "status" and op.get("status") not in STATUSES:
+        return "Invalid status"
+    return None
+
+
+def parse_batch(data):
+    # returns (operations, results, error), results hold one entry per operation
+    operations = data.get("operations") if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return None, None, "operations must be a non-empty list"
+    if len(operations) > MAX_BATCH_SIZE:
+        return None, None, f"At most {MAX_BATCH_SIZE} operations per batch"
+
+    results = []
+    for index, op in enumerate(operations):
+        result = {"index": index, "op": op.get("op") if isinstance(op, dict) else None}
+        if isinstance(op, dict) and "id" in op:
+            result["id"] = op["id"]
+        error = validate_operation(op)
+        if error:
+            result["error"] = error
+        results.append(result)
+    return operations, results, None
+
+
+def referenced_ids(operations):
+    return {op["id"] for op in operations if op["op"] != "create"}
+
+
+def apply_batch(cursor, table, operations, results, owner):
+    # runs inside the caller's transaction, permissions are already checked.
+    # owner maps the columns every created row gets, e.g. {"user_id": ...}
+    for op, result in zip(operations, results):
+        kind = op["op"]
+
+        if kind == "create":
+            values = {**owner, **{field: op.get(field) for field in TASK_FIELDS}}
+            columns = ", ".join(values)
+            placeholders = ", ".join("?" for _ in values)
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}, position) VALUES ({placeholders}, {end_position(table)})",
+                (*values.values(), owner[SCOPE_COLUMNS[table]], "backlog"),
+            )
+            result.update(values)
+            result["id"] = cursor.lastrowid
+
+        elif kind == "edit":
+            fields = [field for field in TASK_FIELDS if field in op]
+            assignments = ", ".join(f"{field}=?" for field in fields)
+            cursor.execute(
+                f"UPDATE {table} SET {assignments} WHERE id=?",
+                (*(op[field] for field in fields), op["id"]),
+            )
+
+        elif kind == "status":
+            cursor.execute(status_sql(table), (op["status"], op["status"], op["status"], op["id"]))
+
+        elif kind == "delete":
+            cursor.execute(f"DELETE FROM {table} WHERE id=?", (op["id"],))
+
+        result["success"] = True
+    return results
+
+
+def deny_unlisted(operations, results, allowed_ids, message):
+    # marks every operation on a task outside allowed_ids, returns True if any was denied
+    denied = False
+    for op, result in zip(operations, results):
+        if op["op"] != "create" and op["id"] not in allowed_ids:
+            result["error"] = message
+            denied = True
+    return denied
+
+
+def id_placeholders(ids):
+    return ", ".join("?" for _ in ids)
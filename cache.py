@@ -0,0 +1,240 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from db import get_cursor
+
+DB_NAME = "accounts.db"
+
+# BOARD_CACHE_BACKEND picks where version counters live:
+#   memory            per process, fine for a single gunicorn worker
+#   file:<path>       a small shared SQLite file, every worker sees every bump
+#   redis://host/db   needs the redis package
+BOARD_CACHE_BACKEND = os.environ.get("BOARD_CACHE_BACKEND", "memory")
+BOARD_CACHE_SIZE = int(os.environ.get("BOARD_CACHE_SIZE", "512"))
+BOARD_CACHE_TTL = float(os.environ.get("BOARD_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "4096"))
+# invalidation only reaches the worker that made the change, the TTL bounds how long
+# another worker can still draw an old name in the sidebar
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "60"))
+
+
+class MemoryVersions:
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+        # counters are private to this process, so versions from different
+        # workers must never be mistaken for each other (e.g. in ETags)
+        self.token = uuid.uuid4().hex
+
+    def get(self, key):
+        return self._versions.get(key, 0)
+
+    def bump(self, key):
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            return self._versions[key]
+
+
+class FileVersions:
+    token = "file"
+
+    def __init__(self, path):
+        self.path = path
+        with get_cursor(path) as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS versions (
+                    key TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+            """)
+
+    def get(self, key):
+        with get_cursor(self.path) as cursor:
+            cursor.execute("SELECT version FROM versions WHERE key = ?", (key,))
+            row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def bump(self, key):
+        with get_cursor(self.path) as cursor:
+            cursor.execute("""
+                INSERT INTO versions (key, version) VALUES (?, 1)
+                ON CONFLICT(key) DO UPDATE SET version = version + 1
+                RETURNING version
+            """, (key,))
+            return cursor.fetchone()[0]
+
+
+class RedisVersions:
+    token = "redis"
+
+    def __init__(self, client, prefix="board-version:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+    def bump(self, key):
+        return int(self.client.incr(self.prefix + key))
+
+
+def versions_from_config(backend):
+    if backend == "memory":
+        return MemoryVersions()
+    if backend.startswith("file:"):
+        return FileVersions(backend[len("file:"):])
+    if backend.startswith("redis://"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("BOARD_CACHE_BACKEND=redis:// needs the redis package")
+        return RedisVersions(redis.Redis.from_url(backend))
+    raise ValueError(f"Unknown BOARD_CACHE_BACKEND: {backend}")
+
+
+class BoardCache:
+    # bounded LRU with TTL. entries are keyed by the owner's version counter,
+    # so bumping the version makes older entries unreachable, they age out of the LRU
+    def __init__(self, versions, max_entries=BOARD_CACHE_SIZE, ttl=BOARD_CACHE_TTL):
+        self.versions = versions
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, kind, owner, loader):
+        key = (kind, owner, self.versions.get(owner))
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = loader()
+        # nothing found (e.g. a deleted list), the next request looks again
+        if value is None:
+            return value
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def version(self, owner):
+        return self.versions.get(owner)
+
+    def bump(self, owner):
+        return self.versions.bump(owner)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+board_cache = BoardCache(versions_from_config(BOARD_CACHE_BACKEND))
+
+
+class UserCache:
+    # id, full_name, email and username per account, for the sidebar. per process and bounded;
+    # unknown usernames are not cached, so a new account is found right away
+    def __init__(self, max_entries=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped by invalidate, a load that raced with it is not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, username):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+            generation = self._generation
+
+        with get_cursor(DB_NAME) as cursor:
+            cursor.execute("SELECT id, full_name, email, username FROM accounts WHERE username = ?", (username,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        user = {"id": row[0], "full_name": row[1], "email": row[2], "username": row[3]}
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[username] = (now + self.ttl, user)
+                self._entries.move_to_end(username)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return dict(user)
+
+    def invalidate(self, *usernames):
+        with self._lock:
+            self._generation += 1
+            for username in usernames:
+                self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+user_cache = UserCache()
+
+
+# keyed by account id, so a rename keeps the user's cached pages and ETags
+def user_key(user_id):
+    return f"user:{user_id}"
+
+
+def list_key(list_id):
+    return f"list:{list_id}"
+
+
+def memberships_key(user_id):
+    # which lists a user belongs to, bumped when they create or join one
+    return f"memberships:{user_id}"
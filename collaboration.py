@@ -1,5 +1,21 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify
+from flask import Blueprint, Response, render_template, session, redirect, url_for, request, jsonify
 import sqlite3
+from db import get_cursor
+from writes import write
+from cache import board_cache, user_cache, user_key, list_key, memberships_key
+from http_cache import conditional
+from acl import collab_acl
+from events import event_bus
+from exports import FORMATS, export_chunks, export_response
+from imports import InvalidImport, upload_rows, run_import, import_response
+from invites import MAX_INVITES, parse_invites, check_invites, invite_error, add_members
+from boards import (
+    STATUSES, CREATED_BY, fetch_first_pages, fetch_page, decode_cursor, page_limit, task_json,
+    parse_batch, referenced_ids, deny_unlisted, id_placeholders, apply_batch,
+    end_position, status_sql, field_error,
+)
+from positions import InvalidMove, move, spread_later
+from archive import ARCHIVE_ORDER, fetch_archived, restore
 
 collab_bp = Blueprint('collaboration', __name__)
 
@@ -7,30 +23,48 @@ collab_bp = Blueprint('collaboration', __name__)
 DB_NAME = "accounts.db"
 COLLAB_DB = "collaborations.db"
 
+BOARD_FIELDS = ("id", "name", "priority", "date", "time", "status", "position", "created_by")
+BOARD_COLUMNS = ", ".join((*BOARD_FIELDS[:-1], CREATED_BY))
+# positions only mean something on the board, exports and imports leave them out
+EXPORT_FIELDS = ("id", "name", "priority", "date", "time", "status", "created_by")
+EXPORT_COLUMNS = (*EXPORT_FIELDS[:-1], CREATED_BY)
+ARCHIVED_FIELDS = ("id", "name", "priority", "date", "time", "completed_at", "archived_at", "created_by")
+ARCHIVED_COLUMNS = ", ".join((*ARCHIVED_FIELDS[:-1], CREATED_BY))
+
+
+def publish(list_id, event, data):
+    # after the commit, like the cache bumps
+    event_bus.publish(list_key(list_id), event, data)
+
+
+def member_list_keys(list_id):
+    # ETag keys of a list page, none for non-members so they never get a 304
+    access = collab_acl.for_list(session["user_id"], list_id)
+    if not access or not access.member:
+        return None
+    return [list_key(list_id)]
+
+
 @collab_bp.route("/collaboration")
+@conditional(lambda: [user_key(session["user_id"]), memberships_key(session["user_id"])])
 def collaboration():
     if "username" not in session:
         session["message"] = "Please log in first."
         return redirect(url_for("login"))
 
     username = session["username"]
+    user_id = session["user_id"]
 
     # get user info for the sidebar
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT full_name, email, username FROM accounts WHERE username=?", (username,))
-        user = cursor.fetchone()
-    
-    user_data = {"full_name": user[0], "email": user[1], "username": user[2]}
+    user_data = user_cache.get(username)
 
-    with sqlite3.connect(COLLAB_DB) as conn:
-        cursor = conn.cursor()
+    with get_cursor(COLLAB_DB) as cursor:
 
         # lists created by the user
         cursor.execute("""
             SELECT id, list_name, description FROM collab_lists
-            WHERE owner_username = ?
-        """, (username,))
+            WHERE owner_id = ?
+        """, (user_id,))
         owned_lists = cursor.fetchall()
 
         # lists where user is a member
@@ -38,8 +72,8 @@ def collaboration():
             SELECT cl.id, cl.list_name, cl.description
             FROM collab_members cm
             JOIN collab_lists cl ON cm.list_id = cl.id
-            WHERE cm.member_username = ? AND cl.owner_username != ?
-        """, (username, username))
+            WHERE cm.user_id = ? AND cl.owner_id != ?
+        """, (user_id, user_id))
         shared_lists = cursor.fetchall()
 
     return render_template(
@@ -59,54 +93,38 @@ def create_collaboration():
     if request.method == "POST":
         list_name = request.form["collab_name"]
         description = request.form["collab_description"]
-        members_input = request.form["collab_members"]
         owner_username = session["username"]
+        owner_id = session["user_id"]
 
-        members = [m.strip() for m in members_input.split(",")] if members_input else []
+        names = parse_invites(request.form.get("collab_members", ""), request.files.get("collab_members_csv"))
+        if len(names) > MAX_INVITES:
+            session["toast_error"] = f"At most {MAX_INVITES} members can be invited at once."
+            return redirect(url_for("collaboration.create_collaboration"))
 
-        # collect invalid usernames first
-        invalid_users = []
-        for member in members:
-            if member and member != owner_username:
-                with sqlite3.connect(DB_NAME) as accounts_conn:
-                    accounts_cursor = accounts_conn.cursor()
-                    accounts_cursor.execute(
-                        "SELECT username FROM accounts WHERE username = ?", (member,)
-                    )
-                    if not accounts_cursor.fetchone():
-                        invalid_users.append(member)
+        # one query validates every name, problems are reported together
+        members, invalid_users, duplicates = check_invites(names, skip={owner_username})
 
         # stop creation
         if invalid_users:
-            session["toast_error"] = f"The following users do not exist: {', '.join(invalid_users)}"
+            session["toast_error"] = invite_error(invalid_users, duplicates)
             return redirect(url_for("collaboration.create_collaboration"))
 
+        def create(cursor):
+            cursor.execute("""
+                INSERT INTO collab_lists (list_name, description, owner_id)
+                VALUES (?, ?, ?)
+            """, (list_name, description, owner_id))
+            list_id = cursor.lastrowid
+
+            # owner is always a member
+            add_members(cursor, list_id, [owner_id, *members.values()])
+            return list_id
+
         try:
-            with sqlite3.connect(COLLAB_DB) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    INSERT INTO collab_lists (list_name, description, owner_username)
-                    VALUES (?, ?, ?)
-                """, (list_name, description, owner_username))
-                
-                list_id = cursor.lastrowid
-
-                # owner is always a member
-                cursor.execute("""
-                    INSERT INTO collab_members (list_id, member_username)
-                    VALUES (?, ?)
-                """, (list_id, owner_username))
-
-                # add valid members
-                for member in members:
-                    if member and member != owner_username:
-                        cursor.execute("""
-                            INSERT INTO collab_members (list_id, member_username)
-                            VALUES (?, ?)
-                        """, (list_id, member))
-
-                conn.commit()
+            list_id = write(COLLAB_DB, create)
+            collab_acl.list_created(list_id, owner_id, [owner_id, *members.values()])
+            for member_id in [owner_id, *members.values()]:
+                board_cache.bump(memberships_key(member_id))
 
             # session["message"] = f"Collaboration '{list_name}' created successfully!"
             return redirect(url_for("collaboration.collaboration"))
@@ -115,80 +133,128 @@ def create_collaboration():
             return f"Error creating collaboration: {str(e)}", 500
 
     username = session["username"]
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT username FROM accounts WHERE username = ?", (username,))
-        user_data = cursor.fetchone()
-
-    user = {"username": user_data[0] if user_data else username}
+    user = user_cache.get(username) or {"username": username}
 
     return render_template("createcollab.html", user=user)
 
 
 
 @collab_bp.route("/collaboration/<int:list_id>")
+@conditional(member_list_keys)
 def view_collaboration(list_id):
     if "username" not in session:
         session["message"] = "Please log in first."
         return redirect(url_for("login"))
     
     username = session["username"]
-    
-    with sqlite3.connect(COLLAB_DB) as conn:
-        cursor = conn.cursor()
-        
-        # check if user has access to this collaboration
-        cursor.execute("""
-            SELECT 1 FROM collab_members 
-            WHERE list_id = ? AND member_username = ?
-        """, (list_id, username))
-        
-        if not cursor.fetchone():
-            session["message"] = "You don't have access to this collaboration."
-            return redirect(url_for("collaboration.collaboration"))
-        
+
+    # check if user has access to this collaboration
+    access = collab_acl.for_list(session["user_id"], list_id)
+    if not access or not access.member:
+        session["message"] = "You don't have access to this collaboration."
+        return redirect(url_for("collaboration.collaboration"))
+
+    # repeat views are served from the cache until something in the list changes
+    page = board_cache.get_or_load("collab", list_key(list_id), lambda: load_collaboration(list_id))
+    # deleted since the access check
+    if page is None:
+        return "Collaboration not found.", 404
+
+    list_info = page["list_info"]
+    board = page["board"]
+    return render_template("collab_tasks.html",
+                         list_id=list_id,
+                         list_name=list_info[0],
+                         description=list_info[1],
+                         owner=list_info[2],
+                         members=page["members"],
+                         backlog_tasks=board["backlog"],
+                         in_progress_tasks=board["in-progress"],
+                         completed_tasks=board["completed"],
+                         cursors=page["cursors"],
+                         last_event_id=event_bus.last_event_id(),
+                         username=username)
+
+
+def load_collaboration(list_id):
+    with get_cursor(COLLAB_DB) as cursor:
         # get collaboration details
         cursor.execute("""
-            SELECT list_name, description, owner_username 
-            FROM collab_lists WHERE id = ?
+            SELECT cl.list_name, cl.description, a.username
+            FROM collab_lists cl
+            LEFT JOIN accounts.accounts a ON a.id = cl.owner_id
+            WHERE cl.id = ?
         """, (list_id,))
         list_info = cursor.fetchone()
-        
+
         if not list_info:
-            session["message"] = "Collaboration not found."
-            return redirect(url_for("collaboration.collaboration"))
-        
+            return None
+
         # get members
         cursor.execute("""
-            SELECT member_username FROM collab_members 
-            WHERE list_id = ? ORDER BY joined_at
+            SELECT a.username FROM collab_members cm
+            JOIN accounts.accounts a ON a.id = cm.user_id
+            WHERE cm.list_id = ? ORDER BY cm.joined_at
         """, (list_id,))
         members = [row[0] for row in cursor.fetchall()]
-        
-        # get tasks
-        cursor.execute("""
-            SELECT * FROM collab_tasks 
-            WHERE list_id = ? ORDER BY created_at DESC
-        """, (list_id,))
-        
-        tasks = [dict(zip([column[0] for column in cursor.description], row)) 
-                for row in cursor.fetchall()]
-    
-    return render_template("collab_tasks.html",
-                         list_id=list_id,
-                         list_name=list_info[0],
-                         description=list_info[1],
-                         owner=list_info[2],
-                         members=members,
-                         tasks=tasks,
-                         username=username)
+
+        # first page of every column, the rest is loaded as the user scrolls
+        board, cursors = fetch_first_pages(cursor, "collab_tasks", BOARD_COLUMNS, "list_id = ?", (list_id,))
+
+    return {"list_info": list_info, "members": members, "board": board, "cursors": cursors}
+
+@collab_bp.route("/collaboration/<int:list_id>/tasks")
+@conditional(member_list_keys)
+def list_collab_tasks(list_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    status = request.args.get("status", "backlog")
+    if status not in STATUSES:
+        return jsonify({"error": "Invalid status"}), 400
+
+    try:
+        limit = page_limit(request.args.get("limit"))
+        after = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    access = collab_acl.for_list(session["user_id"], list_id)
+    if not access or not access.member:
+        return jsonify({"error": "You don't have access to this collaboration"}), 403
+
+    with get_cursor(COLLAB_DB) as cursor:
+        rows, next_cursor = fetch_page(cursor, "collab_tasks", BOARD_COLUMNS, "list_id = ?",
+                                       (list_id,), status, after, limit)
+
+    return jsonify({
+        "tasks": [task_json(row, BOARD_FIELDS) for row in rows],
+        "next_cursor": next_cursor
+    })
+
+@collab_bp.route("/collaboration/<int:list_id>/events")
+def collab_events(list_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    access = collab_acl.for_list(session["user_id"], list_id)
+    if not access or not access.member:
+        return jsonify({"error": "You don't have access to this collaboration"}), 403
+
+    # EventSource resends the last id it saw when reconnecting, the first
+    # connection passes the id the page was rendered with
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    if not event_bus.has_room(list_key(list_id)):
+        return jsonify({"error": "Too many live connections, try again later"}), 503
+
+    return Response(event_bus.stream(list_key(list_id), last_event_id), mimetype="text/event-stream",
+                    headers={"X-Accel-Buffering": "no"})
 
 @collab_bp.route("/add_collab_member/<int:list_id>", methods=["POST"])
 def add_collab_member(list_id):
     if "username" not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    username = session["username"]
     data = request.get_json()
     new_member = data.get("username")
     
@@ -196,40 +262,99 @@ def add_collab_member(list_id):
         return jsonify({"error": "Username required"}), 400
     
     # check if current user is the owner
-    with sqlite3.connect(COLLAB_DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT owner_username FROM collab_lists WHERE id = ?", (list_id,))
-        result = cursor.fetchone()
-        
-        if not result or result[0] != username:
-            return jsonify({"error": "Only the owner can add members"}), 403
-        
-        # check if new member exists
-        with sqlite3.connect(DB_NAME) as accounts_conn:
-            accounts_cursor = accounts_conn.cursor()
-            accounts_cursor.execute("SELECT username FROM accounts WHERE username = ?", (new_member,))
-            if not accounts_cursor.fetchone():
-                return jsonify({"error": "User not found"}), 404
-        
-        # add member
-        try:
-            cursor.execute("""
-                INSERT INTO collab_members (list_id, member_username)
-                VALUES (?, ?)
-            """, (list_id, new_member))
-            conn.commit()
-            
-            return jsonify({"success": True, "message": f"Added {new_member} to collaboration"})
-        
-        except sqlite3.IntegrityError:
-            return jsonify({"error": "User is already a member"}), 400
+    access = collab_acl.for_list(session["user_id"], list_id)
+    if not access or not access.owner:
+        return jsonify({"error": "Only the owner can add members"}), 403
+
+    # check if new member exists
+    with get_cursor(DB_NAME) as accounts_cursor:
+        accounts_cursor.execute("SELECT id FROM accounts WHERE username = ?", (new_member,))
+        row = accounts_cursor.fetchone()
+        if not row:
+            return jsonify({"error": "User not found"}), 404
+    member_id = row[0]
+
+    # add member
+    try:
+        write(COLLAB_DB, lambda cursor: cursor.execute("""
+            INSERT INTO collab_members (list_id, user_id)
+            VALUES (?, ?)
+        """, (list_id, member_id)).rowcount)
+
+    except sqlite3.IntegrityError:
+        return jsonify({"error": "User is already a member"}), 400
+
+    collab_acl.members_added(list_id, [member_id])
+    board_cache.bump(list_key(list_id))
+    board_cache.bump(memberships_key(member_id))
+    publish(list_id, "members", {"added": [new_member]})
+    return jsonify({"success": True, "message": f"Added {new_member} to collaboration"})
+
+@collab_bp.route("/collaboration/<int:list_id>/members", methods=["POST"])
+def invite_collab_members(list_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    username = session["username"]
+
+    # JSON {"usernames": [...]} or a form with a pasted list and/or a CSV upload
+    data = request.get_json(silent=True)
+    if data is not None:
+        usernames = data.get("usernames")
+        if not isinstance(usernames, list) or not all(isinstance(name, str) for name in usernames):
+            return jsonify({"error": "usernames must be a list of strings"}), 400
+        names = [name.strip() for name in usernames if name.strip()]
+    else:
+        names = parse_invites(request.form.get("members", ""), request.files.get("members_csv"))
+
+    if not names:
+        return jsonify({"error": "Username required"}), 400
+    if len(names) > MAX_INVITES:
+        return jsonify({"error": f"At most {MAX_INVITES} members can be invited at once"}), 400
+
+    access = collab_acl.for_list(session["user_id"], list_id)
+    if not access or not access.owner:
+        return jsonify({"error": "Only the owner can add members"}), 403
+
+    valid, invalid, duplicates = check_invites(names, skip={username})
+    if invalid:
+        return jsonify({
+            "error": invite_error(invalid, duplicates),
+            "invalid": invalid,
+            "duplicates": duplicates
+        }), 400
+
+    def invite(cursor):
+        cursor.execute(
+            "SELECT user_id FROM collab_members WHERE list_id = ?", (list_id,)
+        )
+        current = {row[0] for row in cursor.fetchall()}
+        added = [name for name, user_id in valid.items() if user_id not in current]
+        add_members(cursor, list_id, [valid[name] for name in added])
+        return current, added
+
+    current, added = write(COLLAB_DB, invite)
+
+    if added:
+        collab_acl.members_added(list_id, [valid[name] for name in added])
+        board_cache.bump(list_key(list_id))
+        for name in added:
+            board_cache.bump(memberships_key(valid[name]))
+        publish(list_id, "members", {"added": added})
+
+    return jsonify({
+        "success": True,
+        "added": added,
+        "already_members": [name for name, user_id in valid.items() if user_id in current],
+        "duplicates": duplicates
+    })
 
 @collab_bp.route("/add_collab_task/<int:list_id>", methods=["POST"])
 def add_collab_task(list_id):
     if "username" not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    username = session["username"]
+    user_id = session["user_id"]
     data = request.get_json()
     name = data.get("name")
     priority = data.get("priority")
@@ -238,66 +363,62 @@ def add_collab_task(list_id):
     
     if not name:
         return jsonify({"error": "Task name required"}), 400
+    error = field_error(data)
+    if error:
+        return jsonify({"error": error}), 400
     
     # check if user has access to this collaboration
-    with sqlite3.connect(COLLAB_DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT 1 FROM collab_members 
-            WHERE list_id = ? AND member_username = ?
-        """, (list_id, username))
-        
-        if not cursor.fetchone():
-            return jsonify({"error": "You don't have access to this collaboration"}), 403
-        
-        # add task
-        cursor.execute("""
-            INSERT INTO collab_tasks (list_id, name, priority, date, time, created_by)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (list_id, name, priority, date, time, username))
-        
-        task_id = cursor.lastrowid
-        conn.commit()
+    access = collab_acl.for_list(user_id, list_id)
+    if not access or not access.member:
+        return jsonify({"error": "You don't have access to this collaboration"}), 403
+
+    # add task, at the end of the backlog column
+    task = task_json(write(COLLAB_DB, lambda cursor: cursor.execute(f"""
+        INSERT INTO collab_tasks (list_id, name, priority, date, time, creator_id, position)
+        VALUES (?, ?, ?, ?, ?, ?, {end_position("collab_tasks")})
+        RETURNING {BOARD_COLUMNS}
+    """, (list_id, name, priority, date, time, user_id, list_id, "backlog")).fetchone()), BOARD_FIELDS)
+    collab_acl.task_created(task["id"], list_id, user_id)
+    board_cache.bump(list_key(list_id))
+    publish(list_id, "task", task)
     
-    return jsonify({
-        "id": task_id, 
-        "name": name, 
-        "priority": priority, 
-        "date": date, 
-        "time": time,
-        "created_by": username
-    })
+    return jsonify(task)
 
 @collab_bp.route("/edit_collab_task/<int:task_id>", methods=["PUT"])
 def edit_collab_task(task_id):
     if "username" not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    username = session["username"]
     data = request.get_json()
     name = data.get("name")
     priority = data.get("priority")
     date = data.get("date")
     time = data.get("time")
+
+    error = field_error(data)
+    if error:
+        return jsonify({"error": error}), 400
     
     # check if user has access to edit this task
-    with sqlite3.connect(COLLAB_DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT ct.list_id FROM collab_tasks ct
-            JOIN collab_members cm ON ct.list_id = cm.list_id
-            WHERE ct.id = ? AND cm.member_username = ?
-        """, (task_id, username))
-        
-        if not cursor.fetchone():
-            return jsonify({"error": "You don't have access to edit this task"}), 403
-        
-        cursor.execute("""
-            UPDATE collab_tasks 
-            SET name=?, priority=?, date=?, time=? 
-            WHERE id=?
-        """, (name, priority, date, time, task_id))
-        conn.commit()
+    access = collab_acl.for_task(session["user_id"], task_id)
+    if not access or not access.member:
+        return jsonify({"error": "You don't have access to edit this task"}), 403
+
+    row = write(COLLAB_DB, lambda cursor: cursor.execute(f"""
+        UPDATE collab_tasks 
+        SET name=?, priority=?, date=?, time=? 
+        WHERE id=?
+        RETURNING {BOARD_COLUMNS}
+    """, (name, priority, date, time, task_id)).fetchone())
+
+    # deleted by someone else since it was cached
+    if row is None:
+        collab_acl.task_deleted(task_id)
+        return jsonify({"error": "You don't have access to edit this task"}), 403
+
+    task = task_json(row, BOARD_FIELDS)
+    board_cache.bump(list_key(access.list_id))
+    publish(access.list_id, "task", task)
     
     return jsonify({"success": True})
 
@@ -306,33 +427,24 @@ def delete_collab_task(task_id):
     if "username" not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    username = session["username"]
-    
     # check if user has access to delete this task
-    with sqlite3.connect(COLLAB_DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT ct.list_id, ct.created_by FROM collab_tasks ct
-            JOIN collab_members cm ON ct.list_id = cm.list_id
-            WHERE ct.id = ? AND cm.member_username = ?
-        """, (task_id, username))
-        
-        result = cursor.fetchone()
-        if not result:
-            return jsonify({"error": "You don't have access to delete this task"}), 403
-        
-        # allow deletion if user created the task or is the list owner
-        list_id = result[0]
-        created_by = result[1]
-        
-        cursor.execute("SELECT owner_username FROM collab_lists WHERE id = ?", (list_id,))
-        owner = cursor.fetchone()[0]
-        
-        if username != created_by and username != owner:
-            return jsonify({"error": "Only task creator or list owner can delete tasks"}), 403
-        
-        cursor.execute("DELETE FROM collab_tasks WHERE id=?", (task_id,))
-        conn.commit()
+    access = collab_acl.for_task(session["user_id"], task_id)
+    if not access or not access.member:
+        return jsonify({"error": "You don't have access to delete this task"}), 403
+
+    # allow deletion if user created the task or is the list owner
+    if not access.creator and not access.owner:
+        return jsonify({"error": "Only task creator or list owner can delete tasks"}), 403
+
+    list_id = access.list_id
+    deleted = write(COLLAB_DB, lambda cursor: cursor.execute(
+        "DELETE FROM collab_tasks WHERE id=?", (task_id,)).rowcount)
+    collab_acl.task_deleted(task_id)
+
+    if not deleted:
+        return jsonify({"error": "You don't have access to delete this task"}), 403
+    board_cache.bump(list_key(list_id))
+    publish(list_id, "task_deleted", {"id": task_id})
     
     return jsonify({"success": True})
 
@@ -341,7 +453,6 @@ def update_collab_task_status(task_id):
     if "username" not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    username = session["username"]
     data = request.get_json()
     status = data.get("status")
     
@@ -349,37 +460,272 @@ def update_collab_task_status(task_id):
         return jsonify({"success": False, "error": "Invalid status"})
     
     # check if user has access to this task
-    with sqlite3.connect(COLLAB_DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT 1 FROM collab_tasks ct
-            JOIN collab_members cm ON ct.list_id = cm.list_id
-            WHERE ct.id = ? AND cm.member_username = ?
-        """, (task_id, username))
-        
-        if not cursor.fetchone():
-            return jsonify({"error": "You don't have access to this task"}), 403
-        
-        cursor.execute("UPDATE collab_tasks SET status=? WHERE id=?", (status, task_id))
-        conn.commit()
+    access = collab_acl.for_task(session["user_id"], task_id)
+    if not access or not access.member:
+        return jsonify({"error": "You don't have access to this task"}), 403
+
+    row = write(COLLAB_DB, lambda cursor: cursor.execute(
+        status_sql("collab_tasks") + f"RETURNING {BOARD_COLUMNS}",
+        (status, status, status, task_id)).fetchone())
+
+    # deleted by someone else since it was cached
+    if row is None:
+        collab_acl.task_deleted(task_id)
+        return jsonify({"error": "You don't have access to this task"}), 403
+
+    task = task_json(row, BOARD_FIELDS)
+    board_cache.bump(list_key(access.list_id))
+    publish(access.list_id, "task", task)
     
     return jsonify({"success": True})
 
+def spread_done(list_id):
+    # the cards around a crowded spot were renumbered after the response
+    def done():
+        board_cache.bump(list_key(list_id))
+        publish(list_id, "resync", {})
+    return done
+
+# PUT /move_collab_task/<id> {"status": ..., "before": id|null, "after": id|null}
+# drops the task into a column between two of its cards, at the end without either
+@collab_bp.route("/move_collab_task/<int:task_id>", methods=["PUT"])
+def move_collab_task(task_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    data = request.get_json(silent=True) or {}
+    status = data.get("status")
+    before = data.get("before")
+    after = data.get("after")
+    if status not in STATUSES:
+        return jsonify({"error": "Invalid status"}), 400
+    if not all(neighbour is None or type(neighbour) is int for neighbour in (before, after)):
+        return jsonify({"error": "before and after must be task ids"}), 400
+
+    # check if user has access to this task
+    access = collab_acl.for_task(session["user_id"], task_id)
+    if not access or not access.member:
+        return jsonify({"error": "You don't have access to this task"}), 403
+    list_id = access.list_id
+
+    def run(cursor):
+        moved = move(cursor, "collab_tasks", task_id, list_id, status, before, after)
+        if moved is None:
+            return None, None
+        cursor.execute(f"SELECT {BOARD_COLUMNS} FROM collab_tasks WHERE id = ?", (task_id,))
+        return moved, task_json(cursor.fetchone(), BOARD_FIELDS)
+
+    try:
+        moved, task = write(COLLAB_DB, run)
+    except InvalidMove as e:
+        return jsonify({"error": str(e)}), 400
+
+    # deleted by someone else since it was cached
+    if moved is None:
+        collab_acl.task_deleted(task_id)
+        return jsonify({"error": "You don't have access to this task"}), 403
+
+    board_cache.bump(list_key(list_id))
+    # a move that had to renumber its neighbours changed more than this card
+    if moved.spread:
+        publish(list_id, "resync", {})
+    else:
+        publish(list_id, "task", task)
+    if moved.crowded:
+        spread_later(COLLAB_DB, "collab_tasks", list_id, status, moved.position, spread_done(list_id))
+
+    return jsonify({"success": True, "status": status, "position": moved.position})
+
+@collab_bp.route("/collaboration/<int:list_id>/tasks/batch", methods=["POST"])
+def batch_collab_tasks(list_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    user_id = session["user_id"]
+    operations, results, error = parse_batch(request.get_json())
+    if error:
+        return jsonify({"error": error}), 400
+    if any("error" in result for result in results):
+        return jsonify({"success": False, "results": results}), 400
+
+    ids = referenced_ids(operations)
+
+    # permissions for the whole batch up front, then every change in one transaction
+    access = collab_acl.for_list(user_id, list_id)
+    if not access or not access.member:
+        return jsonify({"error": "You don't have access to this collaboration"}), 403
+
+    deleted = [op["id"] for op in operations if op["op"] == "delete"]
+
+    def run(cursor):
+        creators = {}
+        if ids:
+            cursor.execute(
+                f"SELECT id, creator_id FROM collab_tasks WHERE list_id = ? AND id IN ({id_placeholders(ids)})",
+                (list_id, *ids),
+            )
+            creators = dict(cursor.fetchall())
+
+        denied = deny_unlisted(operations, results, creators, "Task is not in this collaboration")
+
+        # allow deletion if user created the task or is the list owner
+        if not access.owner:
+            for op, result in zip(operations, results):
+                if op["op"] == "delete" and "error" not in result and creators[op["id"]] != user_id:
+                    result["error"] = "Only task creator or list owner can delete tasks"
+                    denied = True
+
+        if denied:
+            return None
+
+        apply_batch(cursor, "collab_tasks", operations, results,
+                    {"list_id": list_id, "creator_id": user_id})
+
+        # current rows of everything the batch touched, for the live board
+        changed = list({result["id"] if op["op"] == "create" else op["id"]
+                        for op, result in zip(operations, results)} - set(deleted))
+        cursor.execute(
+            f"SELECT {BOARD_COLUMNS} FROM collab_tasks WHERE id IN ({id_placeholders(changed)})",
+            changed,
+        )
+        return [task_json(row, BOARD_FIELDS) for row in cursor.fetchall()]
+
+    tasks = write(COLLAB_DB, run)
+    if tasks is None:
+        return jsonify({"success": False, "results": results}), 403
+    for op, result in zip(operations, results):
+        if op["op"] == "create":
+            collab_acl.task_created(result["id"], list_id, user_id)
+    for task_id in deleted:
+        collab_acl.task_deleted(task_id)
+    board_cache.bump(list_key(list_id))
+    for task in tasks:
+        publish(list_id, "task", task)
+    for task_id in deleted:
+        publish(list_id, "task_deleted", {"id": task_id})
+
+    return jsonify({"success": True, "results": results})
+
+# GET /collaboration/<list_id>/archive?cursor=&limit=
+# the list's completed tasks moved off the board by archive.py, newest completed first
+@collab_bp.route("/collaboration/<int:list_id>/archive")
+@conditional(member_list_keys)
+def archived_collab_tasks(list_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    access = collab_acl.for_list(session["user_id"], list_id)
+    if not access or not access.member:
+        return jsonify({"error": "You don't have access to this collaboration"}), 403
+
+    try:
+        limit = page_limit(request.args.get("limit"))
+        after = decode_cursor(request.args["cursor"], ARCHIVE_ORDER) if request.args.get("cursor") else None
+        if after is not None and not all(isinstance(value, int) for value in after):
+            raise ValueError("Invalid cursor")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with get_cursor(COLLAB_DB) as cursor:
+        rows, next_cursor = fetch_archived(cursor, "collab_tasks", ARCHIVED_COLUMNS, list_id, after, limit)
+
+    return jsonify({
+        "tasks": [task_json(row, ARCHIVED_FIELDS) for row in rows],
+        "next_cursor": next_cursor
+    })
+
+# POST /collaboration/<list_id>/archive/<id>/restore  any member, back to the end of the completed column
+@collab_bp.route("/collaboration/<int:list_id>/archive/<int:task_id>/restore", methods=["POST"])
+def restore_collab_task(list_id, task_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    access = collab_acl.for_list(session["user_id"], list_id)
+    if not access or not access.member:
+        return jsonify({"error": "You don't have access to this collaboration"}), 403
+
+    def run(cursor):
+        row = restore(cursor, "collab_tasks", task_id, list_id, f"creator_id, {BOARD_COLUMNS}")
+        if row is None:
+            return None
+        return row[0], task_json(row[1:], BOARD_FIELDS)
+
+    restored = write(COLLAB_DB, run)
+    if not restored:
+        return jsonify({"error": "No archived task with that id"}), 404
+    creator_id, task = restored
+    collab_acl.task_created(task_id, list_id, creator_id)
+    board_cache.bump(list_key(list_id))
+    publish(list_id, "task", task)
+
+    return jsonify({"success": True, "task": task})
+
+# GET /collaboration/<list_id>/export?format=csv|ndjson
+# the whole list for any member, streamed in id order. archived tasks are included
+# with status "completed", the export does not say when they were archived
+@collab_bp.route("/collaboration/<int:list_id>/export")
+def export_collab_tasks(list_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in FORMATS:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+
+    access = collab_acl.for_list(session["user_id"], list_id)
+    if not access or not access.member:
+        return jsonify({"error": "You don't have access to this collaboration"}), 403
+
+    chunks = export_chunks(COLLAB_DB, "collab_tasks", EXPORT_FIELDS, "list_id", list_id, columns=EXPORT_COLUMNS)
+    return export_response(fmt, EXPORT_FIELDS, chunks, f"collaboration-{list_id}")
+
+# POST /collaboration/<list_id>/import[?format=csv|ndjson&progress=1], multipart upload in "file".
+# any member can import, the tasks are created by them
+@collab_bp.route("/collaboration/<int:list_id>/import", methods=["POST"])
+def import_collab_tasks(list_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    user_id = session["user_id"]
+    access = collab_acl.for_list(user_id, list_id)
+    if not access or not access.member:
+        return jsonify({"error": "You don't have access to this collaboration"}), 403
+
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "Upload a CSV or NDJSON file as 'file'"}), 400
+    progress = request.args.get("progress") == "1"
+    try:
+        rows = upload_rows(upload, request.args.get("format"), keep=progress)
+    except InvalidImport as e:
+        return jsonify({"error": str(e)}), 400
+
+    def updates():
+        owner = {"list_id": list_id, "creator_id": user_id}
+        for update in run_import(COLLAB_DB, "collab_tasks", owner, rows,
+                                 lambda: board_cache.bump(list_key(list_id))):
+            # one resync for open boards instead of an event per imported task
+            if update.get("done") and update["imported"]:
+                publish(list_id, "resync", {})
+            yield update
+
+    return import_response(updates(), progress)
+
 @collab_bp.route("/get_collab_lists")
+@conditional(lambda: [memberships_key(session["user_id"])])
 def get_collab_lists():
     if "username" not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    username = session["username"]
+    user_id = session["user_id"]
     
-    with sqlite3.connect(COLLAB_DB) as conn:
-        cursor = conn.cursor()
+    with get_cursor(COLLAB_DB) as cursor:
         cursor.execute("""
             SELECT cl.id, cl.list_name, cl.description 
             FROM collab_lists cl
             JOIN collab_members cm ON cl.id = cm.list_id
-            WHERE cm.member_username = ?
-        """, (username,))
+            WHERE cm.user_id = ?
+        """, (user_id,))
         lists = cursor.fetchall()
     
     return jsonify([{"id": row[0], "name": row[1], "description": row[2]} for row in lists])
\ No newline at end of file
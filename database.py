@@ -1,78 +1,581 @@
+import re
 import sqlite3
-import os
+import sys
+
+from boards import TASK_ORDER, CREATED_BY, changes_sql, export_sql, due_sql, archive_sql
 
 DB_NAME = "accounts.db"
 TASK_DB = "todo.db"
 COLLAB_DB = "collaborations.db"
 
-def init_db():
-    if not os.path.exists(DB_NAME):
-        with sqlite3.connect(DB_NAME) as conn:
-            conn.execute("""
-                CREATE TABLE accounts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    full_name TEXT NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    username TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL,
-                    security_question TEXT NOT NULL
-                )
-            """)
-        print("Accounts DB created.")
+# each migration is a list of steps, a step is an SQL string or a function
+# taking the connection. PRAGMA user_version records how many have been applied,
+# so only append new migrations, never edit one that has shipped.
+ACCOUNTS_MIGRATIONS = [
+    # 1: base schema
+    [
+        """
+        CREATE TABLE IF NOT EXISTS accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            full_name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            security_question TEXT NOT NULL
+        )
+        """,
+    ],
+]
+
+def _sort_columns(table):
+    # virtual columns cost no storage and always follow priority/date/time
+    return [
+        f"""
+        ALTER TABLE {table} ADD COLUMN priority_rank INTEGER GENERATED ALWAYS AS (
+            CASE priority WHEN 'high' THEN 1 WHEN 'mid' THEN 2 WHEN 'low' THEN 3 ELSE 4 END
+        ) VIRTUAL
+        """,
+        f"ALTER TABLE {table} ADD COLUMN sort_date TEXT GENERATED ALWAYS AS (COALESCE(date, '')) VIRTUAL",
+        f"ALTER TABLE {table} ADD COLUMN sort_time TEXT GENERATED ALWAYS AS (COALESCE(time, '')) VIRTUAL",
+    ]
+
+
+def _due_column(table, scope):
+    # date and time as one number, read as UTC so it stays the wall-clock time that was
+    # typed in. no time means the end of the day, no or malformed date gives NULL.
+    # the index leaves completed tasks out, the due views never show them
+    return [
+        f"""
+        ALTER TABLE {table} ADD COLUMN due_at INTEGER GENERATED ALWAYS AS (
+            CAST(strftime('%s', date || ' ' || COALESCE(NULLIF(time, ''), '23:59:59')) AS INTEGER)
+        ) VIRTUAL
+        """,
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_due ON {table} ({scope}, due_at) WHERE status != 'completed'",
+    ]
+
+
+def _position_column(table, scope):
+    # manual order within each (scope, status) column, see positions.py. existing cards
+    # are numbered in the order the boards showed them so far: priority, date, time
+    return [
+        f"ALTER TABLE {table} ADD COLUMN position REAL",
+        "CREATE TEMP TABLE positions (id INTEGER PRIMARY KEY, position REAL NOT NULL)",
+        f"""
+        INSERT INTO temp.positions (id, position)
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY {scope}, status ORDER BY priority_rank, sort_date, sort_time, id
+        ) FROM {table}
+        """,
+        f"UPDATE {table} SET position = (SELECT position FROM temp.positions WHERE id = {table}.id)",
+        "DROP TABLE temp.positions",
+        f"DROP INDEX IF EXISTS idx_{table}_board",
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_board ON {table} ({scope}, status, position)",
+    ]
+
+
+def _completed_at(table):
+    # when a task reached the completed column, for archiving (see archive.py). set by
+    # triggers so every way of changing status counts, cleared when it leaves the column.
+    # nobody knows when existing tasks were completed, they count from the upgrade
+    now = "CAST(strftime('%s', 'now') AS INTEGER)"
+    return [
+        f"ALTER TABLE {table} ADD COLUMN completed_at INTEGER",
+        f"UPDATE {table} SET completed_at = {now} WHERE status = 'completed'",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_completed_insert AFTER INSERT ON {table}
+        WHEN NEW.status = 'completed' AND NEW.completed_at IS NULL
+        BEGIN
+            UPDATE {table} SET completed_at = {now} WHERE id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_completed_update AFTER UPDATE OF status ON {table}
+        WHEN NEW.status IS NOT OLD.status
+        BEGIN
+            UPDATE {table} SET completed_at = CASE WHEN NEW.status = 'completed' THEN {now} END
+            WHERE id = NEW.id;
+        END
+        """,
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_completed ON {table} (completed_at) WHERE status = 'completed'",
+    ]
+
+
+def _change_tracking(table, scope):
+    # every insert, update and delete takes the next value of the file's change
+    # counter as the row's rev, deletes leave a tombstone behind, so a client can
+    # ask for everything in its scope (a user or a list) changed after a rev.
+    # existing rows get rev = id, unique and below anything new
+    tombstones = f"{table}_deleted"
+    return [
+        "CREATE TABLE IF NOT EXISTS change_counter (id INTEGER PRIMARY KEY CHECK (id = 1), rev INTEGER NOT NULL)",
+        f"ALTER TABLE {table} ADD COLUMN rev INTEGER NOT NULL DEFAULT 0",
+        f"UPDATE {table} SET rev = id",
+        f"INSERT INTO change_counter (id, rev) SELECT 1, COALESCE(MAX(id), 0) FROM {table}",
+        f"""
+        CREATE TABLE IF NOT EXISTS {tombstones} (
+            task_id INTEGER PRIMARY KEY,
+            {scope} NOT NULL,
+            rev INTEGER NOT NULL
+        )
+        """,
+        *_rev_triggers(table, scope),
+    ]
+
+
+def _rev_triggers(table, scope):
+    tombstones = f"{table}_deleted"
+    next_rev = "UPDATE change_counter SET rev = rev + 1"
+    stamp = f"UPDATE {table} SET rev = (SELECT rev FROM change_counter) WHERE id = NEW.id"
+    return [
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_rev ON {table} ({scope}, rev)",
+        f"CREATE INDEX IF NOT EXISTS idx_{tombstones}_rev ON {tombstones} ({scope}, rev)",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_rev_insert AFTER INSERT ON {table}
+        BEGIN
+            {next_rev};
+            {stamp};
+        END
+        """,
+        # the stamp itself only changes rev, which the WHEN clause skips
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_rev_update AFTER UPDATE ON {table}
+        WHEN NEW.rev = OLD.rev
+        BEGIN
+            {next_rev};
+            {stamp};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_rev_delete AFTER DELETE ON {table}
+        BEGIN
+            {next_rev};
+            INSERT OR REPLACE INTO {tombstones} (task_id, {scope}, rev)
+            SELECT OLD.id, OLD.{scope}, rev FROM change_counter;
+        END
+        """,
+    ]
+
+
+def _search_index(table, scope):
+    # external-content FTS5 index over the task name. the scope column (owner
+    # or list id) is indexed too, so a search intersects with the user's own
+    # rows inside the index instead of filtering every match afterwards
+    fts = f"{table}_fts"
+    insert = f"INSERT INTO {fts} (rowid, name, {scope}) VALUES (NEW.id, NEW.name, NEW.{scope})"
+    delete = f"INSERT INTO {fts} ({fts}, rowid, name, {scope}) VALUES ('delete', OLD.id, OLD.name, OLD.{scope})"
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            name, {scope},
+            content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        # only the name counts towards relevance
+        f"INSERT INTO {fts} ({fts}, rank) VALUES ('rank', 'bm25(10.0, 0.0)')",
+        f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {insert}; END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {delete}; END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF name, {scope} ON {table} BEGIN {delete}; {insert}; END",
+    ]
+
+
+def _drop_scope_objects(table):
+    # everything _rev_triggers and _search_index build on the scope column
+    fts = f"{table}_fts"
+    return [
+        *(f"DROP TRIGGER IF EXISTS {table}_rev_{event}" for event in ("insert", "update", "delete")),
+        *(f"DROP TRIGGER IF EXISTS {fts}_{event}" for event in ("insert", "delete", "update")),
+        f"DROP TABLE IF EXISTS {fts}",
+        f"DROP INDEX IF EXISTS idx_{table}_rev",
+        f"DROP INDEX IF EXISTS idx_{table}_deleted_rev",
+    ]
+
+
+def _load_user_ids(conn):
+    # accounts live in their own file: copy username -> id into a temp table the
+    # UPDATEs below can join against (ATTACH is not allowed inside the migration's transaction)
+    accounts = sqlite3.connect(DB_NAME)
+    try:
+        rows = accounts.execute("SELECT username, id FROM accounts").fetchall()
+    finally:
+        accounts.close()
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS user_ids (username TEXT PRIMARY KEY, id INTEGER NOT NULL)")
+    conn.execute("DELETE FROM temp.user_ids")
+    conn.executemany("INSERT INTO temp.user_ids (username, id) VALUES (?, ?)", rows)
+
+
+def _username_to_id(table, old, new):
+    # rows whose name has no account (left behind by renames before ids) get 0,
+    # no account has that id, so they stay in the file but show up nowhere.
+    # ADD COLUMN needs a default for NOT NULL, the app always sets it
+    return [
+        f"ALTER TABLE {table} ADD COLUMN {new} INTEGER NOT NULL DEFAULT 0",
+        f"UPDATE {table} SET {new} = COALESCE((SELECT id FROM temp.user_ids WHERE username = {table}.{old}), 0)",
+        f"ALTER TABLE {table} DROP COLUMN {old}",
+    ]
+
+
+TASKS_MIGRATIONS = [
+    # 1: base schema
+    [
+        """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            name TEXT NOT NULL,
+            priority TEXT,
+            date TEXT,
+            time TEXT,
+            status TEXT DEFAULT 'backlog'
+        )
+        """,
+    ],
+    # 2: board lookups by owner and column
+    [
+        "CREATE INDEX IF NOT EXISTS idx_tasks_username_status ON tasks (username, status)",
+    ],
+    # 3: generated sort columns and a board index in display order, for keyset pages
+    [
+        *_sort_columns("tasks"),
+        "CREATE INDEX IF NOT EXISTS idx_tasks_board ON tasks (username, status, priority_rank, sort_date, sort_time)",
+        "DROP INDEX IF EXISTS idx_tasks_username_status",
+    ],
+    # 4: change revisions and tombstones for delta sync
+    _change_tracking("tasks", "username"),
+    # 5: full-text search on task names
+    _search_index("tasks", "username"),
+    # 6: (username, rowid) order, exports walk a user's tasks by id
+    [
+        "CREATE INDEX IF NOT EXISTS idx_tasks_username ON tasks (username)",
+    ],
+    # 7: owner by accounts.id instead of username, renames no longer orphan tasks
+    [
+        _load_user_ids,
+        *_drop_scope_objects("tasks"),
+        "DROP INDEX IF EXISTS idx_tasks_board",
+        "DROP INDEX IF EXISTS idx_tasks_username",
+        *_username_to_id("tasks", "username", "user_id"),
+        *_username_to_id("tasks_deleted", "username", "user_id"),
+        "CREATE INDEX IF NOT EXISTS idx_tasks_board ON tasks (user_id, status, priority_rank, sort_date, sort_time)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user ON tasks (user_id)",
+        *_rev_triggers("tasks", "user_id"),
+        *_search_index("tasks", "user_id"),
+    ],
+    # 8: due date as a number for the overdue and upcoming views
+    _due_column("tasks", "user_id"),
+    # 9: cards keep the order users drag them into
+    _position_column("tasks", "user_id"),
+    # 10: long completed tasks move to an archive table
+    [
+        *_completed_at("tasks"),
+        """
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            priority TEXT,
+            date TEXT,
+            time TEXT,
+            completed_at INTEGER NOT NULL,
+            archived_at INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_tasks_archive_user ON tasks_archive (user_id, completed_at)",
+    ],
+    # 11: (user_id, rowid) order, exports walk the archive by id too
+    [
+        "CREATE INDEX IF NOT EXISTS idx_tasks_archive_user_id ON tasks_archive (user_id)",
+    ],
+]
+
+COLLAB_MIGRATIONS = [
+    # 1: base schema
+    [
+        """
+        CREATE TABLE IF NOT EXISTS collab_lists (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            list_name TEXT NOT NULL,
+            description TEXT,
+            owner_username TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS collab_members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            list_id INTEGER NOT NULL,
+            member_username TEXT NOT NULL,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (list_id) REFERENCES collab_lists (id) ON DELETE CASCADE,
+            UNIQUE(list_id, member_username)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS collab_tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            list_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            priority TEXT,
+            date TEXT,
+            time TEXT,
+            status TEXT DEFAULT 'backlog',
+            created_by TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (list_id) REFERENCES collab_lists (id) ON DELETE CASCADE
+        )
+        """,
+    ],
+    # 2: membership lookups and list boards
+    [
+        "CREATE INDEX IF NOT EXISTS idx_collab_lists_owner ON collab_lists (owner_username)",
+        "CREATE INDEX IF NOT EXISTS idx_collab_members_member ON collab_members (member_username, list_id)",
+        "CREATE INDEX IF NOT EXISTS idx_collab_tasks_list_status ON collab_tasks (list_id, status, created_at)",
+    ],
+    # 3: generated sort columns and a board index in display order, for keyset pages
+    [
+        *_sort_columns("collab_tasks"),
+        "CREATE INDEX IF NOT EXISTS idx_collab_tasks_board ON collab_tasks (list_id, status, priority_rank, sort_date, sort_time)",
+        "DROP INDEX IF EXISTS idx_collab_tasks_list_status",
+    ],
+    # 4: change revisions and tombstones for delta sync
+    _change_tracking("collab_tasks", "list_id"),
+    # 5: full-text search on task names
+    _search_index("collab_tasks", "list_id"),
+    # 6: (list_id, rowid) order, exports walk a list's tasks by id
+    [
+        "CREATE INDEX IF NOT EXISTS idx_collab_tasks_list ON collab_tasks (list_id)",
+    ],
+    # 7: owners, members and creators by accounts.id instead of username
+    [
+        _load_user_ids,
+        "DROP INDEX IF EXISTS idx_collab_lists_owner",
+        *_username_to_id("collab_lists", "owner_username", "owner_id"),
+        "CREATE INDEX IF NOT EXISTS idx_collab_lists_owner ON collab_lists (owner_id)",
+        # the UNIQUE constraint names the column, so members get a new table.
+        # memberships of names without an account are dropped, nobody can log in as them
+        """
+        CREATE TABLE collab_members_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            list_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (list_id) REFERENCES collab_lists (id) ON DELETE CASCADE,
+            UNIQUE(list_id, user_id)
+        )
+        """,
+        """
+        INSERT INTO collab_members_new (id, list_id, user_id, joined_at)
+        SELECT cm.id, cm.list_id, u.id, cm.joined_at
+        FROM collab_members cm JOIN temp.user_ids u ON u.username = cm.member_username
+        """,
+        "DROP TABLE collab_members",
+        "ALTER TABLE collab_members_new RENAME TO collab_members",
+        "CREATE INDEX IF NOT EXISTS idx_collab_members_member ON collab_members (user_id, list_id)",
+        *_username_to_id("collab_tasks", "created_by", "creator_id"),
+    ],
+    # 8: due date as a number for the overdue and upcoming views
+    _due_column("collab_tasks", "list_id"),
+    # 9: cards keep the order users drag them into
+    _position_column("collab_tasks", "list_id"),
+    # 10: long completed tasks move to an archive table
+    [
+        *_completed_at("collab_tasks"),
+        """
+        CREATE TABLE IF NOT EXISTS collab_tasks_archive (
+            id INTEGER PRIMARY KEY,
+            list_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            priority TEXT,
+            date TEXT,
+            time TEXT,
+            creator_id INTEGER NOT NULL,
+            created_at TIMESTAMP,
+            completed_at INTEGER NOT NULL,
+            archived_at INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_collab_tasks_archive_list ON collab_tasks_archive (list_id, completed_at)",
+    ],
+    # 11: (list_id, rowid) order, exports walk the archive by id too
+    [
+        "CREATE INDEX IF NOT EXISTS idx_collab_tasks_archive_list_id ON collab_tasks_archive (list_id)",
+    ],
+]
+
+MIGRATIONS = {
+    DB_NAME: ACCOUNTS_MIGRATIONS,
+    TASK_DB: TASKS_MIGRATIONS,
+    COLLAB_DB: COLLAB_MIGRATIONS,
+}
+
+
+def migrate(db_file, migrations):
+    # autocommit mode so the whole upgrade runs in one explicit transaction,
+    # BEGIN IMMEDIATE makes concurrent workers wait instead of migrating twice
+    conn = sqlite3.connect(db_file, isolation_level=None, timeout=30)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            start = conn.execute("PRAGMA user_version").fetchone()[0]
+            for version in range(start + 1, len(migrations) + 1):
+                for step in migrations[version - 1]:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return start, len(migrations)
+
+
+def _report(label, db_file):
+    start, current = migrate(db_file, MIGRATIONS[db_file])
+    if start == current:
+        print(f"{label} DB exists (schema v{current}).")
     else:
-        print("Accounts DB exists.")
+        print(f"{label} DB migrated from v{start} to v{current}.")
+
+
+def init_db():
+    _report("Accounts", DB_NAME)
+
 
 def init_tasks_db():
-    with sqlite3.connect(TASK_DB) as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL,
-                name TEXT NOT NULL,
-                priority TEXT,
-                date TEXT,
-                time TEXT,
-                status TEXT DEFAULT 'backlog'
-            )
-        """)
-    print("Tasks DB initialized.")
+    _report("Tasks", TASK_DB)
+
 
 def init_collaborations_db():
-    if not os.path.exists(COLLAB_DB):
-        with sqlite3.connect(COLLAB_DB) as conn:
-            conn.execute("""
-                CREATE TABLE collab_lists (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    list_name TEXT NOT NULL,
-                    description TEXT,
-                    owner_username TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            conn.execute("""
-                CREATE TABLE collab_members (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    list_id INTEGER NOT NULL,
-                    member_username TEXT NOT NULL,
-                    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (list_id) REFERENCES collab_lists (id) ON DELETE CASCADE,
-                    UNIQUE(list_id, member_username)
-                )
-            """)
-            conn.execute("""
-                CREATE TABLE collab_tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    list_id INTEGER NOT NULL,
-                    name TEXT NOT NULL,
-                    priority TEXT,
-                    date TEXT,
-                    time TEXT,
-                    status TEXT DEFAULT 'backlog',
-                    created_by TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (list_id) REFERENCES collab_lists (id) ON DELETE CASCADE
-                )
-            """)
-        print("Collaborations DB created.")
-    else:
-        print("Collaborations DB exists.")
+    _report("Collaborations", COLLAB_DB)
+
+
+def init_all():
+    init_db()
+    init_tasks_db()
+    init_collaborations_db()
+
+
+# queries run on every page view or mutation, they must be answered from an index
+HOT_QUERIES = [
+    (DB_NAME, "SELECT id, full_name, email, username FROM accounts WHERE username=?"),
+    (DB_NAME, "SELECT username, id FROM accounts WHERE username IN (SELECT value FROM json_each(?))"),
+    (TASK_DB, f"""
+        SELECT id, name, priority, date, time, status, position FROM tasks
+        WHERE user_id = ? AND status = ? AND ({TASK_ORDER}) > (?, ?)
+        ORDER BY {TASK_ORDER} LIMIT ?
+    """),
+    (COLLAB_DB, "SELECT id, list_name, description FROM collab_lists WHERE owner_id = ?"),
+    (COLLAB_DB, """
+        SELECT cl.id, cl.list_name, cl.description
+        FROM collab_members cm
+        JOIN collab_lists cl ON cm.list_id = cl.id
+        WHERE cm.user_id = ? AND cl.owner_id != ?
+    """),
+    (COLLAB_DB, "SELECT 1 FROM collab_members WHERE list_id = ? AND user_id = ?"),
+    (COLLAB_DB, """
+        SELECT a.username FROM collab_members cm
+        JOIN accounts.accounts a ON a.id = cm.user_id
+        WHERE cm.list_id = ? ORDER BY cm.joined_at
+    """),
+    (COLLAB_DB, f"""
+        SELECT id, name, priority, date, time, status, position, {CREATED_BY} FROM collab_tasks
+        WHERE list_id = ? AND status = ? AND ({TASK_ORDER}) > (?, ?)
+        ORDER BY {TASK_ORDER} LIMIT ?
+    """),
+    (COLLAB_DB, "SELECT owner_id FROM collab_lists WHERE id = ?"),
+    (COLLAB_DB, "SELECT user_id FROM collab_members WHERE list_id = ?"),
+    (COLLAB_DB, "SELECT list_id, creator_id FROM collab_tasks WHERE id = ?"),
+    (TASK_DB, changes_sql("tasks", "id, name, priority, date, time, status", "user_id")),
+    (COLLAB_DB, changes_sql("collab_tasks", f"id, name, priority, date, time, status, {CREATED_BY}", "list_id")),
+    (TASK_DB, """
+        SELECT t.id, tasks_fts.rank FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid
+        WHERE tasks_fts MATCH ? AND t.user_id = ?
+        ORDER BY tasks_fts.rank LIMIT ?
+    """),
+    (COLLAB_DB, """
+        SELECT ct.id, collab_tasks_fts.rank FROM collab_tasks_fts
+        JOIN collab_tasks ct ON ct.id = collab_tasks_fts.rowid
+        JOIN collab_lists cl ON cl.id = ct.list_id
+        LEFT JOIN accounts.accounts a ON a.id = ct.creator_id
+        WHERE collab_tasks_fts MATCH ?
+          AND ct.list_id IN (SELECT list_id FROM collab_members WHERE user_id = ?)
+        ORDER BY collab_tasks_fts.rank LIMIT ?
+    """),
+    (TASK_DB, due_sql("tasks", "id, name, due_at", "user_id = ?", seek=" AND (due_at, id) > (?, ?)")),
+    (COLLAB_DB, due_sql("collab_tasks", f"id, name, due_at, {CREATED_BY}",
+                        "list_id IN (SELECT list_id FROM collab_members WHERE user_id = ?)")),
+    (COLLAB_DB, """
+        SELECT cl.id, cl.list_name FROM collab_members cm
+        JOIN collab_lists cl ON cl.id = cm.list_id
+        WHERE cm.user_id = ?
+    """),
+    (TASK_DB, export_sql("tasks", "id, name, priority, date, time, status", "user_id",
+                         "id, name, priority, date, time, 'completed' AS status")),
+    (COLLAB_DB, export_sql("collab_tasks", f"id, name, priority, date, time, status, {CREATED_BY}", "list_id",
+                           f"id, name, priority, date, time, 'completed' AS status, {CREATED_BY}")),
+    # positions.move: the neighbours of a dragged card and the end of a column
+    (TASK_DB, "SELECT position FROM tasks WHERE id = ? AND user_id = ? AND status = ?"),
+    (TASK_DB, """
+        SELECT position FROM tasks WHERE user_id = ? AND status = ? AND id != ?
+        AND (position, id) > (?, ?) ORDER BY position, id LIMIT 1
+    """),
+    (COLLAB_DB, """
+        SELECT position FROM collab_tasks WHERE list_id = ? AND status = ? AND id != ?
+        AND (position, id) < (?, ?) ORDER BY position DESC, id DESC LIMIT 1
+    """),
+    (COLLAB_DB, "SELECT COALESCE(MAX(position), 0) + 1.0 FROM collab_tasks WHERE list_id = ? AND status = ?"),
+    # archive.py: the background job's chunks and the archived pages
+    (TASK_DB, archive_sql("tasks")),
+    (COLLAB_DB, archive_sql("collab_tasks")),
+    (TASK_DB, """
+        SELECT id, name, completed_at FROM tasks_archive
+        WHERE user_id = ? AND (completed_at, id) < (?, ?)
+        ORDER BY completed_at DESC, id DESC LIMIT ?
+    """),
+    (COLLAB_DB, f"""
+        SELECT id, name, completed_at, {CREATED_BY} FROM collab_tasks_archive
+        WHERE list_id = ? ORDER BY completed_at DESC, id DESC LIMIT ?
+    """),
+]
+
+# walking a json_each() parameter list is expected, only real tables count
+_SCAN = re.compile(r"^SCAN (TABLE )?\w+\b(?! VIRTUAL TABLE)")
+
+
+def explain(conn, sql):
+    params = (None,) * sql.count("?")
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def check_query_plans(queries=HOT_QUERIES):
+    from db import connect  # db imports this module
+
+    failures = []
+    for db_file, sql in queries:
+        # the app's connection setup, so accounts.db is attached like in the app
+        conn = connect(db_file, sqlite3.Connection)
+        try:
+            plan = explain(conn, sql)
+        finally:
+            conn.close()
+
+        print(" ".join(sql.split()))
+        for detail in plan:
+            print(f"    {detail}")
+            if _SCAN.match(detail):
+                failures.append((sql, detail))
+
+    if failures:
+        print(f"{len(failures)} hot query step(s) still scan a table.")
+    return failures
+
+
+if __name__ == "__main__":
+    init_all()
+    if "--check" in sys.argv[1:]:
+        sys.exit(1 if check_query_plans() else 0)
@@ -0,0 +1,111 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from database import DB_NAME
+from metrics import TimedConnection
+
+# tuned once per connection, WAL lets readers run while a writer commits
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+)
+
+# size of sqlite3's per-connection prepared statement cache
+STATEMENT_CACHE_SIZE = 256
+
+# idle connections kept per database file, extras are closed on release
+POOL_SIZE = 8
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pool_pid = os.getpid()
+
+
+def connect(db_file, factory=TimedConnection):
+    conn = sqlite3.connect(
+        db_file,
+        timeout=5,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        # cursors time every statement for /metrics and the slow-request log
+        factory=factory,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    # tasks and lists store account ids, queries join accounts.accounts for the usernames
+    if os.path.basename(db_file) != DB_NAME:
+        conn.execute("ATTACH DATABASE ? AS accounts", (os.path.join(os.path.dirname(db_file), DB_NAME),))
+    return conn
+
+
+def _get_pool(db_file):
+    global _pool_pid
+
+    with _pools_lock:
+        # gunicorn forks workers, never share a connection across processes
+        if _pool_pid != os.getpid():
+            _pools.clear()
+            _pool_pid = os.getpid()
+
+        pool = _pools.get(db_file)
+        if pool is None:
+            pool = queue.LifoQueue(maxsize=POOL_SIZE)
+            _pools[db_file] = pool
+        return pool
+
+
+def acquire(db_file):
+    pool = _get_pool(db_file)
+    try:
+        return pool.get_nowait()
+    except queue.Empty:
+        return connect(db_file)
+
+
+def release(db_file, conn):
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _get_pool(db_file).put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+@contextmanager
+def get_connection(db_file):
+    # commits on success and rolls back on error, like "with sqlite3.connect(...)"
+    conn = acquire(db_file)
+    try:
+        with conn:
+            yield conn
+    finally:
+        release(db_file, conn)
+
+
+@contextmanager
+def get_cursor(db_file):
+    with get_connection(db_file) as conn:
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+
+def close_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
@@ -0,0 +1,140 @@
+import calendar
+from datetime import datetime
+
+from flask import Blueprint, session, request, jsonify, url_for
+from db import get_cursor
+from boards import CREATED_BY, due_sql, encode_cursor, decode_cursor, page_limit
+
+due_bp = Blueprint('due', __name__)
+
+# DB files
+TASK_DB = "todo.db"
+COLLAB_DB = "collaborations.db"
+
+DAY = 24 * 60 * 60
+VIEWS = ("overdue", "today", "week")
+
+# results from both boards are merged by due time, personal tasks first on a tie
+DUE_ORDER = ("due_at", "board", "id")
+BOARD_RANK = {"personal": 0, "collaboration": 1}
+
+PERSONAL_FIELDS = ("id", "name", "priority", "date", "time", "status", "due_at")
+COLLAB_FIELDS = (*PERSONAL_FIELDS, "created_by", "list_id")
+COLLAB_COLUMNS = ", ".join((*PERSONAL_FIELDS, CREATED_BY, "list_id"))
+
+
+def due_range(view, now):
+    # (since, until) in due_at seconds, since is None for everything before until.
+    # due_at is the typed wall-clock time read as UTC, so now is read the same way
+    current = calendar.timegm(now.timetuple())
+    today = calendar.timegm(now.date().timetuple())
+    if view == "overdue":
+        return None, current
+    if view == "today":
+        return today, today + DAY
+    # the seven days after today
+    return today + DAY, today + 8 * DAY
+
+
+def _sort_key(task):
+    return task["due_at"], BOARD_RANK[task["board"]], task["id"]
+
+
+def _seek(board, after):
+    # continue after the cursor's (due_at, board, id) within one board's (due_at, id) order
+    if after is None:
+        return "", ()
+    due_at, after_board, task_id = after
+    board = BOARD_RANK[board]
+    if board > after_board:
+        return " AND due_at >= ?", (due_at,)
+    if board < after_board:
+        return " AND due_at > ?", (due_at,)
+    return " AND (due_at, id) > (?, ?)", (due_at, task_id)
+
+
+def _bounds(since, until):
+    return (until,) if since is None else (since, until)
+
+
+def due_personal(user_id, since, until, after, limit):
+    seek, seek_args = _seek("personal", after)
+    with get_cursor(TASK_DB) as cursor:
+        cursor.execute(due_sql("tasks", ", ".join(PERSONAL_FIELDS), "user_id = ?", since is not None, seek),
+                       (user_id, *_bounds(since, until), *seek_args, limit))
+        rows = cursor.fetchall()
+
+    return [{
+        "board": "personal",
+        **dict(zip(PERSONAL_FIELDS, row)),
+        "url": url_for("personal.profile")
+    } for row in rows]
+
+
+def due_collaborations(user_id, since, until, after, limit):
+    seek, seek_args = _seek("collaboration", after)
+    with get_cursor(COLLAB_DB) as cursor:
+        cursor.execute("""
+            SELECT cl.id, cl.list_name FROM collab_members cm
+            JOIN collab_lists cl ON cl.id = cm.list_id
+            WHERE cm.user_id = ?
+        """, (user_id,))
+        list_names = dict(cursor.fetchall())
+        if not list_names:
+            return []
+
+        # one due_at range per list the user belongs to
+        scope = "list_id IN (SELECT list_id FROM collab_members WHERE user_id = ?)"
+        cursor.execute(due_sql("collab_tasks", COLLAB_COLUMNS, scope, since is not None, seek),
+                       (user_id, *_bounds(since, until), *seek_args, limit))
+        rows = cursor.fetchall()
+
+    results = []
+    for row in rows:
+        task = dict(zip(COLLAB_FIELDS, row))
+        results.append({
+            "board": "collaboration",
+            **task,
+            "list_name": list_names.get(task["list_id"]),
+            "url": url_for("collaboration.view_collaboration", list_id=task["list_id"])
+        })
+    return results
+
+
+# GET /due/overdue  open tasks whose due time has passed
+# GET /due/today    open tasks due today
+# GET /due/week     open tasks due in the seven days after today
+# across the user's board and every collaboration they belong to, soonest first.
+# dates have no time zone, pass the browser's local time as ?now=YYYY-MM-DDTHH:MM
+# (the server's clock otherwise) and follow next_cursor for more
+@due_bp.route("/due/<view>")
+def due(view):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    if view not in VIEWS:
+        return jsonify({"error": "View must be overdue, today or week"}), 404
+
+    try:
+        now = datetime.fromisoformat(request.args["now"]) if request.args.get("now") else datetime.now()
+        limit = page_limit(request.args.get("limit"))
+        after = decode_cursor(request.args["cursor"], DUE_ORDER) if request.args.get("cursor") else None
+        if after is not None and not all(isinstance(value, int) for value in after):
+            raise ValueError("Invalid cursor")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    user_id = session["user_id"]
+    since, until = due_range(view, now)
+    # each board returns its own first limit + 1, enough to cut this page from the merge
+    tasks = (due_personal(user_id, since, until, after, limit + 1)
+             + due_collaborations(user_id, since, until, after, limit + 1))
+    tasks.sort(key=_sort_key)
+
+    next_cursor = None
+    if len(tasks) > limit:
+        next_cursor = encode_cursor(dict(zip(DUE_ORDER, _sort_key(tasks[limit - 1]))), DUE_ORDER)
+
+    return jsonify({
+        "tasks": tasks[:limit],
+        "next_cursor": next_cursor
+    })
@@ -0,0 +1,184 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+# the bus lives in this process: run one gunicorn worker (with threads) for live updates,
+# clients of other workers still catch up through their next page load
+EVENT_HISTORY = int(os.environ.get("EVENT_HISTORY", "200"))
+MAX_LIST_STREAMS = int(os.environ.get("MAX_LIST_STREAMS", "20"))
+# every open stream holds a worker thread, keep some free for normal requests
+MAX_EVENT_STREAMS = int(os.environ.get("MAX_EVENT_STREAMS", "24"))
+HEARTBEAT_SECONDS = float(os.environ.get("EVENT_HEARTBEAT", "15"))
+# streams end after this long, the browser reconnects with Last-Event-ID and access is rechecked
+STREAM_MAX_AGE = float(os.environ.get("EVENT_STREAM_MAX_AGE", "300"))
+# a list's history is dropped once nobody is subscribed and its last event is this old,
+# a client that comes back later with an older id than that gets a resync
+EVENT_REPLAY_SECONDS = float(os.environ.get("EVENT_REPLAY_SECONDS", "600"))
+SUBSCRIBER_BUFFER = 100
+
+
+class TooManyStreams(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, channel, replay):
+        self.channel = channel
+        self.replay = replay
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+
+
+class EventBus:
+    def __init__(self, history=EVENT_HISTORY, max_per_channel=MAX_LIST_STREAMS, max_total=MAX_EVENT_STREAMS,
+                 replay_seconds=EVENT_REPLAY_SECONDS):
+        self.history = history
+        self.replay_seconds = replay_seconds
+        self.max_per_channel = max_per_channel
+        self.max_total = max_total
+        # event ids only mean something to this process, a Last-Event-ID
+        # from a restarted or different worker is answered with a resync
+        self.token = uuid.uuid4().hex[:8]
+        self._ids = itertools.count(1)
+        self._last = 0
+        self._history = {}
+        # channel -> monotonic time of its last event, for dropping idle histories
+        self._published = {}
+        # newest event id of any dropped history
+        self._dropped = 0
+        self._next_prune = 0
+        self._subscribers = {}
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event, data):
+        now = time.monotonic()
+        with self._lock:
+            entry = (next(self._ids), event, json.dumps(data))
+            self._last = entry[0]
+            history = self._history.setdefault(channel, deque(maxlen=self.history))
+            history.append(entry)
+            self._published[channel] = now
+            self._prune(now)
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for sub in subscribers:
+            try:
+                sub.queue.put_nowait(entry)
+            except queue.Full:
+                # a reader this far behind is cut off, it reconnects and replays
+                sub.queue = None
+
+    def _prune(self, now):
+        # under the lock. a sweep at most every tenth of the window keeps publish cheap
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.replay_seconds / 10
+        cutoff = now - self.replay_seconds
+        for channel, published in list(self._published.items()):
+            if published < cutoff and channel not in self._subscribers:
+                self._dropped = max(self._dropped, self._history.pop(channel)[-1][0])
+                del self._published[channel]
+
+    def last_event_id(self):
+        # rendered into pages so their stream starts where the page's data ends
+        return f"{self.token}-{self._last}"
+
+    def has_room(self, channel):
+        # checked before a stream response starts, subscribe checks again
+        with self._lock:
+            return self._has_room(channel)
+
+    def _has_room(self, channel):
+        return len(self._subscribers.get(channel, ())) < self.max_per_channel and self._total < self.max_total
+
+    def subscribe(self, channel, last_event_id=None):
+        with self._lock:
+            if not self._has_room(channel):
+                raise TooManyStreams()
+            subscribers = self._subscribers.get(channel, set())
+            self._subscribers[channel] = subscribers
+
+            replay = []
+            if last_event_id:
+                replay = self._replay(channel, last_event_id)
+
+            sub = Subscription(channel, replay)
+            subscribers.add(sub)
+            self._total += 1
+            return sub
+
+    def _replay(self, channel, last_event_id):
+        token, _, seq = last_event_id.partition("-")
+        history = self._history.get(channel, ())
+        if token != self.token or not seq.isdigit():
+            return [(None, "resync", "{}")]
+
+        seq = int(seq)
+        if (not history or seq < history[0][0]) and (len(history) == self.history or seq < self._dropped):
+            # the history starts after the client's last event and is full, or may have
+            # been dropped since (then it was idle for the replay window): some may be lost
+            return [(None, "resync", "{}")]
+        return [entry for entry in history if entry[0] > seq]
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subscribers = self._subscribers.get(sub.channel)
+            if subscribers and sub in subscribers:
+                subscribers.discard(sub)
+                self._total -= 1
+                if not subscribers:
+                    del self._subscribers[sub.channel]
+            self._prune(time.monotonic())
+
+    def stream(self, channel, last_event_id=None):
+        # text/event-stream body. the subscription only exists while the body is being
+        # sent: a client gone before the first chunk never registers one
+        def message(entry):
+            seq, event, data = entry
+            lines = [] if seq is None else [f"id: {self.token}-{seq}"]
+            lines += [f"event: {event}", f"data: {data}"]
+            return "\n".join(lines) + "\n\n"
+
+        sub = None
+        try:
+            try:
+                sub = self.subscribe(channel, last_event_id)
+            except TooManyStreams:
+                # filled up since the route checked, the browser tries again later
+                yield "retry: 30000\n\n"
+                return
+
+            yield "retry: 3000\n\n"
+            for entry in sub.replay:
+                yield message(entry)
+
+            deadline = time.monotonic() + STREAM_MAX_AGE
+            while time.monotonic() < deadline:
+                events = sub.queue
+                if events is None:
+                    break
+                try:
+                    entry = events.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield message(entry)
+        finally:
+            if sub is not None:
+                self.unsubscribe(sub)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "streams": self._total,
+                "histories": len(self._history),
+                "channels": {channel: len(subs) for channel, subs in self._subscribers.items()},
+            }
+
+
+event_bus = EventBus()
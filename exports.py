@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+import time
+
+from flask import Response
+
+from boards import export_sql
+from db import get_cursor
+
+# rows read per query. each chunk is its own short read, so a slow download never
+# pins a pooled connection or keeps an old WAL snapshot alive (which would stop
+# checkpoints); the generator only ever holds one chunk in memory
+EXPORT_CHUNK = 1000
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_chunks(db_file, table, fields, scope_column, scope_value, chunk=EXPORT_CHUNK, columns=None):
+    # rows edited while the export runs show up once, as they were when their chunk was read.
+    # columns, when given, are the select expressions behind fields (e.g. a looked up name).
+    # archived tasks (see archive.py) come from {table}_archive with status "completed",
+    # a task archived or restored during the export is still read once: ids never change
+    columns = columns or fields
+    archived = ", ".join("'completed' AS status" if field == "status" else column
+                         for field, column in zip(fields, columns))
+    sql = export_sql(table, ", ".join(columns), scope_column, archived)
+    last_id = 0
+    while True:
+        with get_cursor(db_file) as cursor:
+            cursor.execute(sql, (scope_value, last_id, scope_value, last_id, chunk))
+            rows = cursor.fetchall()
+        if rows:
+            yield rows
+        if len(rows) < chunk:
+            return
+        last_id = rows[-1][0]
+
+
+def csv_stream(fields, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # header only, for an empty board
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def ndjson_stream(fields, chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(fields, row)), ensure_ascii=False) + "\n" for row in rows)
+
+
+def export_response(fmt, fields, chunks, basename):
+    # no Content-Length: the body goes out with chunked transfer encoding as it is generated
+    stream = csv_stream(fields, chunks) if fmt == "csv" else ndjson_stream(fields, chunks)
+    filename = f"{basename}-{time.strftime('%Y%m%d')}.{fmt}"
+    return Response(stream, mimetype=FORMATS[fmt], headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Accel-Buffering": "no",
+    })
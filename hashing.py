@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+from metrics import record_hash
+
+# werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+# stored hashes made with other parameters are upgraded on the next successful login
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+# processes doing KDF work, 0 hashes inline in the request thread.
+# half the cores by default, the rest stay free for request handling
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# hashing processes run at lower CPU priority so page requests win under login bursts
+HASH_NICE = int(os.environ.get("HASH_NICE", "5"))
+# hashes allowed in flight (running or queued) per app process before new ones are refused
+HASH_QUEUE_LIMIT = int(os.environ.get("HASH_QUEUE_LIMIT", "16"))
+# seconds a request waits for its hash
+HASH_TIMEOUT = float(os.environ.get("HASH_TIMEOUT", "10"))
+
+
+class HashingBusy(Exception):
+    pass
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
+
+def _lower_priority():
+    if HASH_NICE and hasattr(os, "nice"):
+        os.nice(HASH_NICE)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+
+    with _executor_lock:
+        # created lazily inside each gunicorn worker, never inherited through fork
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_lower_priority,
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _drop_executor(executor):
+    global _executor
+
+    # a worker died (killed, out of memory) and the pool refuses all work from now on,
+    # the next hash starts a new one. another thread may have replaced it already
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn, *args):
+    started = time.perf_counter()
+    try:
+        return _submit(fn, *args)
+    finally:
+        record_hash(time.perf_counter() - started)
+
+
+def _submit(fn, *args):
+    if HASH_WORKERS <= 0:
+        return fn(*args)
+
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy("Too many password checks in progress")
+
+    try:
+        executor = _get_executor()
+        future = executor.submit(fn, *args)
+    except BrokenProcessPool:
+        _slots.release()
+        _drop_executor(executor)
+        raise HashingBusy("Password hashing restarted")
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except TimeoutError:
+        future.cancel()
+        raise HashingBusy("Password check timed out")
+    except BrokenProcessPool:
+        _drop_executor(executor)
+        raise HashingBusy("Password hashing restarted")
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+
+def verify_password(stored_hash, password):
+    return _run(check_password_hash, stored_hash, password)
+
+
+def method_prefix(method):
+    # werkzeug expands short methods ("scrypt", "pbkdf2:sha256") to their full
+    # parameters when it writes a hash, fill them in the same way without hashing
+    name, *args = method.split(":")
+    if name == "scrypt" and not args:
+        args = ["32768", "8", "1"]
+    elif name == "pbkdf2" and len(args) < 2:
+        args = [args[0] if args else "sha256", str(DEFAULT_PBKDF2_ITERATIONS)]
+    return ":".join([name, *args])
+
+
+_method_prefix = method_prefix(PASSWORD_HASH_METHOD)
+
+
+def needs_rehash(stored_hash):
+    # a string comparison, so it is safe on the request thread
+    return stored_hash.split("$", 1)[0] != _method_prefix
+
+
+def shutdown():
+    global _executor
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
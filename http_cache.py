@@ -0,0 +1,106 @@
+import hashlib
+import os
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+
+from cache import board_cache
+
+NO_STORE = "no-store, no-cache, must-revalidate, private, post-check=0, pre-check=0"
+REVALIDATE = "private, no-cache"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+_static_digests = {}
+
+
+def _release():
+    # changes whenever code or templates are deployed, so old ETags stop matching.
+    # every worker of one deploy computes the same value
+    digest = hashlib.sha256()
+    root = os.path.dirname(os.path.abspath(__file__))
+    for folder in (root, os.path.join(root, "templates")):
+        for name in sorted(os.listdir(folder)):
+            if name.endswith((".py", ".html")):
+                stat = os.stat(os.path.join(folder, name))
+                digest.update(f"{name}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+    return digest.hexdigest()[:16]
+
+
+RELEASE = os.environ.get("APP_RELEASE") or _release()
+
+
+def static_digest(filename):
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    cached = _static_digests.get(filename)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    _static_digests[filename] = (mtime, digest)
+    return digest
+
+
+def static_url_defaults(endpoint, values):
+    # url_for('static', ...) gets ?v=<content hash>, which makes the URL safe to cache forever
+    if endpoint == "static" and "filename" in values and "v" not in values:
+        digest = static_digest(values["filename"])
+        if digest:
+            values["v"] = digest
+
+
+def conditional(owners):
+    # owners(**view_args) lists the cache version keys the response is built from.
+    # a matching If-None-Match is answered with 304 before the view runs, so owners
+    # must also check access: it returns None to skip the ETag and let the view refuse
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            username = session.get("username")
+            if not username:
+                return view(*args, **kwargs)
+
+            keys = owners(**kwargs)
+            if keys is None:
+                return view(*args, **kwargs)
+
+            parts = [RELEASE, board_cache.versions.token, username, request.full_path]
+            parts.extend(f"{key}={board_cache.version(key)}" for key in keys)
+            etag = hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+            if request.if_none_match.contains(etag):
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            g.cache_policy = REVALIDATE
+            return response
+        return wrapper
+    return decorator
+
+
+def apply_cache_policy(response):
+    if request.endpoint == "asset":
+        # built bundles carry their content hash in the filename
+        response.headers["Cache-Control"] = IMMUTABLE
+        return response
+
+    if request.endpoint == "static":
+        # fingerprinted URLs never change, anything else is revalidated with the file's ETag
+        response.headers["Cache-Control"] = IMMUTABLE if "v" in request.args else "public, no-cache"
+        return response
+
+    policy = g.get("cache_policy", NO_STORE)
+    response.headers["Cache-Control"] = policy
+    if policy == NO_STORE:
+        response.headers["Pragma"] = "no-cache"
+        response.headers["Expires"] = "0"
+    return response
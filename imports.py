@@ -0,0 +1,247 @@
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from flask import Response, jsonify
+
+from boards import PRIORITIES, STATUSES, SCOPE_COLUMNS, end_position, valid_date, valid_time
+from db import get_cursor
+from writes import write
+
+DB_NAME = "accounts.db"
+TASK_DB = "todo.db"
+COLLAB_DB = "collaborations.db"
+
+# rows per queued write (see writes.py), the writer is held for one batch at a time.
+# after each batch the import idles for IMPORT_YIELD of the time it wrote, so the request
+# writes queued behind it, and other workers waiting for the writer lock, go first
+IMPORT_BATCH = 500
+IMPORT_YIELD = 0.5
+MAX_IMPORT_ROWS = 200000
+# per-row errors returned, the count keeps going past it
+MAX_REPORTED_ERRORS = 100
+# uploads copied for a streamed import stay in memory up to this size
+SPOOL_SIZE = 1024 * 1024
+
+FORMATS = ("csv", "ndjson")
+IMPORT_FIELDS = ("name", "priority", "date", "time", "status")
+
+class InvalidImport(ValueError):
+    pass
+
+
+def detect_format(filename, requested=None):
+    fmt = (requested or os.path.splitext(filename or "")[1].lstrip(".")).lower()
+    if fmt == "jsonl":
+        fmt = "ndjson"
+    if fmt not in FORMATS:
+        raise InvalidImport("format must be csv or ndjson")
+    return fmt
+
+
+def read_rows(stream, fmt):
+    # a binary file object in, dicts out one at a time: the upload is never read whole.
+    # the header of a CSV is checked right away so a wrong file fails before anything is inserted
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        if reader.fieldnames is not None:
+            reader.fieldnames = [field.strip().lower() for field in reader.fieldnames]
+            if "name" not in reader.fieldnames:
+                raise InvalidImport("The CSV header needs a name column")
+        return reader
+    return _ndjson_rows(text)
+
+
+def upload_rows(upload, requested_format=None, keep=False):
+    # keep: the rows are read after the view returns (streamed progress), but werkzeug
+    # closes request files when the request ends, so read from a private copy instead
+    fmt = detect_format(upload.filename, requested_format)
+    stream = upload.stream
+    if keep:
+        stream = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        shutil.copyfileobj(upload.stream, stream)
+        stream.seek(0)
+    return read_rows(stream, fmt)
+
+
+def _ndjson_rows(text):
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield "Invalid JSON"
+            continue
+        yield row if isinstance(row, dict) else "Each line must be a JSON object"
+
+
+def _optional(row, field):
+    value = row.get(field)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise InvalidImport(f"Invalid {field}")
+    return value.strip() or None
+
+
+def clean_row(row):
+    # returns (name, priority, date, time, status) or raises InvalidImport with the reason
+    if isinstance(row, str):
+        raise InvalidImport(row)
+
+    name = _optional(row, "name")
+    if not name:
+        raise InvalidImport("Task name required")
+
+    priority = _optional(row, "priority")
+    if priority is not None:
+        priority = priority.lower()
+        if priority not in PRIORITIES:
+            raise InvalidImport("Invalid priority")
+
+    date = _optional(row, "date")
+    if date is not None and not valid_date(date):
+        raise InvalidImport("Invalid date, expected YYYY-MM-DD")
+
+    time_ = _optional(row, "time")
+    if time_ is not None and not valid_time(time_):
+        raise InvalidImport("Invalid time, expected HH:MM")
+
+    status = (_optional(row, "status") or "backlog").lower()
+    if status not in STATUSES:
+        raise InvalidImport("Invalid status")
+
+    return name, priority, date, time_, status
+
+
+def _insert(db_file, sql, batch):
+    # through the write queue like every other task write, a batch may share its
+    # commit with request writes but is rolled back alone if it fails
+    return write(db_file, lambda cursor: cursor.executemany(sql, batch).rowcount)
+
+
+def run_import(db_file, table, owner, rows, after_batch=None, batch_size=IMPORT_BATCH):
+    # yields progress after every committed batch, the last update has "done": True.
+    # batches already committed stay if a later one fails, progress tells how far it got.
+    # owner maps the columns every row gets, e.g. {"user_id": ...}
+    # rows are appended to the end of their status column in file order
+    columns = (*owner, *IMPORT_FIELDS)
+    sql = f"""
+        INSERT INTO {table} ({', '.join(columns)}, position)
+        VALUES ({', '.join('?' for _ in columns)}, {end_position(table)})
+    """
+    owner_values = tuple(owner.values())
+    scope_value = owner[SCOPE_COLUMNS[table]]
+
+    progress = {"processed": 0, "imported": 0, "failed": 0}
+    errors = []
+    truncated = False
+    batch = []
+
+    for number, row in enumerate(rows, 1):
+        if number > MAX_IMPORT_ROWS:
+            truncated = True
+            break
+        try:
+            task = clean_row(row)
+            batch.append(owner_values + task + (scope_value, task[-1]))
+        except InvalidImport as e:
+            progress["failed"] += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": number, "error": str(e)})
+        progress["processed"] = number
+
+        if number % batch_size == 0:
+            if batch:
+                started = time.perf_counter()
+                _insert(db_file, sql, batch)
+                time.sleep((time.perf_counter() - started) * IMPORT_YIELD)
+                progress["imported"] += len(batch)
+                batch = []
+                if after_batch:
+                    after_batch()
+            yield dict(progress)
+
+    if batch:
+        _insert(db_file, sql, batch)
+        progress["imported"] += len(batch)
+        if after_batch:
+            after_batch()
+
+    yield {**progress, "errors": errors, "truncated": truncated, "done": True}
+
+
+def import_response(updates, progress=False):
+    # ?progress=1 streams one JSON line per committed batch, otherwise only the summary is sent
+    if progress:
+        return Response((json.dumps(update) + "\n" for update in updates), mimetype="application/x-ndjson")
+    for update in updates:
+        pass
+    return jsonify(update)
+
+
+def main():
+    # python imports.py tasks.csv --user alice            -> alice's board
+    # python imports.py board.ndjson --user alice --list 3 -> list 3, created by alice
+    parser = argparse.ArgumentParser(description="Import tasks from CSV or NDJSON")
+    parser.add_argument("file")
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--list", type=int, help="collaboration list id")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--batch", type=int, default=IMPORT_BATCH)
+    args = parser.parse_args()
+
+    from cache import board_cache, user_key, list_key
+    from database import init_all
+
+    init_all()
+    with get_cursor(DB_NAME) as cursor:
+        cursor.execute("SELECT id FROM accounts WHERE username = ?", (args.user,))
+        row = cursor.fetchone()
+        if not row:
+            sys.exit(f"No account named {args.user}")
+    user_id = row[0]
+
+    if args.list is None:
+        target = (TASK_DB, "tasks", {"user_id": user_id})
+        key = user_key(user_id)
+    else:
+        with get_cursor(COLLAB_DB) as cursor:
+            cursor.execute("SELECT 1 FROM collab_members WHERE list_id = ? AND user_id = ?",
+                           (args.list, user_id))
+            if not cursor.fetchone():
+                sys.exit(f"{args.user} is not a member of list {args.list}")
+        target = (COLLAB_DB, "collab_tasks", {"list_id": args.list, "creator_id": user_id})
+        key = list_key(args.list)
+
+    started = time.perf_counter()
+    try:
+        with open(args.file, "rb") as f:
+            rows = read_rows(f, detect_format(args.file, args.format))
+            for update in run_import(*target, rows, lambda: board_cache.bump(key), max(1, args.batch)):
+                print(f"\r{update['processed']} rows, {update['imported']} imported, "
+                      f"{update['failed']} failed", end="", file=sys.stderr)
+    except InvalidImport as e:
+        sys.exit(str(e))
+    print(file=sys.stderr)
+
+    for error in update["errors"]:
+        print(f"row {error['row']}: {error['error']}", file=sys.stderr)
+    if update["failed"] > len(update["errors"]):
+        print(f"... {update['failed'] - len(update['errors'])} more", file=sys.stderr)
+    if update["truncated"]:
+        print(f"stopped after {MAX_IMPORT_ROWS} rows", file=sys.stderr)
+    print(f"Imported {update['imported']} of {update['processed']} rows "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
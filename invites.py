@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+import re
+
+from db import get_cursor
+
+DB_NAME = "accounts.db"
+
+MAX_INVITES = 1000
+
+_SEPARATORS = re.compile(r"[,;\n\r]+")
+
+
+def parse_invites(text="", upload=None):
+    # usernames from a pasted list (commas, semicolons or one per line)
+    # and/or an uploaded CSV, in the order they were given
+    names = [name.strip() for name in _SEPARATORS.split(text or "")]
+
+    if upload is not None and upload.filename:
+        rows = list(csv.reader(io.StringIO(upload.read().decode("utf-8-sig", errors="replace"))))
+        column = 0
+        # a header row with a "username" column picks that column, otherwise the first one
+        if rows:
+            header = [cell.strip().lower() for cell in rows[0]]
+            if "username" in header:
+                column = header.index("username")
+                rows = rows[1:]
+        names.extend(row[column].strip() for row in rows if len(row) > column)
+
+    return [name for name in names if name]
+
+
+def split_duplicates(names):
+    seen, unique, duplicates = set(), [], []
+    for name in names:
+        if name in seen:
+            if name not in duplicates:
+                duplicates.append(name)
+        else:
+            seen.add(name)
+            unique.append(name)
+    return unique, duplicates
+
+
+def existing_accounts(names):
+    # username -> account id, one statement for the whole list, json_each avoids the bound-variable limit
+    if not names:
+        return {}
+    with get_cursor(DB_NAME) as cursor:
+        cursor.execute(
+            "SELECT username, id FROM accounts WHERE username IN (SELECT value FROM json_each(?))",
+            (json.dumps(names),),
+        )
+        return dict(cursor.fetchall())
+
+
+def check_invites(names, skip=()):
+    # returns (valid, invalid, duplicates), valid maps username -> account id in the order given.
+    # skip holds names that are quietly left out (the owner)
+    unique, duplicates = split_duplicates([name for name in names if name not in skip])
+    found = existing_accounts(unique)
+    valid = {name: found[name] for name in unique if name in found}
+    invalid = [name for name in unique if name not in found]
+    return valid, invalid, duplicates
+
+
+def invite_error(invalid, duplicates):
+    problems = []
+    if invalid:
+        problems.append(f"The following users do not exist: {', '.join(invalid)}")
+    if duplicates:
+        problems.append(f"Listed more than once: {', '.join(duplicates)}")
+    return ". ".join(problems)
+
+
+def add_members(cursor, list_id, user_ids):
+    # caller's transaction, already-present members are left alone
+    cursor.executemany(
+        "INSERT OR IGNORE INTO collab_members (list_id, user_id) VALUES (?, ?)",
+        [(list_id, user_id) for user_id in user_ids],
+    )
@@ -0,0 +1,335 @@
+import os
+import sqlite3
+import threading
+import time
+
+from flask import (Response, current_app, g, has_request_context, request,
+                   before_render_template, template_rendered)
+
+# requests slower than this are logged together with the SQL they ran
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "500"))
+# statements kept per request for the slow log, the count keeps going past it
+MAX_LOGGED_STATEMENTS = 50
+# /metrics is open to loopback scrapers, anyone else needs "Authorization: Bearer <token>"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name + _labels(self.label_names, labels), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # labels -> [count per bucket..., sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            # prometheus buckets are cumulative
+            total = 0
+            for bound, count in zip(self.buckets, values):
+                total += count
+                yield self.name + "_bucket" + _labels(self.label_names, labels, [("le", _number(bound))]), total
+            yield self.name + "_sum" + _labels(self.label_names, labels), values[-2]
+            yield self.name + "_count" + _labels(self.label_names, labels), values[-1]
+
+
+ENDPOINT = ("endpoint", "method")
+
+requests_total = Counter(
+    "app_requests_total", "Requests handled", ("endpoint", "method", "status"))
+request_seconds = Histogram(
+    "app_request_duration_seconds", "Time spent in the app per request", SECONDS_BUCKETS, ENDPOINT)
+sql_seconds = Histogram(
+    "app_request_sql_seconds", "SQL execute and fetch time per request", SECONDS_BUCKETS, ENDPOINT)
+sql_queries = Histogram(
+    "app_request_sql_queries", "Statements executed per request", QUERY_BUCKETS, ENDPOINT)
+render_seconds = Histogram(
+    "app_request_render_seconds", "Template render time per request", SECONDS_BUCKETS, ENDPOINT)
+response_bytes = Histogram(
+    "app_response_bytes", "Response body size, streamed responses are not counted", BYTES_BUCKETS, ENDPOINT)
+hash_seconds = Counter(
+    "app_password_hash_seconds_total", "Time requests waited on password hashing")
+slow_requests = Counter(
+    "app_slow_requests_total", "Requests slower than SLOW_REQUEST_MS", ENDPOINT)
+
+REGISTRY = [requests_total, request_seconds, sql_seconds, sql_queries, render_seconds,
+            response_bytes, hash_seconds, slow_requests]
+
+
+def _current():
+    # per-request totals live on flask.g, work outside a request is not attributed
+    if not has_request_context():
+        return None
+    return g.get("_metrics")
+
+
+def record_query(sql, seconds):
+    state = _current()
+    if state is None:
+        return
+    state["queries"] += 1
+    state["sql"] += seconds
+    if len(state["statements"]) < MAX_LOGGED_STATEMENTS:
+        state["statements"].append((sql, seconds))
+
+
+def record_fetch(seconds):
+    state = _current()
+    if state is not None:
+        state["sql"] += seconds
+
+
+def record_hash(seconds):
+    state = _current()
+    if state is not None:
+        state["hash"] += seconds
+    hash_seconds.inc((), seconds)
+
+
+class TimedCursor(sqlite3.Cursor):
+    # execute() only steps to the first row, the fetches are timed too so
+    # SELECTs count in full. only execute/executemany count as queries
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_query(sql, time.perf_counter() - started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            record_fetch(time.perf_counter() - started)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            record_fetch(time.perf_counter() - started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            record_fetch(time.perf_counter() - started)
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return super().__next__()
+        finally:
+            record_fetch(time.perf_counter() - started)
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+
+def _start_request():
+    g._metrics = {
+        "started": time.perf_counter(),
+        "queries": 0,
+        "sql": 0.0,
+        "render": 0.0,
+        "hash": 0.0,
+        "statements": [],
+    }
+
+
+def _before_render(app, template, context, **extra):
+    state = _current()
+    if state is not None:
+        state["render_started"] = time.perf_counter()
+
+
+def _rendered(app, template, context, **extra):
+    state = _current()
+    if state is not None and "render_started" in state:
+        state["render"] += time.perf_counter() - state.pop("render_started")
+
+
+def _server_timing(state, elapsed):
+    return ", ".join([
+        f"app;dur={elapsed * 1000:.1f}",
+        f'db;dur={state["sql"] * 1000:.1f};desc="{state["queries"]} queries"',
+        f"render;dur={state['render'] * 1000:.1f}",
+        *([f"hash;dur={state['hash'] * 1000:.1f}"] if state["hash"] else []),
+    ])
+
+
+def _finish_request(response):
+    state = _current()
+    if state is None:
+        return response
+
+    elapsed = time.perf_counter() - state["started"]
+    labels = (request.endpoint or "unmatched", request.method)
+    requests_total.inc((*labels, response.status_code))
+    request_seconds.observe(labels, elapsed)
+    sql_seconds.observe(labels, state["sql"])
+    sql_queries.observe(labels, state["queries"])
+    if state["render"]:
+        render_seconds.observe(labels, state["render"])
+    size = response.content_length
+    if size is None and not response.is_streamed:
+        size = response.calculate_content_length()
+    if size is not None:
+        response_bytes.observe(labels, size)
+
+    response.headers["Server-Timing"] = _server_timing(state, elapsed)
+
+    if elapsed * 1000 >= SLOW_REQUEST_MS:
+        slow_requests.inc(labels)
+        _log_slow(state, elapsed, response)
+    return response
+
+
+def _log_slow(state, elapsed, response):
+    lines = [
+        f"slow request {request.method} {request.full_path.rstrip('?')} -> {response.status_code} "
+        f"in {elapsed * 1000:.1f} ms: {state['queries']} queries {state['sql'] * 1000:.1f} ms, "
+        f"render {state['render'] * 1000:.1f} ms, hash {state['hash'] * 1000:.1f} ms"
+    ]
+    for sql, seconds in state["statements"]:
+        lines.append(f"  {seconds * 1000:8.2f} ms  {' '.join(sql.split())}")
+    if state["queries"] > len(state["statements"]):
+        lines.append(f"  ... {state['queries'] - len(state['statements'])} more")
+    current_app.logger.warning("\n".join(lines))
+
+
+def _gauges():
+    # point-in-time numbers owned by other modules, read at scrape time.
+    # imported here because cache imports db, which imports this module
+    from acl import collab_acl
+    from cache import board_cache, user_cache
+    from events import event_bus
+    import writes
+
+    cache = board_cache.stats()
+    users = user_cache.stats()
+    events = event_bus.stats()
+    acl = collab_acl.stats()
+    queued = writes.stats()
+    return [
+        ("app_board_cache_hits_total", "counter", "Board cache hits", cache["hits"]),
+        ("app_board_cache_misses_total", "counter", "Board cache misses", cache["misses"]),
+        ("app_board_cache_evictions_total", "counter", "Board cache evictions", cache["evictions"]),
+        ("app_board_cache_entries", "gauge", "Entries in the board cache", cache["entries"]),
+        ("app_user_cache_hits_total", "counter", "User record cache hits", users["hits"]),
+        ("app_user_cache_misses_total", "counter", "User record cache misses", users["misses"]),
+        ("app_user_cache_evictions_total", "counter", "User record cache evictions", users["evictions"]),
+        ("app_user_cache_entries", "gauge", "Entries in the user record cache", users["entries"]),
+        ("app_acl_hits_total", "counter", "Permission checks answered from memory", acl["hits"]),
+        ("app_acl_misses_total", "counter", "Permission checks that read the database", acl["misses"]),
+        ("app_acl_lists", "gauge", "Collaboration lists in the permission map", acl["lists"]),
+        ("app_acl_tasks", "gauge", "Collaboration tasks in the permission map", acl["tasks"]),
+        ("app_write_batches_total", "counter", "Group commits by the write queue", queued["batches"]),
+        ("app_write_jobs_total", "counter", "Writes committed through the write queue", queued["jobs"]),
+        ("app_write_queue_depth", "gauge", "Writes waiting for the writer thread", queued["queued"]),
+        ("app_event_streams", "gauge", "Open server-sent event streams", events["streams"]),
+        ("app_event_histories", "gauge", "Lists with events kept for replay", events["histories"]),
+    ]
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(f"{name} {_number(value)}" for name, value in metric.samples())
+    for name, kind, help, value in _gauges():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics():
+    if METRICS_TOKEN:
+        if request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+            return Response("Forbidden\n", 403, mimetype="text/plain")
+    elif request.remote_addr not in ("127.0.0.1", "::1"):
+        return Response("Forbidden\n", 403, mimetype="text/plain")
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    # app-level hooks, so every blueprint's routes are measured too.
+    # counters are per process: each gunicorn worker reports its own
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.add_url_rule("/metrics", "metrics", metrics)
@@ -1,5 +1,17 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify
-import sqlite3
+from db import get_cursor
+from writes import write
+from cache import board_cache, user_cache, user_key
+from http_cache import conditional
+from exports import FORMATS, export_chunks, export_response
+from imports import InvalidImport, upload_rows, run_import, import_response
+from positions import InvalidMove, move, spread_later
+from archive import ARCHIVE_ORDER, fetch_archived, restore
+from boards import (
+    STATUSES, fetch_first_pages, fetch_page, decode_cursor, page_limit, task_json,
+    parse_batch, referenced_ids, deny_unlisted, id_placeholders, apply_batch,
+    end_position, status_sql, field_error,
+)
 
 personal_bp = Blueprint('personal', __name__)
 
@@ -7,50 +19,74 @@ personal_bp = Blueprint('personal', __name__)
 DB_NAME = "accounts.db"
 TASK_DB = "todo.db"
 
+BOARD_FIELDS = ("id", "name", "priority", "date", "time", "status", "position")
+BOARD_COLUMNS = ", ".join(BOARD_FIELDS)
+# positions only mean something on the board, exports and imports leave them out
+EXPORT_FIELDS = BOARD_FIELDS[:-1]
+ARCHIVED_FIELDS = ("id", "name", "priority", "date", "time", "completed_at", "archived_at")
+ARCHIVED_COLUMNS = ", ".join(ARCHIVED_FIELDS)
+
 @personal_bp.route("/profile")
+@conditional(lambda: [user_key(session["user_id"])])
 def profile():
     username = session.get("username") 
 
-    user_data = None
     if username:
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT full_name, email, username FROM accounts WHERE username=?", (username,))
-            user = cursor.fetchone()
-            if user:
-                user_data = {"full_name": user[0], "email": user[1], "username": user[2]}
-
-    with sqlite3.connect(TASK_DB) as conn:
-        cursor = conn.cursor()
-        if username:
-            cursor.execute("SELECT * FROM tasks WHERE username=? AND status='backlog'", (username,))
-            backlog_tasks = [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
-
-            cursor.execute("SELECT * FROM tasks WHERE username=? AND status='in-progress'", (username,))
-            in_progress_tasks = [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
-
-            cursor.execute("SELECT * FROM tasks WHERE username=? AND status='completed'", (username,))
-            completed_tasks = [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
-        else:
-            cursor.execute("SELECT * FROM tasks WHERE status='backlog'")
-            backlog_tasks = [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
-
-            cursor.execute("SELECT * FROM tasks WHERE status='in-progress'")
-            in_progress_tasks = [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
-
-            cursor.execute("SELECT * FROM tasks WHERE status='completed'")
-            completed_tasks = [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
+        user_id = session["user_id"]
+        # repeat views are served from the cache until one of the user's tasks changes
+        page = board_cache.get_or_load("profile", user_key(user_id), lambda: load_profile(username, user_id))
+    else:
+        page = load_profile(None, None)
 
+    board = page["board"]
     return render_template(
         "profile.html",
-        user=user_data,
+        user=page["user"],
         username=username,
-        tasks=backlog_tasks,
-        in_progress_tasks=in_progress_tasks,
-        completed_tasks=completed_tasks
+        tasks=board["backlog"],
+        in_progress_tasks=board["in-progress"],
+        completed_tasks=board["completed"],
+        cursors=page["cursors"]
     )
 
 
+def load_profile(username, user_id):
+    user_data = user_cache.get(username) if username else None
+
+    with get_cursor(TASK_DB) as cursor:
+        if user_id:
+            board, cursors = fetch_first_pages(cursor, "tasks", BOARD_COLUMNS, "user_id = ?", (user_id,))
+        else:
+            board, cursors = fetch_first_pages(cursor, "tasks", BOARD_COLUMNS, "1 = 1", ())
+
+    return {"user": user_data, "board": board, "cursors": cursors}
+
+
+@personal_bp.route("/tasks")
+@conditional(lambda: [user_key(session["user_id"])])
+def list_tasks():
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    status = request.args.get("status", "backlog")
+    if status not in STATUSES:
+        return jsonify({"error": "Invalid status"}), 400
+
+    try:
+        limit = page_limit(request.args.get("limit"))
+        after = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with get_cursor(TASK_DB) as cursor:
+        rows, next_cursor = fetch_page(cursor, "tasks", BOARD_COLUMNS, "user_id = ?",
+                                       (session["user_id"],), status, after, limit)
+
+    return jsonify({
+        "tasks": [task_json(row, BOARD_FIELDS) for row in rows],
+        "next_cursor": next_cursor
+    })
+
 @personal_bp.route("/add_task", methods=["POST"])
 def add_task():
     if "username" not in session:
@@ -60,50 +96,215 @@ def add_task():
     priority = data.get("priority")
     date = data.get("date")
     time = data.get("time")
-    username = session["username"]
+    user_id = session["user_id"]
 
     if not name:
         return jsonify({"error": "Task name required"}), 400
+    error = field_error(data)
+    if error:
+        return jsonify({"error": error}), 400
 
-    with sqlite3.connect(TASK_DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO tasks (username, name, priority, date, time) VALUES (?, ?, ?, ?, ?)",
-                       (username, name, priority, date, time))
-        task_id = cursor.lastrowid
-        conn.commit()
+    # new tasks go to the end of the backlog column
+    task_id, position = write(TASK_DB, lambda cursor: cursor.execute(
+        f"""
+        INSERT INTO tasks (user_id, name, priority, date, time, position)
+        VALUES (?, ?, ?, ?, ?, {end_position("tasks")}) RETURNING id, position
+        """,
+        (user_id, name, priority, date, time, user_id, "backlog")).fetchone())
+    board_cache.bump(user_key(user_id))
 
-    return jsonify({"id": task_id, "name": name, "priority": priority, "date": date, "time": time})
+    return jsonify({"id": task_id, "name": name, "priority": priority, "date": date, "time": time,
+                    "position": position})
 
 @personal_bp.route("/edit_task/<int:task_id>", methods=["PUT"])
 def edit_task(task_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
     data = request.get_json()
     name = data.get("name")
     priority = data.get("priority")
     date = data.get("date")
     time = data.get("time")
+    user_id = session["user_id"]
 
-    with sqlite3.connect(TASK_DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE tasks SET name=?, priority=?, date=?, time=? WHERE id=?", (name, priority, date, time, task_id))
-        conn.commit()
+    error = field_error(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    updated = write(TASK_DB, lambda cursor: cursor.execute(
+        "UPDATE tasks SET name=?, priority=?, date=?, time=? WHERE id=? AND user_id=?",
+        (name, priority, date, time, task_id, user_id)).rowcount)
+    # someone else's task, or one that no longer exists
+    if not updated:
+        return jsonify({"error": "You don't have access to this task"}), 403
+    board_cache.bump(user_key(user_id))
     return jsonify({"success": True})
 
 @personal_bp.route("/delete_task/<int:task_id>", methods=["DELETE"])
 def delete_task(task_id):
-    with sqlite3.connect(TASK_DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM tasks WHERE id=?", (task_id,))
-        conn.commit()
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    user_id = session["user_id"]
+
+    deleted = write(TASK_DB, lambda cursor: cursor.execute(
+        "DELETE FROM tasks WHERE id=? AND user_id=?", (task_id, user_id)).rowcount)
+    if not deleted:
+        return jsonify({"error": "You don't have access to this task"}), 403
+    board_cache.bump(user_key(user_id))
     return jsonify({"success": True})
 
 @personal_bp.route("/update_task_status/<int:task_id>", methods=["PUT"])
 def update_task_status(task_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
     data = request.get_json()
     status = data.get("status")
     if status not in ["backlog", "in-progress", "completed"]:
         return jsonify({"success": False, "error": "Invalid status"})
-    with sqlite3.connect(TASK_DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE tasks SET status=? WHERE id=?", (status, task_id))
-        conn.commit()
-    return jsonify({"success": True})
\ No newline at end of file
+    user_id = session["user_id"]
+
+    updated = write(TASK_DB, lambda cursor: cursor.execute(
+        status_sql("tasks", "id = ? AND user_id = ?"), (status, status, status, task_id, user_id)).rowcount)
+    if not updated:
+        return jsonify({"error": "You don't have access to this task"}), 403
+    board_cache.bump(user_key(user_id))
+    return jsonify({"success": True})
+
+# PUT /move_task/<id> {"status": ..., "before": id|null, "after": id|null}
+# drops the task into a column between two of its cards, at the end without either
+@personal_bp.route("/move_task/<int:task_id>", methods=["PUT"])
+def move_task(task_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    data = request.get_json(silent=True) or {}
+    status = data.get("status")
+    before = data.get("before")
+    after = data.get("after")
+    if status not in STATUSES:
+        return jsonify({"error": "Invalid status"}), 400
+    if not all(neighbour is None or type(neighbour) is int for neighbour in (before, after)):
+        return jsonify({"error": "before and after must be task ids"}), 400
+    user_id = session["user_id"]
+
+    try:
+        moved = write(TASK_DB, lambda cursor: move(cursor, "tasks", task_id, user_id, status, before, after))
+    except InvalidMove as e:
+        return jsonify({"error": str(e)}), 400
+    if moved is None:
+        return jsonify({"error": "You don't have access to this task"}), 403
+    board_cache.bump(user_key(user_id))
+
+    if moved.crowded:
+        spread_later(TASK_DB, "tasks", user_id, status, moved.position,
+                     lambda: board_cache.bump(user_key(user_id)))
+    return jsonify({"success": True, "status": status, "position": moved.position})
+
+@personal_bp.route("/tasks/batch", methods=["POST"])
+def batch_tasks():
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    user_id = session["user_id"]
+    operations, results, error = parse_batch(request.get_json())
+    if error:
+        return jsonify({"error": error}), 400
+    if any("error" in result for result in results):
+        return jsonify({"success": False, "results": results}), 400
+
+    ids = referenced_ids(operations)
+
+    # permissions for the whole batch in one query, then every change in one transaction
+    def run(cursor):
+        owned = set()
+        if ids:
+            cursor.execute(
+                f"SELECT id FROM tasks WHERE user_id=? AND id IN ({id_placeholders(ids)})",
+                (user_id, *ids),
+            )
+            owned = {row[0] for row in cursor.fetchall()}
+
+        if deny_unlisted(operations, results, owned, "You don't have access to this task"):
+            return False
+        apply_batch(cursor, "tasks", operations, results, {"user_id": user_id})
+        return True
+
+    if not write(TASK_DB, run):
+        return jsonify({"success": False, "results": results}), 403
+    board_cache.bump(user_key(user_id))
+
+    return jsonify({"success": True, "results": results})
+
+# GET /archive/tasks?cursor=&limit=
+# completed tasks moved off the board by archive.py, newest completed first
+@personal_bp.route("/archive/tasks")
+@conditional(lambda: [user_key(session["user_id"])])
+def archived_tasks():
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    try:
+        limit = page_limit(request.args.get("limit"))
+        after = decode_cursor(request.args["cursor"], ARCHIVE_ORDER) if request.args.get("cursor") else None
+        if after is not None and not all(isinstance(value, int) for value in after):
+            raise ValueError("Invalid cursor")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with get_cursor(TASK_DB) as cursor:
+        rows, next_cursor = fetch_archived(cursor, "tasks", ARCHIVED_COLUMNS, session["user_id"], after, limit)
+
+    return jsonify({
+        "tasks": [task_json(row, ARCHIVED_FIELDS) for row in rows],
+        "next_cursor": next_cursor
+    })
+
+# POST /archive/tasks/<id>/restore  back to the end of the completed column
+@personal_bp.route("/archive/tasks/<int:task_id>/restore", methods=["POST"])
+def restore_task(task_id):
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    user_id = session["user_id"]
+
+    row = write(TASK_DB, lambda cursor: restore(cursor, "tasks", task_id, user_id, BOARD_COLUMNS))
+    if row is None:
+        return jsonify({"error": "No archived task with that id"}), 404
+    board_cache.bump(user_key(user_id))
+
+    return jsonify({"success": True, "task": task_json(row, BOARD_FIELDS)})
+
+# GET /export/tasks?format=csv|ndjson
+# every task of the user, streamed in id order. archived tasks are included with
+# status "completed", the export does not say when they were archived
+@personal_bp.route("/export/tasks")
+def export_tasks():
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in FORMATS:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+
+    chunks = export_chunks(TASK_DB, "tasks", EXPORT_FIELDS, "user_id", session["user_id"])
+    return export_response(fmt, EXPORT_FIELDS, chunks, "tasks")
+
+# POST /import/tasks[?format=csv|ndjson&progress=1], multipart upload in "file".
+# rows need a name, priority/date/time/status are optional and checked like the board does
+@personal_bp.route("/import/tasks", methods=["POST"])
+def import_tasks():
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "Upload a CSV or NDJSON file as 'file'"}), 400
+
+    user_id = session["user_id"]
+    progress = request.args.get("progress") == "1"
+    try:
+        rows = upload_rows(upload, request.args.get("format"), keep=progress)
+    except InvalidImport as e:
+        return jsonify({"error": str(e)}), 400
+
+    updates = run_import(TASK_DB, "tasks", {"user_id": user_id}, rows,
+                         lambda: board_cache.bump(user_key(user_id)))
+    return import_response(updates, progress)
@@ -0,0 +1,159 @@
+import threading
+from collections import namedtuple
+
+from boards import SCOPE_COLUMNS, POSITION_STEP
+from writes import write
+
+# cards are ordered by a REAL position within their column. a moved card gets the midpoint
+# of its new neighbours, so a move writes one row; new cards and status changes go to the
+# end (boards.end_position). halving one gap runs out of float precision after about 40
+# moves, so neighbours closer than REBALANCE_GAP get their part of the column spread out
+# again after the response, and a move that finds no room at all spreads it first
+REBALANCE_GAP = 1e-6
+# cards renumbered on each side of a crowded spot, doubled until they get room
+REBALANCE_WINDOW = 16
+# spacing a spread has to reach, far above REBALANCE_GAP so it does not come back soon
+SPREAD_STEP = 1e-3
+
+# spread: cards around were renumbered in the move, crowded: left for spread_later
+Move = namedtuple("Move", "position spread crowded")
+
+
+class InvalidMove(ValueError):
+    pass
+
+
+def _position_of(cursor, table, task_id, scope_value, status):
+    cursor.execute(
+        f"SELECT position FROM {table} WHERE id = ? AND {SCOPE_COLUMNS[table]} = ? AND status = ?",
+        (task_id, scope_value, status),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        raise InvalidMove("Neighbour is not in that column")
+    return row[0]
+
+
+def _bounds(cursor, table, task_id, scope_value, status, before, after):
+    # positions of the cards the task goes between, None past either end
+    column = f"FROM {table} WHERE {SCOPE_COLUMNS[table]} = ? AND status = ? AND id != ?"
+    args = (scope_value, status, task_id)
+
+    if after is not None:
+        low = _position_of(cursor, table, after, scope_value, status)
+        if before is not None:
+            return low, _position_of(cursor, table, before, scope_value, status)
+        cursor.execute(f"SELECT position {column} AND (position, id) > (?, ?) ORDER BY position, id LIMIT 1",
+                       (*args, low, after))
+        row = cursor.fetchone()
+        return low, row[0] if row else None
+
+    if before is not None:
+        high = _position_of(cursor, table, before, scope_value, status)
+        cursor.execute(f"SELECT position {column} AND (position, id) < (?, ?) ORDER BY position DESC, id DESC LIMIT 1",
+                       (*args, high, before))
+        row = cursor.fetchone()
+        return row[0] if row else None, high
+
+    cursor.execute(f"SELECT MAX(position) {column}", args)
+    return cursor.fetchone()[0], None
+
+
+def _between(low, high):
+    if low is None and high is None:
+        return POSITION_STEP
+    if low is None:
+        return high - POSITION_STEP
+    if high is None:
+        return low + POSITION_STEP
+    middle = (low + high) / 2
+    return middle if low < middle < high else None
+
+
+def move(cursor, table, task_id, scope_value, status, before=None, after=None):
+    # puts the task into the status column of its board right after the card `after` and/or
+    # right before `before` (ids), at the end without either. None when the task is not on
+    # that board, InvalidMove for neighbours that are not in the column
+    if task_id in (before, after):
+        raise InvalidMove("A task cannot be its own neighbour")
+    if before is not None and before == after:
+        raise InvalidMove("The before and after cards must be different")
+    cursor.execute(f"SELECT 1 FROM {table} WHERE id = ? AND {SCOPE_COLUMNS[table]} = ?", (task_id, scope_value))
+    if cursor.fetchone() is None:
+        return None
+
+    low, high = _bounds(cursor, table, task_id, scope_value, status, before, after)
+    if low is not None and high is not None and low > high:
+        raise InvalidMove("The after card must come before the before card")
+
+    spread_first = False
+    position = _between(low, high)
+    if position is None:
+        spread(cursor, table, scope_value, status, low)
+        spread_first = True
+        low, high = _bounds(cursor, table, task_id, scope_value, status, before, after)
+        position = _between(low, high)
+    # still no room: the neighbours shared a position and their ids order them the other way
+    if position is None:
+        raise InvalidMove("The after card must come before the before card")
+
+    cursor.execute(f"UPDATE {table} SET status = ?, position = ? WHERE id = ?", (status, position, task_id))
+    crowded = low is not None and high is not None and high - low < REBALANCE_GAP
+    return Move(position, spread_first, crowded)
+
+
+def spread(cursor, table, scope_value, status, position, window=REBALANCE_WINDOW):
+    # renumbers the cards on both sides of position evenly between the nearest cards
+    # outside the window, growing it until they get SPREAD_STEP apart (at worst the whole
+    # column). the order stays the same, ties are broken by id like the boards do
+    column = f"FROM {table} WHERE {SCOPE_COLUMNS[table]} = ? AND status = ?"
+    while True:
+        cursor.execute(f"SELECT id, position {column} AND position <= ? ORDER BY position DESC, id DESC LIMIT ?",
+                       (scope_value, status, position, window + 1))
+        below = cursor.fetchall()
+        cursor.execute(f"SELECT id, position {column} AND position > ? ORDER BY position, id LIMIT ?",
+                       (scope_value, status, position, window + 1))
+        above = cursor.fetchall()
+
+        low = below[window][1] if len(below) > window else None
+        high = above[window][1] if len(above) > window else None
+        cards = [row[0] for row in reversed(below[:window])] + [row[0] for row in above[:window]]
+
+        step = POSITION_STEP
+        if low is not None and high is not None:
+            step = (high - low) / (len(cards) + 1)
+            if step < SPREAD_STEP:
+                window *= 2
+                continue
+        elif low is None:
+            low = high - step * (len(cards) + 1) if high is not None else 0.0
+
+        cursor.executemany(f"UPDATE {table} SET position = ? WHERE id = ?",
+                           [(low + step * (n + 1), card) for n, card in enumerate(cards)])
+        return len(cards)
+
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def spread_later(db_file, table, scope_value, status, position, done=None):
+    # one small write through the queue after the response, at most one waiting per column.
+    # done runs after the commit (cache bumps, resync events)
+    key = (db_file, table, scope_value, status)
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+    threading.Thread(target=_spread_job, args=(key, position, done), daemon=True).start()
+
+
+def _spread_job(key, position, done):
+    db_file, table, scope_value, status = key
+    try:
+        write(db_file, lambda cursor: spread(cursor, table, scope_value, status, position))
+        if done:
+            done()
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
@@ -0,0 +1,252 @@
+import argparse
+import cProfile
+import hashlib
+import hmac
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, jsonify, request, session
+
+# endpoints sampled at PROFILE_RATE, e.g. "personal.profile,collaboration.view_collaboration".
+# empty turns sampling off, a signed X-Profile header still works when PROFILE_SECRET is set
+PROFILE_ENDPOINTS = {e.strip() for e in os.environ.get("PROFILE_ENDPOINTS", "").split(",") if e.strip()}
+PROFILE_RATE = float(os.environ.get("PROFILE_RATE", "0.01"))
+# "cprofile" writes .prof files (pstats), "sample" walks the request thread's stack every
+# PROFILE_INTERVAL seconds and writes flamegraph-ready .collapsed files. the sampler thread
+# needs the GIL to look, so in practice it gets one sample per switch interval (5ms):
+# good for the slow requests worth looking at, blind to sub-millisecond ones
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "cprofile")
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.001"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+# newest files kept, older ones are deleted as new ones are written
+PROFILE_KEEP = max(1, int(os.environ.get("PROFILE_KEEP", "200")))
+PROFILE_SECRET = os.environ.get("PROFILE_SECRET")
+# usernames allowed to read /admin/profiles
+PROFILE_ADMINS = {u.strip() for u in os.environ.get("PROFILE_ADMINS", "").split(",") if u.strip()}
+
+HEADER = "X-Profile"
+MAX_TOKEN_SECONDS = 24 * 3600
+
+# one profiled request at a time per process: keeps the overhead bounded and
+# cProfile refuses to run two profilers at once on newer Pythons
+_active = threading.Lock()
+
+
+def sign(expires, secret=None):
+    return hmac.new((secret or PROFILE_SECRET).encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+
+
+def make_token(seconds=600, secret=None):
+    expires = int(time.time() + seconds)
+    return f"{expires}.{sign(expires, secret)}"
+
+
+def _valid_token(token):
+    # "<unix expiry>.<hmac of the expiry>", so a leaked header stops working by itself
+    if not PROFILE_SECRET or not token:
+        return False
+    expires, _, signature = token.partition(".")
+    try:
+        expires = int(expires)
+    except ValueError:
+        return False
+    if not time.time() < expires <= time.time() + MAX_TOKEN_SECONDS:
+        return False
+    return hmac.compare_digest(signature, sign(expires))
+
+
+def _wanted():
+    if request.endpoint in PROFILE_ENDPOINTS and random.random() < PROFILE_RATE:
+        return True
+    return HEADER in request.headers and _valid_token(request.headers[HEADER])
+
+
+class StackSampler:
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+def _start_profile():
+    if not _wanted() or not _active.acquire(blocking=False):
+        return
+    if PROFILE_MODE == "sample":
+        profiler = StackSampler(threading.get_ident(), PROFILE_INTERVAL)
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    g._profiler = profiler
+
+
+def _stop_profile(error=None):
+    profiler = g.pop("_profiler", None)
+    if profiler is None:
+        return
+    try:
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+        else:
+            profiler.disable()
+    finally:
+        _active.release()
+    _save(profiler, request.endpoint or "unmatched")
+
+
+def _save(profiler, endpoint):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}-{os.getpid()}-{endpoint}"
+    if isinstance(profiler, StackSampler):
+        with open(os.path.join(PROFILE_DIR, name + ".collapsed"), "w") as f:
+            for stack, count in profiler.stacks.items():
+                f.write(f"{stack} {count}\n")
+    else:
+        profiler.dump_stats(os.path.join(PROFILE_DIR, name + ".prof"))
+    _rotate()
+
+
+def _profile_files():
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith((".prof", ".collapsed"))]
+    except FileNotFoundError:
+        return []
+    # names start with the timestamp, so sorting them sorts by age
+    return [os.path.join(PROFILE_DIR, n) for n in sorted(names)]
+
+
+def _rotate():
+    for path in _profile_files()[:-PROFILE_KEEP]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _pstats_hotspots(paths, top, sort):
+    stats = None
+    for path in paths:
+        try:
+            if stats is None:
+                stats = pstats.Stats(path)
+            else:
+                stats.add(path)
+        except (OSError, EOFError, ValueError):
+            continue
+    if stats is None:
+        return []
+
+    # (file, line, function) -> (primitive calls, calls, self time, cumulative time, callers)
+    column = 3 if sort == "cumulative" else 2
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][column], reverse=True)[:top]
+    return [{
+        "function": func,
+        "file": f"{os.path.basename(filename)}:{line}",
+        "calls": calls,
+        "self_ms": round(self_time * 1000, 3),
+        "cumulative_ms": round(cumulative * 1000, 3),
+    } for (filename, line, func), (_, calls, self_time, cumulative, _) in rows]
+
+
+def _sampled_hotspots(paths, top, sort):
+    own, inclusive, total = Counter(), Counter(), 0
+    for path in paths:
+        try:
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    count = int(count)
+                    frames = stack.split(";")
+                    own[frames[-1]] += count
+                    for frame in set(frames):
+                        inclusive[frame] += count
+                    total += count
+        except (OSError, ValueError):
+            continue
+
+    ranked = (inclusive if sort == "cumulative" else own).most_common(top)
+    return [{
+        "frame": frame,
+        "self_samples": own[frame],
+        "total_samples": inclusive[frame],
+        "self_pct": round(own[frame] * 100 / total, 1) if total else 0.0,
+        "total_pct": round(inclusive[frame] * 100 / total, 1) if total else 0.0,
+    } for frame, _ in ranked]
+
+
+# GET /admin/profiles[?files=<latest n>&top=<n>&sort=self|cumulative&endpoint=<name>]
+def profile_report():
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    if session["username"] not in PROFILE_ADMINS:
+        return jsonify({"error": "Forbidden"}), 403
+
+    try:
+        latest = max(1, int(request.args.get("files", "20")))
+        top = max(1, min(int(request.args.get("top", "25")), 200))
+    except ValueError:
+        return jsonify({"error": "files and top must be integers"}), 400
+    sort = request.args.get("sort", "self")
+    if sort not in ("self", "cumulative"):
+        return jsonify({"error": "sort must be self or cumulative"}), 400
+
+    paths = _profile_files()
+    endpoint = request.args.get("endpoint")
+    if endpoint:
+        paths = [p for p in paths if p.rsplit(".", 1)[0].endswith("-" + endpoint)]
+    paths = paths[-latest:]
+    profiled = [p for p in paths if p.endswith(".prof")]
+    sampled = [p for p in paths if p.endswith(".collapsed")]
+
+    return jsonify({
+        "files": [os.path.basename(p) for p in paths],
+        "profiled": _pstats_hotspots(profiled, top, sort),
+        "sampled": _sampled_hotspots(sampled, top, sort),
+    })
+
+
+def init_app(app):
+    app.before_request(_start_profile)
+    # teardown also runs when the view raised, so the profiler is always stopped
+    app.teardown_request(_stop_profile)
+    app.add_url_rule("/admin/profiles", "profile_report", profile_report)
+
+
+def main():
+    # python profiling.py token [--minutes 10]  ->  value for the X-Profile header
+    parser = argparse.ArgumentParser(description="Profiling helpers")
+    parser.add_argument("command", choices=["token"])
+    parser.add_argument("--minutes", type=float, default=10)
+    args = parser.parse_args()
+    if not PROFILE_SECRET:
+        sys.exit("PROFILE_SECRET is not set")
+    print(make_token(args.minutes * 60))
+
+
+if __name__ == "__main__":
+    main()
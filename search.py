@@ -0,0 +1,131 @@
+import html
+import re
+
+from flask import Blueprint, session, request, jsonify, url_for
+from db import get_cursor
+
+search_bp = Blueprint('search', __name__)
+
+# DB files
+TASK_DB = "todo.db"
+COLLAB_DB = "collaborations.db"
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+# results are merged from two indexes by rank, so deep pages cost more
+MAX_SEARCH_OFFSET = 1000
+MAX_TERMS = 8
+
+# highlight() wraps matches in these, they become <mark> once the name is escaped
+_OPEN, _CLOSE = "\x02", "\x03"
+_TERM = re.compile(r"\w+")
+
+
+def fts_query(text):
+    # every word has to start a word of the name: "gro caf" finds "Buy groceries at the café".
+    # terms are quoted, so nothing the user types is read as FTS5 syntax
+    return " ".join(f'"{term}"*' for term in _TERM.findall(text)[:MAX_TERMS])
+
+
+def _phrase(value):
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def highlight_html(marked):
+    return html.escape(marked).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+def search_personal(user_id, terms, limit):
+    # the user_id term narrows the match inside the index, the join keeps it exact
+    with get_cursor(TASK_DB) as cursor:
+        cursor.execute("""
+            SELECT t.id, t.name, t.priority, t.date, t.time, t.status,
+                   highlight(tasks_fts, 0, ?, ?), tasks_fts.rank
+            FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid
+            WHERE tasks_fts MATCH ? AND t.user_id = ?
+            ORDER BY tasks_fts.rank LIMIT ?
+        """, (_OPEN, _CLOSE, f"name : ({terms}) AND user_id : {_phrase(user_id)}", user_id, limit))
+        rows = cursor.fetchall()
+
+    return [({
+        "board": "personal",
+        "id": row[0],
+        "name": row[1],
+        "highlight": highlight_html(row[6]),
+        "priority": row[2],
+        "date": row[3],
+        "time": row[4],
+        "status": row[5],
+        "url": url_for("personal.profile")
+    }, row[7]) for row in rows]
+
+
+def search_collaborations(user_id, terms, limit):
+    with get_cursor(COLLAB_DB) as cursor:
+        cursor.execute("SELECT list_id FROM collab_members WHERE user_id = ?", (user_id,))
+        list_ids = [row[0] for row in cursor.fetchall()]
+        if not list_ids:
+            return []
+
+        scope = " OR ".join(_phrase(list_id) for list_id in list_ids)
+        cursor.execute("""
+            SELECT ct.id, ct.name, ct.priority, ct.date, ct.time, ct.status, a.username,
+                   ct.list_id, cl.list_name,
+                   highlight(collab_tasks_fts, 0, ?, ?), collab_tasks_fts.rank
+            FROM collab_tasks_fts
+            JOIN collab_tasks ct ON ct.id = collab_tasks_fts.rowid
+            JOIN collab_lists cl ON cl.id = ct.list_id
+            LEFT JOIN accounts.accounts a ON a.id = ct.creator_id
+            WHERE collab_tasks_fts MATCH ?
+              AND ct.list_id IN (SELECT list_id FROM collab_members WHERE user_id = ?)
+            ORDER BY collab_tasks_fts.rank LIMIT ?
+        """, (_OPEN, _CLOSE, f"name : ({terms}) AND list_id : ({scope})", user_id, limit))
+        rows = cursor.fetchall()
+
+    return [({
+        "board": "collaboration",
+        "id": row[0],
+        "name": row[1],
+        "highlight": highlight_html(row[9]),
+        "priority": row[2],
+        "date": row[3],
+        "time": row[4],
+        "status": row[5],
+        "created_by": row[6],
+        "list_id": row[7],
+        "list_name": row[8],
+        "url": url_for("collaboration.view_collaboration", list_id=row[7])
+    }, row[10]) for row in rows]
+
+
+# GET /search?q=<words>[&offset=<n>&limit=<n>]
+# best matches first across the user's tasks and every list they belong to
+@search_bp.route("/search")
+def search():
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    user_id = session["user_id"]
+    try:
+        offset = int(request.args.get("offset", "0"))
+        limit = int(request.args.get("limit", SEARCH_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers"}), 400
+    if not 0 <= offset <= MAX_SEARCH_OFFSET:
+        return jsonify({"error": f"offset must be between 0 and {MAX_SEARCH_OFFSET}"}), 400
+    limit = max(1, min(limit, MAX_SEARCH_PAGE_SIZE))
+
+    terms = fts_query(request.args.get("q", ""))
+    if not terms:
+        return jsonify({"results": [], "next_offset": None})
+
+    # each index returns its own best offset + limit + 1, enough to cut this page from the merge
+    wanted = offset + limit + 1
+    ranked = search_personal(user_id, terms, wanted) + search_collaborations(user_id, terms, wanted)
+    ranked.sort(key=lambda item: item[1])
+    page = ranked[offset:offset + limit + 1]
+
+    return jsonify({
+        "results": [result for result, _ in page[:limit]],
+        "next_offset": offset + limit if len(page) > limit else None
+    })
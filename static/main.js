@@ -4,6 +4,8 @@ import { initializeTaskEdit } from './taskEdit.js';
 import { initializeTaskEvents, attachTaskEvents, addSecondsDisplay } from './taskEvents.js';
 import { initializeDragDrop, setupDropZones } from './taskDragDrop.js';
 import { sortTasks } from './taskSort.js';
+import { initializePagination } from './taskPagination.js';
+import { initializeLiveUpdates } from './taskLive.js';
 
 document.addEventListener('DOMContentLoaded', function() {
 
@@ -16,6 +18,8 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeTaskEvents();
     initializeDragDrop();
     setupDropZones();
+    initializePagination();
+    initializeLiveUpdates();
 
     const dateInput = document.getElementById('date-input');
     const today = new Date().toISOString().split('T')[0];
@@ -79,6 +79,8 @@ export function initializeTaskCreation() {
                 addTaskBtn.innerHTML = '<i class="fa-solid fa-check"></i> Added!';
                 addTaskBtn.style.background = 'linear-gradient(135deg, #10b981, #059669)';
                 
+                // the live update for this task may have drawn it already
+                document.querySelector(`.task-card[data-id="${task.id}"]`)?.remove();
                 const taskElement = createTaskElement(task);
                 
                 let backlogContainer;
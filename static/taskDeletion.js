@@ -202,6 +202,8 @@ function undoCollabTask(taskData) {
     .then(res => res.json())
     .then(newTask => {
         const restoredTask = taskData.element;
+        // the live update for this task may have drawn it already
+        document.querySelector(`.task-card[data-id="${newTask.id}"]`)?.remove();
         restoredTask.setAttribute('data-id', newTask.id);
         
         const metaElement = restoredTask.querySelector('.task-meta small');
@@ -2,31 +2,46 @@ export function initializeDragDrop() {
     // Module is initialized through setupDropZones
 }
 
+// same order the server renders: the position users dragged the card to.
+// cards without one (e.g. just created before a reload) go last
+function sortKey(card) {
+    const position = parseFloat(card.dataset.position);
+    return Number.isNaN(position) ? Infinity : position;
+}
+
 export function sortTasks(container = null) {
     // if container not passed, sort all drop-zones
     const containers = container ? [container] : document.querySelectorAll('.drop-zone');
 
     containers.forEach(zone => {
-        const tasks = Array.from(zone.querySelectorAll('.task-card'));
+        const tasks = Array.from(zone.querySelectorAll('.task-card'))
+            .map(card => ({ card, key: sortKey(card) }));
 
-        tasks.sort((a, b) => {
-            const priorityOrder = { high: 1, mid: 2, low: 3 };
-            const aPriority = Object.keys(priorityOrder).find(p => a.classList.contains(p));
-            const bPriority = Object.keys(priorityOrder).find(p => b.classList.contains(p));
+        tasks.sort((a, b) => a.key - b.key || a.card.dataset.id - b.card.dataset.id);
+        tasks.forEach(({ card }) => zone.appendChild(card));
+    });
+}
 
-            // compare priority
-            if (priorityOrder[aPriority] !== priorityOrder[bPriority]) {
-                return priorityOrder[aPriority] - priorityOrder[bPriority];
-            }
+// columns arrive sorted from the server, so a moved card only needs to find its slot
+export function insertSorted(zone, taskElement) {
+    const key = sortKey(taskElement);
+    const next = Array.from(zone.querySelectorAll('.task-card'))
+        .find(card => card !== taskElement && key < sortKey(card));
+    zone.insertBefore(taskElement, next || null);
+}
 
-            // compare date + time
-            const aDate = new Date(`${a.querySelector('.task-date')?.textContent} ${a.querySelector('.task-time')?.textContent}`);
-            const bDate = new Date(`${b.querySelector('.task-date')?.textContent} ${b.querySelector('.task-time')?.textContent}`);
-            return aDate - bDate;
-        });
+// the card the pointer is above, the dropped card goes right before it (null: at the end)
+function cardBelow(zone, y) {
+    return Array.from(zone.querySelectorAll('.task-card:not(.dragging)')).find(card => {
+        const box = card.getBoundingClientRect();
+        return y < box.top + box.height / 2;
+    }) || null;
+}
 
-        tasks.forEach(task => zone.appendChild(task));
-    });
+function cardAbove(zone, beforeCard) {
+    const cards = Array.from(zone.querySelectorAll('.task-card:not(.dragging)'));
+    const index = beforeCard ? cards.indexOf(beforeCard) : cards.length;
+    return cards[index - 1] || null;
 }
 
 export function setupDragAndDrop(taskElement) {
@@ -78,80 +93,62 @@ export function setupDropZones() {
             const newStatus = zone.closest('.column').dataset.status;
             
             if (draggedTask && newStatus) {
-                const isCollabTask = draggedTask.hasAttribute('data-collab');
-                if (isCollabTask) {
-                    moveCollabTaskToStatus(taskId, newStatus, draggedTask, zone);
-                } else {
-                    moveTaskToStatus(taskId, newStatus, draggedTask, zone);
-                }
+                const beforeCard = cardBelow(zone, e.clientY);
+                const afterCard = cardAbove(zone, beforeCard);
+                const endpoint = draggedTask.hasAttribute('data-collab') ? '/move_collab_task' : '/move_task';
+                moveTask(endpoint, taskId, newStatus, draggedTask, zone, beforeCard, afterCard);
             }
         });
     });
 }
 
-function moveTaskToStatus(taskId, newStatus, taskElement, targetZone) {
-    fetch(`/update_task_status/${taskId}`, {
+// only the dropped card is sent, the server places it between its new neighbours
+function moveTask(endpoint, taskId, newStatus, taskElement, targetZone, beforeCard, afterCard) {
+    fetch(`${endpoint}/${taskId}`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ status: newStatus })
+        body: JSON.stringify({
+            status: newStatus,
+            before: beforeCard ? Number(beforeCard.dataset.id) : null,
+            after: afterCard ? Number(afterCard.dataset.id) : null
+        })
     })
     .then(res => res.json())
     .then(data => {
         if (data.success) {
             taskElement.remove();
-
+            targetZone.querySelector('.empty-state')?.remove();
             if (targetZone.dataset.empty === 'true') {
                 targetZone.innerHTML = '';
                 targetZone.removeAttribute('data-empty');
             }
 
-            targetZone.appendChild(taskElement);
-
-            // sort tasks after appending
-            sortTasks(targetZone);
+            taskElement.dataset.position = data.position;
+            targetZone.insertBefore(taskElement, beforeCard?.parentElement === targetZone ? beforeCard : null);
 
             showTaskMovedFeedback(taskElement, newStatus);
         } else {
-            console.error('Failed to update task status');
-            window.location.reload();
+            console.error('Failed to move task');
+            showMoveFailed(data.error);
         }
     })
     .catch(error => {
-        console.error('Error updating task status:', error);
-        window.location.reload();
+        console.error('Error moving task:', error);
+        showMoveFailed();
     });
 }
 
-function moveCollabTaskToStatus(taskId, newStatus, taskElement, targetZone) {
-    fetch(`/update_collab_task_status/${taskId}`, {
-        method: 'PUT',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ status: newStatus })
-    })
-    .then(res => res.json())
-    .then(data => {
-        if (data.success) {
-            taskElement.remove();
-
-            if (targetZone.querySelector('.empty-state')) {
-                targetZone.innerHTML = '';
-            }
-
-            targetZone.appendChild(taskElement);
-
-            // sort tasks after appending
-            sortTasks(targetZone);
+// the card only moves once the server accepts the change, so on failure it is still in its column
+function showMoveFailed(message) {
+    const toast = document.createElement('div');
+    toast.className = 'status-toast';
+    toast.textContent = message || 'Could not move the task, please try again.';
+    document.body.appendChild(toast);
 
-            showTaskMovedFeedback(taskElement, newStatus);
-        } else {
-            console.error('Failed to update task status');
-            window.location.reload();
-        }
-    })
-    .catch(error => {
-        console.error('Error updating task status:', error);
-        window.location.reload();
-    });
+    setTimeout(() => {
+        toast.classList.add('slide-out');
+        setTimeout(() => toast.remove(), 300);
+    }, 2000);
 }
 
 function showTaskMovedFeedback(taskElement, status) {
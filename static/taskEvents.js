@@ -64,13 +64,19 @@ export function addSecondsDisplay(taskDiv) {
     });
 }
 
+// the only priorities a card is styled with, anything else from the server is left unstyled
+const PRIORITIES = ['high', 'mid', 'low'];
+
 export function createTaskElement(task) {
     const isCollaboration = document.querySelector('[data-collab="true"]') || 
                            document.getElementById('collab-list-id');
     
     const taskDiv = document.createElement('div');
-    taskDiv.className = `task-card ${task.priority}`;
+    taskDiv.className = 'task-card';
     taskDiv.setAttribute('data-id', task.id);
+    if (task.position != null) {
+        taskDiv.setAttribute('data-position', task.position);
+    }
     taskDiv.setAttribute('draggable', 'true');
     if (isCollaboration) {
         taskDiv.setAttribute('data-collab', 'true');
@@ -78,19 +84,18 @@ export function createTaskElement(task) {
 
     const taskMeta = isCollaboration ? 
         `<div class="task-meta">
-            <small>Created by: ${task.created_by}</small>
+            <small></small>
         </div>` : '';
     
     taskDiv.innerHTML = `
         <div class="task-header">
-            <div class="task-name">${task.name}</div>
-            <div class="task-priority-badge ${task.priority}">${task.priority.charAt(0).toUpperCase() + task.priority.slice(1)}</div>
+            <div class="task-name"></div>
+            <div class="task-priority-badge"></div>
         </div>
         <div class="task-content">
-            <div class="task-date">${task.date}</div>
+            <div class="task-date"></div>
             <div class="task-time">
                 <i class="fa-solid fa-clock"></i>
-                ${task.time}
             </div>
         </div>
         ${taskMeta}
@@ -99,7 +104,25 @@ export function createTaskElement(task) {
             <i class="fa-solid fa-trash" title="Delete task"></i>
         </div>
     `;
-    
+
+    // task fields come from other members too (pagination, live updates), never parse them as HTML
+    taskDiv.querySelector('.task-name').textContent = task.name;
+
+    // imported and batch-created tasks may have no priority, their badge is left empty
+    const priority = task.priority || '';
+    const badge = taskDiv.querySelector('.task-priority-badge');
+    badge.textContent = priority.charAt(0).toUpperCase() + priority.slice(1);
+    if (PRIORITIES.includes(priority)) {
+        taskDiv.classList.add(priority);
+        badge.classList.add(priority);
+    }
+
+    taskDiv.querySelector('.task-date').textContent = task.date ?? '';
+    taskDiv.querySelector('.task-time').append(` ${task.time ?? ''}`);
+
+    if (isCollaboration) {
+        taskDiv.querySelector('.task-meta small').textContent = `Created by: ${task.created_by}`;
+    }
 
     attachTaskEvents(taskDiv);
     addSecondsDisplay(taskDiv);
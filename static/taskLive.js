@@ -0,0 +1,116 @@
+import { createTaskElement } from './taskEvents.js';
+import { insertSorted } from './taskDragDrop.js';
+import { observeColumn } from './taskPagination.js';
+
+const EMPTY_STATES = {
+    'backlog': ['fa-inbox', 'No tasks in backlog'],
+    'in-progress': ['fa-hourglass-half', 'No tasks in progress'],
+    'completed': ['fa-trophy', 'No completed tasks']
+};
+
+// changes made by other members arrive over server-sent events and are patched into the board
+export function initializeLiveUpdates() {
+    const listId = document.getElementById('collab-list-id')?.value;
+    if (!listId || !window.EventSource) return;
+
+    connect(listId, document.getElementById('collab-last-event-id')?.value || '');
+}
+
+function connect(listId, lastEventId) {
+    // later reconnects send Last-Event-ID themselves and the server prefers it
+    const params = lastEventId ? `?${new URLSearchParams({ last_event_id: lastEventId })}` : '';
+    const source = new EventSource(`/collaboration/${listId}/events${params}`);
+    let lastSeen = lastEventId;
+
+    const on = (event, handler) => source.addEventListener(event, e => {
+        if (e.lastEventId) lastSeen = e.lastEventId;
+        handler(JSON.parse(e.data));
+    });
+
+    on('task', upsertTask);
+    on('task_deleted', data => removeTask(data.id));
+    on('members', data => addMembers(data.added));
+    on('resync', () => resync(listId));
+
+    source.onerror = () => {
+        // the browser retries dropped streams on its own, a refused one (403, 503) stays closed
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(() => connect(listId, lastSeen), 30000);
+        }
+    };
+}
+
+function upsertTask(task) {
+    const existing = document.querySelector(`.task-card[data-id="${task.id}"]`);
+    // the drop that ends this drag brings its own update
+    if (existing?.classList.contains('dragging')) return;
+
+    if (existing) {
+        const previousZone = existing.parentElement;
+        existing.remove();
+        showEmptyState(previousZone);
+    }
+
+    const zone = document.querySelector(`.drop-zone[data-status="${task.status}"]`);
+    if (!zone) return;
+
+    const card = createTaskElement(task);
+    zone.querySelector('.empty-state')?.remove();
+    insertSorted(zone, card);
+
+    // past the loaded part of a paged column, the next page brings it in
+    const cards = zone.querySelectorAll('.task-card');
+    if (zone.dataset.nextCursor && cards[cards.length - 1] === card) {
+        card.remove();
+        showEmptyState(zone);
+    }
+}
+
+function removeTask(taskId) {
+    const card = document.querySelector(`.task-card[data-id="${taskId}"]`);
+    if (!card) return;
+
+    const zone = card.parentElement;
+    card.remove();
+    showEmptyState(zone);
+}
+
+function showEmptyState(zone) {
+    if (!zone || zone.querySelector('.task-card, .empty-state')) return;
+
+    const [icon, message] = EMPTY_STATES[zone.dataset.status] || ['fa-inbox', 'No tasks'];
+    const emptyState = document.createElement('div');
+    emptyState.className = 'empty-state';
+    emptyState.innerHTML = `<i class="fa-solid ${icon}"></i><p>${message}</p>`;
+    zone.appendChild(emptyState);
+}
+
+function addMembers(usernames) {
+    const span = document.querySelector('.collab-members span');
+    if (!span) return;
+
+    const members = span.textContent.split(',').map(name => name.trim()).filter(Boolean);
+    usernames.forEach(name => {
+        if (!members.includes(name)) members.push(name);
+    });
+    span.textContent = members.join(', ');
+}
+
+// events were missed (history ran out or the server restarted), reload the columns without a page reload
+function resync(listId) {
+    document.querySelectorAll('.drop-zone[data-status]').forEach(zone => {
+        const params = new URLSearchParams({ status: zone.dataset.status });
+
+        fetch(`/collaboration/${listId}/tasks?${params}`)
+            .then(res => res.json())
+            .then(data => {
+                zone.querySelectorAll('.task-card, .empty-state').forEach(el => el.remove());
+                data.tasks.forEach(task => zone.appendChild(createTaskElement(task)));
+                showEmptyState(zone);
+
+                zone.dataset.nextCursor = data.next_cursor || '';
+                observeColumn(zone, listId);
+            })
+            .catch(error => console.error('Error reloading tasks:', error));
+    });
+}
@@ -0,0 +1,60 @@
+import { createTaskElement } from './taskEvents.js';
+
+// columns are rendered with their first page only, the rest loads as the user scrolls
+export function initializePagination() {
+    const listId = document.getElementById('collab-list-id')?.value;
+
+    document.querySelectorAll('.drop-zone[data-next-cursor]').forEach(zone => observeColumn(zone, listId));
+}
+
+// loads the next page whenever the end of the column scrolls into view
+export function observeColumn(zone, listId) {
+    if (!zone.dataset.nextCursor || zone.nextElementSibling?.classList.contains('page-sentinel')) return;
+
+    const sentinel = document.createElement('div');
+    sentinel.className = 'page-sentinel';
+    zone.after(sentinel);
+
+    let loading = false;
+    const observer = new IntersectionObserver(entries => {
+        if (loading || !entries.some(entry => entry.isIntersecting)) return;
+
+        loading = true;
+        loadNextPage(zone, listId)
+            .then(hasMore => {
+                if (hasMore) {
+                    // re-observe so a sentinel that is still visible fires again
+                    observer.unobserve(sentinel);
+                    observer.observe(sentinel);
+                } else {
+                    observer.disconnect();
+                    sentinel.remove();
+                }
+            })
+            .catch(error => console.error('Error loading tasks:', error))
+            .finally(() => { loading = false; });
+    }, { rootMargin: '200px' });
+
+    observer.observe(sentinel);
+}
+
+function loadNextPage(zone, listId) {
+    const params = new URLSearchParams({
+        status: zone.dataset.status,
+        cursor: zone.dataset.nextCursor
+    });
+    const url = listId ? `/collaboration/${listId}/tasks?${params}` : `/tasks?${params}`;
+
+    return fetch(url)
+        .then(res => res.json())
+        .then(data => {
+            data.tasks.forEach(task => {
+                // a card dropped into this column may already be on the page
+                if (!zone.querySelector(`.task-card[data-id="${task.id}"]`)) {
+                    zone.appendChild(createTaskElement(task));
+                }
+            });
+            zone.dataset.nextCursor = data.next_cursor || '';
+            return Boolean(data.next_cursor);
+        });
+}
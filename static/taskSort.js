@@ -8,10 +8,13 @@ export function sortTasks() {
         const priorityOrder = { high: 1, mid: 2, low: 3 };
         const aPriority = Object.keys(priorityOrder).find(p => a.classList.contains(p));
         const bPriority = Object.keys(priorityOrder).find(p => b.classList.contains(p));
+        // cards without a priority go after the low ones
+        const aRank = priorityOrder[aPriority] ?? 4;
+        const bRank = priorityOrder[bPriority] ?? 4;
 
         // compare priority
-        if (priorityOrder[aPriority] !== priorityOrder[bPriority]) {
-            return priorityOrder[aPriority] - priorityOrder[bPriority];
+        if (aRank !== bRank) {
+            return aRank - bRank;
         }
 
         // compare date + time
@@ -0,0 +1,68 @@
+from flask import Blueprint, session, request, jsonify
+from db import get_cursor
+from cache import user_key
+from http_cache import conditional
+from boards import fetch_changes, page_limit, task_json
+from acl import collab_acl
+import personal_tasks
+import collaboration
+
+sync_bp = Blueprint('sync', __name__)
+
+# DB files
+TASK_DB = "todo.db"
+COLLAB_DB = "collaborations.db"
+
+
+def sync_owners():
+    list_id = request.args.get("list_id")
+    if not list_id:
+        return [user_key(session["user_id"])]
+    # a bad id gets no ETag, the view answers it
+    return collaboration.member_list_keys(int(list_id)) if list_id.isdigit() else None
+
+
+# GET /sync?since=<rev>               the user's personal board
+# GET /sync?since=<rev>&list_id=<id>  a collaboration list the user belongs to
+# returns the rows changed and ids deleted after since, continue from "rev"
+@sync_bp.route("/sync")
+@conditional(sync_owners)
+def sync():
+    if "username" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    user_id = session["user_id"]
+    try:
+        since = int(request.args.get("since", "0"))
+        limit = page_limit(request.args.get("limit"))
+        list_id = int(request.args["list_id"]) if request.args.get("list_id") else None
+    except ValueError:
+        return jsonify({"error": "since, limit and list_id must be integers"}), 400
+    if since < 0:
+        return jsonify({"error": "since must not be negative"}), 400
+
+    if list_id is None:
+        fields = personal_tasks.BOARD_FIELDS
+        with get_cursor(TASK_DB) as cursor:
+            changes = fetch_changes(cursor, "tasks", personal_tasks.BOARD_COLUMNS,
+                                    "user_id", user_id, since, limit)
+    else:
+        fields = collaboration.BOARD_FIELDS
+        access = collab_acl.for_list(user_id, list_id)
+        if not access or not access.member:
+            return jsonify({"error": "You don't have access to this collaboration"}), 403
+
+        with get_cursor(COLLAB_DB) as cursor:
+            changes = fetch_changes(cursor, "collab_tasks", collaboration.BOARD_COLUMNS,
+                                    "list_id", list_id, since, limit)
+
+    if changes is None:
+        return jsonify({"error": "Revision is newer than the server's, reload the board", "reset": True}), 409
+
+    changed, deleted, rev, more = changes
+    return jsonify({
+        "rev": rev,
+        "tasks": [task_json(row, fields) for row in changed],
+        "deleted": deleted,
+        "more": more
+    })
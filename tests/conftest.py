@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+# the app is a flat set of modules run from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# read when the modules are imported: no background archiving, and cheap password
+# hashes computed inline so every test can register and log in its own users
+os.environ.setdefault("ARCHIVE_INTERVAL", "0")
+os.environ.setdefault("HASH_WORKERS", "0")
+os.environ.setdefault("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+
+PASSWORD = "password1"
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # the database files are opened relative to the working directory, like in the app
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+
+    import writes
+    from db import close_all
+
+    close_all()
+    # the writers keep a connection to the files of this directory
+    writes._writers.clear()
+
+
+@pytest.fixture
+def app(workdir):
+    # a fresh set of databases, and nothing cached from other tests' databases
+    from app import app
+    from acl import collab_acl
+    from cache import board_cache, user_cache
+    from database import init_all
+
+    init_all()
+    board_cache.clear()
+    user_cache.clear()
+    collab_acl.clear()
+    return app
+
+
+@pytest.fixture
+def login(app):
+    # login("alice") -> a test client with alice's session, the account is created first
+    def login(username):
+        client = app.test_client()
+        client.post("/register", data={
+            "fullName": username.title(),
+            "email": f"{username}@example.com",
+            "username": username,
+            "password": PASSWORD,
+            "securityQuestion": "blue",
+        })
+        client.post("/login", data={"username": username, "password": PASSWORD})
+        return client
+    return login
+
+
+@pytest.fixture
+def collab(login):
+    # alice owns list 1 with bob as a member, carol is not in it
+    alice, bob, carol = login("alice"), login("bob"), login("carol")
+    alice.post("/create_collaboration", data={
+        "collab_name": "Trip",
+        "collab_description": "Summer trip",
+        "collab_members": "bob",
+    })
+    return alice, bob, carol
@@ -0,0 +1,62 @@
+import pytest
+
+from acl import CollabACL
+from database import DB_NAME, COLLAB_DB, MIGRATIONS, migrate
+from db import get_cursor
+
+
+@pytest.fixture
+def acl(workdir):
+    for db_file in (DB_NAME, COLLAB_DB):
+        migrate(db_file, MIGRATIONS[db_file])
+    with get_cursor(COLLAB_DB) as cursor:
+        cursor.execute("INSERT INTO collab_lists (id, list_name, owner_id) VALUES (1, 'Trip', 1)")
+        cursor.executemany("INSERT INTO collab_members (list_id, user_id) VALUES (1, ?)", [(1,), (2,)])
+        cursor.execute("INSERT INTO collab_tasks (id, list_id, name, creator_id) VALUES (10, 1, 'Pack', 2)")
+    return CollabACL()
+
+
+def add_member(list_id, user_id):
+    # a grant made by another worker: straight to the database, this process is not told
+    with get_cursor(COLLAB_DB) as cursor:
+        cursor.execute("INSERT INTO collab_members (list_id, user_id) VALUES (?, ?)", (list_id, user_id))
+
+
+def test_list_access(acl):
+    assert acl.for_list(1, 1) == (1, True, True, False)
+    assert acl.for_list(2, 1) == (1, True, False, False)
+    assert acl.for_list(3, 1).member is False
+    assert acl.for_list(1, 99) is None
+
+
+def test_repeat_checks_are_answered_from_memory(acl):
+    acl.for_list(2, 1)
+    acl.for_list(2, 1)
+    acl.for_task(2, 10)
+    assert acl.stats()["hits"] >= 2
+
+
+def test_a_refusal_is_checked_against_the_database(acl):
+    assert not acl.for_list(3, 1).member
+    add_member(1, 3)
+    assert acl.for_list(3, 1).member
+
+
+def test_task_access_knows_the_creator(acl):
+    assert acl.for_task(2, 10) == (1, True, False, True)
+    assert acl.for_task(1, 10) == (1, True, True, False)
+    assert acl.for_task(3, 10).member is False
+    assert acl.for_task(1, 99) is None
+
+
+def test_local_changes_update_the_map(acl):
+    acl.list_created(2, 1, [1])
+    assert acl.for_list(1, 2).owner
+    acl.members_added(2, [4])
+    assert acl.for_list(4, 2).member
+
+    acl.task_created(11, 2, 4)
+    assert acl.for_task(4, 11).creator
+    acl.task_deleted(11)
+    # gone from memory and never written to the database
+    assert acl.for_task(4, 11) is None
@@ -0,0 +1,154 @@
+import time
+
+import pytest
+
+from acl import collab_acl
+from archive import archive_all, archive_chunk, archive_table, fetch_archived, restore
+from boards import decode_cursor
+from database import DB_NAME, TASK_DB, MIGRATIONS, migrate
+from db import get_cursor
+
+COLUMNS = "id, name, completed_at"
+
+
+@pytest.fixture
+def tasks(workdir):
+    # user 1: five tasks completed at 100..500, one still open. user 2: one completed at 100
+    for db_file in (DB_NAME, TASK_DB):
+        migrate(db_file, MIGRATIONS[db_file])
+    with get_cursor(TASK_DB) as cursor:
+        cursor.executemany(
+            "INSERT INTO tasks (id, user_id, name, status, position, completed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [(1, 1, "Task 1", "completed", 1.0, 300),
+             (2, 1, "Task 2", "completed", 2.0, 100),
+             (3, 1, "Task 3", "completed", 3.0, 500),
+             (4, 1, "Task 4", "completed", 4.0, 200),
+             (5, 1, "Task 5", "completed", 5.0, 400),
+             (6, 1, "Open", "backlog", 1.0, None),
+             (7, 2, "Theirs", "completed", 1.0, 100)])
+    return TASK_DB
+
+
+def ids(rows):
+    return [row[0] for row in rows]
+
+
+def archived_ids(cursor, user_id=1):
+    cursor.execute("SELECT id FROM tasks_archive WHERE user_id = ? ORDER BY id", (user_id,))
+    return ids(cursor.fetchall())
+
+
+def test_archive_chunk_moves_the_oldest_first(tasks):
+    with get_cursor(TASK_DB) as cursor:
+        assert archive_chunk(cursor, "tasks", 350, limit=2) == [(2, 1), (7, 2)]
+        assert archive_chunk(cursor, "tasks", 350, limit=2) == [(4, 1), (1, 1)]
+        assert archive_chunk(cursor, "tasks", 350, limit=2) == []
+
+        assert archived_ids(cursor) == [1, 2, 4]
+        cursor.execute("SELECT id FROM tasks ORDER BY id")
+        assert ids(cursor.fetchall()) == [3, 5, 6]
+        # the archive keeps when each was completed
+        cursor.execute("SELECT completed_at FROM tasks_archive WHERE id = 2")
+        assert cursor.fetchone()[0] == 100
+        # and the board rows left tombstones for synced clients
+        cursor.execute("SELECT task_id, user_id FROM tasks_deleted ORDER BY task_id")
+        assert cursor.fetchall() == [(1, 1), (2, 1), (4, 1), (7, 2)]
+
+
+def test_archive_table_runs_chunk_by_chunk(tasks):
+    chunks = []
+    assert archive_table(TASK_DB, "tasks", 450, chunks.append, chunk=2) == 5
+    assert [len(rows) for rows in chunks] == [2, 2, 1]
+
+
+def test_open_tasks_stay(tasks):
+    assert archive_table(TASK_DB, "tasks", 10 ** 12) == 6
+    with get_cursor(TASK_DB) as cursor:
+        cursor.execute("SELECT id FROM tasks")
+        assert ids(cursor.fetchall()) == [6]
+
+
+def test_fetch_archived_pages(tasks):
+    archive_table(TASK_DB, "tasks", 10 ** 12)
+
+    seen, after = [], None
+    with get_cursor(TASK_DB) as cursor:
+        while True:
+            rows, next_cursor = fetch_archived(cursor, "tasks", COLUMNS, 1, after, limit=2)
+            seen.append(ids(rows))
+            if next_cursor is None:
+                break
+            after = decode_cursor(next_cursor, ("completed_at", "id"))
+        # newest completed first, only the user's own
+        assert seen == [[3, 5], [1, 4], [2]]
+        assert ids(fetch_archived(cursor, "tasks", COLUMNS, 2)[0]) == [7]
+
+
+def test_fetch_archived_breaks_ties_by_id(tasks):
+    with get_cursor(TASK_DB) as cursor:
+        cursor.execute("UPDATE tasks SET completed_at = 100 WHERE user_id = 1 AND status = 'completed'")
+    archive_table(TASK_DB, "tasks", 10 ** 12)
+    with get_cursor(TASK_DB) as cursor:
+        rows, next_cursor = fetch_archived(cursor, "tasks", COLUMNS, 1, limit=3)
+        assert ids(rows) == [5, 4, 3]
+        rows, _ = fetch_archived(cursor, "tasks", COLUMNS, 1, decode_cursor(next_cursor, ("completed_at", "id")))
+        assert ids(rows) == [2, 1]
+
+
+def test_restore(tasks):
+    archive_table(TASK_DB, "tasks", 10 ** 12)
+    with get_cursor(TASK_DB) as cursor:
+        # not in that user's archive
+        assert restore(cursor, "tasks", 7, 1, "id") is None
+        assert restore(cursor, "tasks", 6, 1, "id") is None
+
+        started = int(time.time())
+        row = restore(cursor, "tasks", 2, 1, "id, name, status, position, completed_at")
+        assert tuple(row[:3]) == (2, "Task 2", "completed")
+        # at the end of the completed column, completed as of now
+        assert row[3] == 1.0 and row[4] >= started
+
+        assert 2 not in archived_ids(cursor)
+        cursor.execute("SELECT COUNT(*) FROM tasks_deleted WHERE task_id = 2")
+        assert cursor.fetchone()[0] == 0
+        # the other tombstones stay
+        cursor.execute("SELECT COUNT(*) FROM tasks_deleted")
+        assert cursor.fetchone()[0] == 5
+
+
+def test_archive_routes(login):
+    alice, bob = login("alice"), login("bob")
+    for name in ("One", "Two", "Three"):
+        task_id = alice.post("/add_task", json={"name": name, "priority": "low"}).get_json()["id"]
+        alice.put(f"/update_task_status/{task_id}", json={"status": "completed"})
+    archive_all(days=0, now=time.time() + 60)
+
+    body = alice.get("/archive/tasks?limit=2").get_json()
+    assert len(body["tasks"]) == 2 and body["next_cursor"]
+    rest = alice.get(f"/archive/tasks?limit=2&cursor={body['next_cursor']}").get_json()
+    assert len(rest["tasks"]) == 1 and rest["next_cursor"] is None
+    assert alice.get("/archive/tasks?cursor=WyJ4IiwxXQ").status_code == 400
+
+    assert bob.get("/archive/tasks").get_json()["tasks"] == []
+    assert bob.post(f"/archive/tasks/{task_id}/restore").status_code == 404
+    assert alice.post(f"/archive/tasks/{task_id}/restore").get_json()["task"]["name"] == "Three"
+    assert alice.post(f"/archive/tasks/{task_id}/restore").status_code == 404
+    assert [task["name"] for task in alice.get("/tasks?status=completed").get_json()["tasks"]] == ["Three"]
+
+
+def test_collab_restore_gives_the_creator_access_again(collab):
+    alice, bob, carol = collab
+    task_id = bob.post("/add_collab_task/1", json={"name": "Pack bags", "priority": "low"}).get_json()["id"]
+    bob.put(f"/update_collab_task_status/{task_id}", json={"status": "completed"})
+    archive_all(days=0, now=time.time() + 60)
+
+    # archived tasks leave the permission map with the board
+    assert collab_acl.for_task(2, task_id) is None
+    assert bob.delete(f"/delete_collab_task/{task_id}").status_code == 403
+    assert carol.post(f"/collaboration/1/archive/{task_id}/restore").status_code == 403
+
+    assert alice.post(f"/collaboration/1/archive/{task_id}/restore").status_code == 200
+    access = collab_acl.for_task(2, task_id)
+    assert access.creator and access.list_id == 1
+    # only the creator or the owner may delete, bob is the creator again
+    assert bob.delete(f"/delete_collab_task/{task_id}").status_code == 200
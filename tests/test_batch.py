@@ -0,0 +1,159 @@
+import pytest
+
+from boards import validate_operation
+
+COLLAB_BATCH = "/collaboration/1/tasks/batch"
+
+
+def batch(client, operations, url="/tasks/batch"):
+    return client.post(url, json={"operations": operations})
+
+
+def add_task(client, name):
+    return client.post("/add_task", json={"name": name, "priority": "low"}).get_json()["id"]
+
+
+def add_collab_task(client, name):
+    return client.post("/add_collab_task/1", json={"name": name, "priority": "low"}).get_json()["id"]
+
+
+def names(client, url="/tasks", status="backlog"):
+    return [task["name"] for task in client.get(f"{url}?status={status}").get_json()["tasks"]]
+
+
+@pytest.mark.parametrize("op, error", [
+    ({"op": "edit", "id": True, "name": "x"}, "Task id required"),
+    ({"op": "delete", "id": "1"}, "Task id required"),
+    ({"op": "create"}, "Task name required"),
+    ({"op": "edit", "id": 1}, "Nothing to edit"),
+    ({"op": "edit", "id": 1, "name": ""}, "Task name required"),
+    ({"op": "create", "name": "x", "priority": "urgent"}, "Invalid priority"),
+    ({"op": "create", "name": "x", "date": "<img src=x>"}, "Invalid date, expected YYYY-MM-DD"),
+    ({"op": "edit", "id": 1, "date": "2024-02-30"}, "Invalid date, expected YYYY-MM-DD"),
+    ({"op": "edit", "id": 1, "time": "9:00"}, "Invalid time, expected HH:MM"),
+    ({"op": "create", "name": "x", "time": 900}, "Invalid time, expected HH:MM"),
+    ({"op": "status", "id": 1, "status": "done"}, "Invalid status"),
+    ({"op": "archive", "id": 1}, "Unknown operation"),
+    ("create", "Operation must be an object"),
+])
+def test_invalid_operations(op, error):
+    assert validate_operation(op) == error
+
+
+def test_personal_batch_reports_each_operation(login):
+    alice = login("alice")
+    first, second = add_task(alice, "Buy milk"), add_task(alice, "Pay rent")
+
+    response = batch(alice, [
+        {"op": "create", "name": "Call mom", "priority": "high"},
+        {"op": "edit", "id": first, "name": "Buy oat milk"},
+        {"op": "status", "id": second, "status": "completed"},
+        {"op": "delete", "id": first},
+    ])
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [(result["index"], result["op"], result["success"]) for result in results] == [
+        (0, "create", True), (1, "edit", True), (2, "status", True), (3, "delete", True)]
+    created = results[0]["id"]
+    assert isinstance(created, int) and created not in (first, second)
+
+    assert names(alice) == ["Call mom"]
+    assert names(alice, status="completed") == ["Pay rent"]
+
+
+def test_personal_batch_with_an_invalid_operation_changes_nothing(login):
+    alice = login("alice")
+    task_id = add_task(alice, "Buy milk")
+
+    response = batch(alice, [
+        {"op": "create", "name": "Call mom"},
+        {"op": "edit", "id": task_id, "priority": "urgent"},
+    ])
+    assert response.status_code == 400
+    results = response.get_json()["results"]
+    assert "error" not in results[0]
+    assert results[1]["error"] == "Invalid priority"
+    assert names(alice) == ["Buy milk"]
+
+
+def test_personal_batch_on_someone_elses_task_is_denied_as_a_whole(login):
+    alice, bob = login("alice"), login("bob")
+    theirs = add_task(bob, "Fix bike")
+    mine = add_task(alice, "Buy milk")
+
+    response = batch(alice, [
+        {"op": "create", "name": "Call mom"},
+        {"op": "delete", "id": mine},
+        {"op": "edit", "id": theirs, "name": "Stolen"},
+    ])
+    assert response.status_code == 403
+    results = response.get_json()["results"]
+    assert results[2]["error"] == "You don't have access to this task"
+    assert "error" not in results[0] and "error" not in results[1]
+
+    # nothing of the batch was applied, not even the allowed operations
+    assert names(alice) == ["Buy milk"]
+    assert names(bob) == ["Fix bike"]
+
+
+def test_batch_needs_operations(login):
+    alice = login("alice")
+    assert alice.post("/tasks/batch", json={}).status_code == 400
+    assert batch(alice, []).status_code == 400
+    assert batch(alice, [{"op": "create", "name": "x"}] * 501).status_code == 400
+
+
+def test_collab_batch_reports_each_operation(collab):
+    alice, bob, _ = collab
+    mine = add_collab_task(bob, "Book flights")
+
+    response = batch(bob, [
+        {"op": "create", "name": "Pack bags"},
+        {"op": "status", "id": mine, "status": "in-progress"},
+    ], COLLAB_BATCH)
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["success"] for result in results] == [True, True]
+
+    # the created task is bob's, so bob may delete it in a later batch
+    response = batch(bob, [{"op": "delete", "id": results[0]["id"]}], COLLAB_BATCH)
+    assert response.status_code == 200
+    assert names(alice, "/collaboration/1/tasks", "in-progress") == ["Book flights"]
+    assert names(alice, "/collaboration/1/tasks") == []
+
+
+def test_collab_batch_delete_needs_creator_or_owner(collab):
+    alice, bob, _ = collab
+    owners = add_collab_task(alice, "Pack bags")
+
+    response = batch(bob, [
+        {"op": "create", "name": "Rent a car"},
+        {"op": "delete", "id": owners},
+    ], COLLAB_BATCH)
+    assert response.status_code == 403
+    assert response.get_json()["results"][1]["error"] == "Only task creator or list owner can delete tasks"
+    assert names(alice, "/collaboration/1/tasks") == ["Pack bags"]
+
+    # the owner may delete anyone's task
+    bobs = add_collab_task(bob, "Book flights")
+    assert batch(alice, [{"op": "delete", "id": bobs}], COLLAB_BATCH).status_code == 200
+
+
+def test_collab_batch_on_a_task_of_another_list_is_denied(collab):
+    alice, bob, _ = collab
+    own = add_task(bob, "Fix bike")
+
+    response = batch(bob, [
+        {"op": "create", "name": "Rent a car"},
+        {"op": "edit", "id": own, "name": "Moved"},
+    ], COLLAB_BATCH)
+    assert response.status_code == 403
+    assert response.get_json()["results"][1]["error"] == "Task is not in this collaboration"
+    assert names(alice, "/collaboration/1/tasks") == []
+    assert names(bob) == ["Fix bike"]
+
+
+def test_collab_batch_needs_membership(collab):
+    _, _, carol = collab
+    response = batch(carol, [{"op": "create", "name": "Sneak in"}], COLLAB_BATCH)
+    assert response.status_code == 403
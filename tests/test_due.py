@@ -0,0 +1,111 @@
+import calendar
+from datetime import datetime
+
+import pytest
+
+from due import DAY, due_range
+
+NOW = "2024-05-10T12:00"
+
+
+def at(text):
+    return calendar.timegm(datetime.fromisoformat(text).timetuple())
+
+
+def add_task(client, name, date, time="", url="/add_task"):
+    return client.post(url, json={"name": name, "priority": "low", "date": date, "time": time}).get_json()["id"]
+
+
+def due(client, view, **args):
+    return client.get(f"/due/{view}", query_string={"now": NOW, **args})
+
+
+def names(client, view):
+    return [task["name"] for task in due(client, view).get_json()["tasks"]]
+
+
+def test_ranges():
+    now = datetime.fromisoformat(NOW)
+    assert due_range("overdue", now) == (None, at(NOW))
+    assert due_range("today", now) == (at("2024-05-10"), at("2024-05-10") + DAY)
+    assert due_range("week", now) == (at("2024-05-11"), at("2024-05-18"))
+
+
+def test_view_boundaries(login):
+    alice = login("alice")
+    add_task(alice, "Yesterday", "2024-05-09")
+    add_task(alice, "This morning", "2024-05-10", "09:00")
+    add_task(alice, "Noon", "2024-05-10", "12:00")
+    add_task(alice, "Tonight", "2024-05-10")
+    add_task(alice, "Tomorrow", "2024-05-11", "00:00")
+    add_task(alice, "Last day of the week", "2024-05-17", "23:59")
+    add_task(alice, "Too far", "2024-05-18", "00:00")
+    add_task(alice, "Someday", "")
+    done = add_task(alice, "Done late", "2024-05-01")
+    alice.put(f"/update_task_status/{done}", json={"status": "completed"})
+
+    # due exactly now is not overdue yet, a date without a time is due at the end of the day
+    assert names(alice, "overdue") == ["Yesterday", "This morning"]
+    assert names(alice, "today") == ["This morning", "Noon", "Tonight"]
+    assert names(alice, "week") == ["Tomorrow", "Last day of the week"]
+
+
+def test_due_at_is_returned(login):
+    alice = login("alice")
+    add_task(alice, "Call mom", "2024-05-10", "09:30")
+    [task] = due(alice, "today").get_json()["tasks"]
+    assert (task["board"], task["due_at"]) == ("personal", at("2024-05-10T09:30"))
+
+
+@pytest.fixture
+def merged(collab):
+    # the same due times on both boards, alice sees them merged
+    alice, bob, carol = collab
+    for time in ("08:00", "09:00", "09:00"):
+        add_task(alice, f"Mine {time}", "2024-05-09", time)
+        add_task(bob, f"Shared {time}", "2024-05-09", time, "/add_collab_task/1")
+    add_task(bob, "Bob's own", "2024-05-09", "08:00")
+    return alice, bob, carol
+
+
+def test_merged_order(merged):
+    alice, _, carol = merged
+    tasks = due(alice, "overdue").get_json()["tasks"]
+    # by due time, personal first on a tie, then by id
+    assert [(task["board"], task["name"]) for task in tasks] == [
+        ("personal", "Mine 08:00"), ("collaboration", "Shared 08:00"),
+        ("personal", "Mine 09:00"), ("personal", "Mine 09:00"),
+        ("collaboration", "Shared 09:00"), ("collaboration", "Shared 09:00"),
+    ]
+    assert tasks[1]["list_name"] == "Trip" and tasks[1]["created_by"] == "bob"
+    assert names(carol, "overdue") == []
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4])
+def test_merged_cursor_pages(merged, limit):
+    alice = merged[0]
+    everything = [(task["board"], task["id"]) for task in due(alice, "overdue").get_json()["tasks"]]
+
+    seen, cursor = [], None
+    while True:
+        args = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        body = due(alice, "overdue", **args).get_json()
+        assert len(body["tasks"]) <= limit
+        seen += [(task["board"], task["id"]) for task in body["tasks"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == everything
+
+
+@pytest.mark.parametrize("view, args, status", [
+    ("later", {}, 404),
+    ("today", {"now": "tomorrow"}, 400),
+    ("today", {"limit": "x"}, 400),
+    ("today", {"cursor": "!!!"}, 400),
+    # due times and ids are whole numbers
+    ("today", {"cursor": "WzEuNSwwLDFd"}, 400),
+])
+def test_bad_requests(login, view, args, status):
+    alice = login("alice")
+    assert due(alice, view, **args).status_code == status
@@ -0,0 +1,157 @@
+import json
+
+import pytest
+
+import events
+from events import EventBus, TooManyStreams
+
+RESYNC = (None, "resync", "{}")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(events, "time", clock)
+    return clock
+
+
+def drain(sub):
+    entries = []
+    while not sub.queue.empty():
+        entries.append(sub.queue.get_nowait())
+    return entries
+
+
+def test_subscribers_get_new_events():
+    bus = EventBus()
+    sub = bus.subscribe("list:1")
+    other = bus.subscribe("list:2")
+    bus.publish("list:1", "task", {"id": 5})
+
+    [(seq, event, data)] = drain(sub)
+    assert (event, json.loads(data)) == ("task", {"id": 5})
+    assert bus.last_event_id() == f"{bus.token}-{seq}"
+    assert drain(other) == []
+
+
+def test_replay_after_last_event_id():
+    bus = EventBus()
+    bus.publish("list:1", "task", {"id": 1})
+    seen = bus.last_event_id()
+    bus.publish("list:2", "task", {"id": 2})
+    bus.publish("list:1", "task", {"id": 3})
+    bus.publish("list:1", "task_deleted", {"id": 1})
+
+    sub = bus.subscribe("list:1", seen)
+    assert [(event, json.loads(data)) for _, event, data in sub.replay] == [
+        ("task", {"id": 3}), ("task_deleted", {"id": 1})]
+
+    # up to date: nothing to replay
+    assert bus.subscribe("list:1", bus.last_event_id()).replay == []
+
+
+def test_id_from_before_a_channels_first_event_replays_all_of_it():
+    bus = EventBus(history=3)
+    bus.publish("list:2", "task", {"id": 1})
+    seen = bus.last_event_id()
+    bus.publish("list:1", "task", {"id": 2})
+    assert len(bus.subscribe("list:1", seen).replay) == 1
+
+
+@pytest.mark.parametrize("last_event_id", ["0123abcd-1", "garbage", "{token}-x", "{token}-"])
+def test_foreign_or_malformed_ids_resync(last_event_id):
+    bus = EventBus()
+    bus.publish("list:1", "task", {"id": 1})
+    sub = bus.subscribe("list:1", last_event_id.format(token=bus.token))
+    assert sub.replay == [RESYNC]
+
+
+def test_ids_older_than_a_full_history_resync():
+    bus = EventBus(history=2)
+    bus.publish("list:1", "task", {"id": 1})
+    seen = bus.last_event_id()
+    for task_id in (2, 3, 4):
+        bus.publish("list:1", "task", {"id": task_id})
+    # event 2 fell out of the history, the client can't be caught up
+    assert bus.subscribe("list:1", seen).replay == [RESYNC]
+
+
+def test_dropped_history_resyncs(clock):
+    bus = EventBus(replay_seconds=60)
+    bus.publish("list:1", "task", {"id": 1})
+    seen = bus.last_event_id()
+    bus.publish("list:1", "task", {"id": 2})
+
+    # idle for the whole window with nobody subscribed, the next publish drops it
+    clock.now += 61
+    bus.publish("list:2", "task", {"id": 3})
+    assert bus.stats()["histories"] == 1
+    assert bus.subscribe("list:1", seen).replay == [RESYNC]
+
+
+def test_history_of_a_watched_list_is_kept(clock):
+    bus = EventBus(replay_seconds=60)
+    bus.publish("list:1", "task", {"id": 1})
+    seen = bus.last_event_id()
+    bus.publish("list:1", "task", {"id": 2})
+    bus.subscribe("list:1")
+
+    clock.now += 61
+    bus.publish("list:2", "task", {"id": 3})
+    assert bus.stats()["histories"] == 2
+    assert len(bus.subscribe("list:1", seen).replay) == 1
+
+
+def test_stream_limits():
+    bus = EventBus(max_per_channel=2, max_total=3)
+    first = bus.subscribe("list:1")
+    bus.subscribe("list:1")
+    assert not bus.has_room("list:1")
+    with pytest.raises(TooManyStreams):
+        bus.subscribe("list:1")
+
+    bus.subscribe("list:2")
+    with pytest.raises(TooManyStreams):
+        bus.subscribe("list:3")
+
+    bus.unsubscribe(first)
+    assert bus.has_room("list:1")
+    assert bus.stats()["streams"] == 2
+
+
+def test_stream_when_full_asks_to_retry_later():
+    bus = EventBus(max_per_channel=1)
+    bus.subscribe("list:1")
+    assert list(bus.stream("list:1")) == ["retry: 30000\n\n"]
+    assert bus.stats()["streams"] == 1
+
+
+def test_stream_replays_and_unsubscribes_when_closed():
+    bus = EventBus()
+    bus.publish("list:1", "task", {"id": 1})
+    seen = bus.last_event_id()
+    bus.publish("list:1", "task", {"id": 2})
+
+    body = bus.stream("list:1", seen)
+    assert next(body) == "retry: 3000\n\n"
+    assert next(body) == f'id: {bus.token}-2\nevent: task\ndata: {{"id": 2}}\n\n'
+    assert bus.stats()["streams"] == 1
+    body.close()
+    assert bus.stats()["streams"] == 0
+
+
+def test_slow_reader_is_cut_off(monkeypatch):
+    monkeypatch.setattr(events, "SUBSCRIBER_BUFFER", 1)
+    bus = EventBus()
+    sub = bus.subscribe("list:1")
+    bus.publish("list:1", "task", {"id": 1})
+    bus.publish("list:1", "task", {"id": 2})
+    assert sub.queue is None
@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+import time
+
+import pytest
+
+from archive import archive_all
+from exports import export_chunks
+from personal_tasks import EXPORT_FIELDS
+
+TASK_DB = "todo.db"
+
+
+def add_tasks(client, names, url="/add_task"):
+    return [client.post(url, json={"name": name, "priority": "low"}).get_json()["id"] for name in names]
+
+
+def complete_and_archive(client, task_ids, url="/update_task_status/{}"):
+    for task_id in task_ids:
+        client.put(url.format(task_id), json={"status": "completed"})
+    archive_all(days=0, now=time.time() + 60)
+
+
+def user_id(client):
+    with client.session_transaction() as session:
+        return session["user_id"]
+
+
+@pytest.fixture
+def board(login):
+    # alice: 5 tasks, the 2nd and 4th archived. bob has one of each
+    alice, bob = login("alice"), login("bob")
+    ids = add_tasks(alice, ["One", "Two", "Three", "Four", "Five"])
+    theirs = add_tasks(bob, ["Bob live", "Bob archived"])
+    alice.put(f"/update_task_status/{ids[0]}", json={"status": "in-progress"})
+    bob.put(f"/update_task_status/{theirs[1]}", json={"status": "completed"})
+    complete_and_archive(alice, [ids[1], ids[3]])
+    return alice, bob, ids
+
+
+def test_chunks_merge_the_archive_in_id_order(board):
+    alice, _, ids = board
+    chunks = list(export_chunks(TASK_DB, "tasks", EXPORT_FIELDS, "user_id", user_id(alice), chunk=2))
+
+    assert [len(rows) for rows in chunks] == [2, 2, 1]
+    rows = [row for rows in chunks for row in rows]
+    assert [row[0] for row in rows] == ids
+    status = EXPORT_FIELDS.index("status")
+    assert [row[status] for row in rows] == ["in-progress", "completed", "backlog", "completed", "backlog"]
+
+
+def test_chunk_size_dividing_the_rows(board):
+    alice, _, _ = board
+    # the last full chunk is followed by one empty read, and no empty chunk
+    chunks = list(export_chunks(TASK_DB, "tasks", EXPORT_FIELDS, "user_id", user_id(alice), chunk=5))
+    assert [len(rows) for rows in chunks] == [5]
+
+
+def test_chunks_of_an_empty_board(login):
+    alice = login("alice")
+    assert list(export_chunks(TASK_DB, "tasks", EXPORT_FIELDS, "user_id", user_id(alice))) == []
+
+
+def test_csv_export(board):
+    alice, _, ids = board
+    response = alice.get("/export/tasks?format=csv")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert response.headers["Content-Disposition"].startswith('attachment; filename="tasks-')
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == list(EXPORT_FIELDS)
+    exported = [dict(zip(rows[0], row)) for row in rows[1:]]
+    assert [int(row["id"]) for row in exported] == ids
+    assert [row["name"] for row in exported] == ["One", "Two", "Three", "Four", "Five"]
+    # empty values are empty cells, not "None"
+    assert exported[0]["date"] == ""
+
+
+def test_ndjson_export(board):
+    alice, bob, ids = board
+    response = alice.get("/export/tasks?format=ndjson")
+    assert response.mimetype == "application/x-ndjson"
+    tasks = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [task["id"] for task in tasks] == ids
+    assert tasks[1]["status"] == "completed" and tasks[1]["date"] is None
+
+    tasks = [json.loads(line) for line in bob.get("/export/tasks?format=ndjson").get_data(as_text=True).splitlines()]
+    assert [(task["name"], task["status"]) for task in tasks] == [("Bob live", "backlog"), ("Bob archived", "completed")]
+
+
+def test_empty_exports(login):
+    alice = login("alice")
+    assert alice.get("/export/tasks?format=csv").get_data(as_text=True).splitlines() == [",".join(EXPORT_FIELDS)]
+    assert alice.get("/export/tasks?format=ndjson").get_data(as_text=True) == ""
+
+
+def test_unknown_format(login):
+    alice = login("alice")
+    assert alice.get("/export/tasks?format=xml").status_code == 400
+
+
+def test_collab_export(collab):
+    alice, bob, carol = collab
+    ids = add_tasks(bob, ["Pack bags", "Book flights", "Rent a car"], "/add_collab_task/1")
+    complete_and_archive(alice, [ids[1]], "/update_collab_task_status/{}")
+
+    response = alice.get("/collaboration/1/export?format=ndjson")
+    tasks = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(task["id"], task["status"], task["created_by"]) for task in tasks] == [
+        (ids[0], "backlog", "bob"), (ids[1], "completed", "bob"), (ids[2], "backlog", "bob")]
+
+    rows = list(csv.reader(io.StringIO(bob.get("/collaboration/1/export").get_data(as_text=True))))
+    assert rows[0][-1] == "created_by" and len(rows) == 4
+    assert carol.get("/collaboration/1/export").status_code == 403
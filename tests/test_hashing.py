@@ -0,0 +1,88 @@
+import os
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+import hashing
+from hashing import HashingBusy
+
+
+class StalledExecutor:
+    # accepts work and never runs it
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(hashing, "HASH_WORKERS", 1)
+    monkeypatch.setattr(hashing, "_slots", threading.BoundedSemaphore(2))
+    yield
+    hashing.shutdown()
+
+
+def free_slots():
+    taken = 0
+    while hashing._slots.acquire(blocking=False):
+        taken += 1
+    for _ in range(taken):
+        hashing._slots.release()
+    return taken
+
+
+def test_inline_without_workers(monkeypatch):
+    monkeypatch.setattr(hashing, "HASH_WORKERS", 0)
+    assert hashing._submit(pow, 2, 3) == 8
+
+
+def test_runs_in_the_pool(pool):
+    assert hashing._submit(pow, 2, 3) == 8
+    assert free_slots() == 2
+
+
+def test_full_queue_is_refused(pool):
+    hashing._slots.acquire()
+    hashing._slots.acquire()
+    with pytest.raises(HashingBusy, match="Too many"):
+        hashing._submit(pow, 2, 3)
+    hashing._slots.release()
+    hashing._slots.release()
+
+
+def test_timeout_cancels_and_frees_the_slot(pool, monkeypatch):
+    executor = StalledExecutor()
+    monkeypatch.setattr(hashing, "_get_executor", lambda: executor)
+    monkeypatch.setattr(hashing, "HASH_TIMEOUT", 0.01)
+
+    with pytest.raises(HashingBusy, match="timed out"):
+        hashing._submit(pow, 2, 3)
+    assert executor.futures[0].cancelled()
+    assert free_slots() == 2
+
+
+def test_broken_pool_is_replaced(pool):
+    # the worker exits in the middle of the job, like a process killed by the OOM killer
+    with pytest.raises(HashingBusy, match="restarted"):
+        hashing._submit(os._exit, 1)
+    assert hashing._executor is None
+    assert free_slots() == 2
+
+    assert hashing._submit(pow, 2, 3) == 8
+
+
+def test_pool_broken_before_submit_is_replaced(pool):
+    broken = hashing._get_executor()
+    with pytest.raises(HashingBusy):
+        hashing._submit(os._exit, 1)
+    # a request holding the old pool gets refused by it on submit
+    hashing._executor = broken
+    with pytest.raises(HashingBusy, match="restarted"):
+        hashing._submit(pow, 2, 3)
+    assert hashing._executor is None
+    assert free_slots() == 2
@@ -0,0 +1,155 @@
+import io
+import json
+
+import pytest
+
+import imports
+from db import get_cursor
+from imports import InvalidImport, clean_row, detect_format, read_rows, run_import
+
+TASK_DB = "todo.db"
+
+
+def rows_of(text, fmt):
+    return list(read_rows(io.BytesIO(text.encode()), fmt))
+
+
+def board(user_id=1):
+    with get_cursor(TASK_DB) as cursor:
+        cursor.execute("SELECT name, priority, date, time, status, position FROM tasks "
+                       "WHERE user_id = ? ORDER BY id", (user_id,))
+        return cursor.fetchall()
+
+
+def upload(client, text, filename="tasks.csv", url="/import/tasks", **args):
+    return client.post(url, query_string=args, content_type="multipart/form-data",
+                       data={"file": (io.BytesIO(text.encode()), filename)})
+
+
+def test_format_from_the_file_name():
+    assert detect_format("tasks.CSV") == "csv"
+    assert detect_format("tasks.jsonl") == "ndjson"
+    assert detect_format("export", "ndjson") == "ndjson"
+    with pytest.raises(InvalidImport):
+        detect_format("tasks.txt")
+
+
+def test_csv_rows():
+    text = "﻿ Name ,PRIORITY,date\nBuy milk,High,2024-05-01\nPay rent,,\n"
+    assert rows_of(text, "csv") == [
+        {"name": "Buy milk", "priority": "High", "date": "2024-05-01"},
+        {"name": "Pay rent", "priority": "", "date": ""},
+    ]
+
+
+def test_csv_without_a_name_column():
+    with pytest.raises(InvalidImport, match="name column"):
+        read_rows(io.BytesIO(b"title,priority\nBuy milk,high\n"), "csv")
+
+
+def test_ndjson_rows():
+    text = '{"name": "Buy milk"}\n\n{not json\n["a list"]\n  {"name": "Pay rent", "priority": "low"}  \n'
+    assert rows_of(text, "ndjson") == [
+        {"name": "Buy milk"},
+        "Invalid JSON",
+        "Each line must be a JSON object",
+        {"name": "Pay rent", "priority": "low"},
+    ]
+
+
+def test_clean_row():
+    assert clean_row({"name": " Buy milk ", "priority": "HIGH", "date": "2024-05-01",
+                      "time": "09:30", "status": "Completed"}) == \
+        ("Buy milk", "high", "2024-05-01", "09:30", "completed")
+    # empty cells are missing values, the status defaults to the backlog
+    assert clean_row({"name": "Pay rent", "priority": "", "date": " "}) == \
+        ("Pay rent", None, None, None, "backlog")
+
+
+@pytest.mark.parametrize("row, error", [
+    ({"priority": "high"}, "Task name required"),
+    ({"name": "  "}, "Task name required"),
+    ({"name": "x", "priority": "urgent"}, "Invalid priority"),
+    ({"name": "x", "date": "2024-02-30"}, "Invalid date, expected YYYY-MM-DD"),
+    ({"name": "x", "date": "01/05/2024"}, "Invalid date, expected YYYY-MM-DD"),
+    ({"name": "x", "time": "9:30"}, "Invalid time, expected HH:MM"),
+    ({"name": "x", "status": "done"}, "Invalid status"),
+    ({"name": 5}, "Invalid name"),
+    ("Invalid JSON", "Invalid JSON"),
+])
+def test_row_errors(row, error):
+    with pytest.raises(InvalidImport) as raised:
+        clean_row(row)
+    assert str(raised.value) == error
+
+
+def test_batches_and_progress(app):
+    rows = [{"name": f"Task {index}"} for index in range(5)]
+    rows[2] = {"name": "Bad", "priority": "urgent"}
+    rows.append({"name": "Done", "status": "completed"})
+    batches = []
+
+    updates = list(run_import(TASK_DB, "tasks", {"user_id": 1}, rows,
+                              lambda: batches.append(len(board())), batch_size=2))
+
+    assert [(update["processed"], update["imported"], update["failed"]) for update in updates] == [
+        (2, 2, 0), (4, 3, 1), (6, 5, 1), (6, 5, 1)]
+    assert updates[-1]["done"] is True and updates[-1]["truncated"] is False
+    assert updates[-1]["errors"] == [{"row": 3, "error": "Invalid priority"}]
+    # every batch was committed before the callback ran
+    assert batches == [2, 3, 5]
+
+    tasks = board()
+    assert [task[0] for task in tasks] == ["Task 0", "Task 1", "Task 3", "Task 4", "Done"]
+    # appended to their column in file order
+    assert [task[5] for task in tasks] == [1.0, 2.0, 3.0, 4.0, 1.0]
+
+
+def test_import_limits(app, monkeypatch):
+    monkeypatch.setattr(imports, "MAX_IMPORT_ROWS", 3)
+    monkeypatch.setattr(imports, "MAX_REPORTED_ERRORS", 1)
+    rows = [{"name": ""}, {"name": ""}, {"name": "Kept"}, {"name": "Dropped"}]
+
+    *_, summary = run_import(TASK_DB, "tasks", {"user_id": 1}, rows)
+    assert (summary["processed"], summary["imported"], summary["failed"]) == (3, 1, 2)
+    assert summary["truncated"] is True
+    assert summary["errors"] == [{"row": 1, "error": "Task name required"}]
+
+
+def test_import_route(login):
+    alice = login("alice")
+    response = upload(alice, "name,priority,status\nBuy milk,high,\nPay rent,,completed\nBad,urgent,\n")
+    summary = response.get_json()
+    assert (summary["imported"], summary["failed"], summary["done"]) == (2, 1, True)
+
+    tasks = {task["name"]: task for task in alice.get("/tasks").get_json()["tasks"]}
+    assert tasks["Buy milk"]["priority"] == "high"
+    # a task without a priority, date or time renders without "None" on the board
+    page = alice.get("/profile").get_data(as_text=True)
+    assert "Pay rent" in page and "None" not in page
+
+
+def test_import_route_streams_progress(login, monkeypatch):
+    monkeypatch.setattr(imports, "IMPORT_BATCH", 2)
+    alice = login("alice")
+    text = "".join(json.dumps({"name": f"Task {index}"}) + "\n" for index in range(3))
+    response = upload(alice, text, "tasks.ndjson", progress="1")
+    assert response.mimetype == "application/x-ndjson"
+    updates = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert updates[-1]["done"] is True and updates[-1]["imported"] == 3
+
+
+def test_import_route_errors(collab):
+    alice, _, carol = collab
+    assert upload(alice, "name\nx\n", "tasks.txt").status_code == 400
+    assert upload(alice, "title\nx\n").status_code == 400
+    assert alice.post("/import/tasks").status_code == 400
+    assert upload(carol, "name\nx\n", url="/collaboration/1/import").status_code == 403
+
+
+def test_collab_import_creates_tasks_as_the_member(collab):
+    alice, bob, _ = collab
+    summary = upload(bob, "name\nPack bags\n", url="/collaboration/1/import").get_json()
+    assert summary["imported"] == 1
+    [task] = alice.get("/collaboration/1/tasks").get_json()["tasks"]
+    assert (task["name"], task["created_by"]) == ("Pack bags", "bob")
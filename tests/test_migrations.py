@@ -0,0 +1,248 @@
+import sqlite3
+
+import pytest
+
+from database import DB_NAME, TASK_DB, COLLAB_DB, MIGRATIONS, migrate, check_query_plans
+
+# the schema the app created before migrations existed (user_version 0)
+V0_SCHEMA = {
+    DB_NAME: [
+        """
+        CREATE TABLE accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            full_name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            security_question TEXT NOT NULL
+        )
+        """,
+    ],
+    TASK_DB: [
+        """
+        CREATE TABLE tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            name TEXT NOT NULL,
+            priority TEXT,
+            date TEXT,
+            time TEXT,
+            status TEXT DEFAULT 'backlog'
+        )
+        """,
+    ],
+    COLLAB_DB: [
+        """
+        CREATE TABLE collab_lists (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            list_name TEXT NOT NULL,
+            description TEXT,
+            owner_username TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE collab_members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            list_id INTEGER NOT NULL,
+            member_username TEXT NOT NULL,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (list_id) REFERENCES collab_lists (id) ON DELETE CASCADE,
+            UNIQUE(list_id, member_username)
+        )
+        """,
+        """
+        CREATE TABLE collab_tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            list_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            priority TEXT,
+            date TEXT,
+            time TEXT,
+            status TEXT DEFAULT 'backlog',
+            created_by TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (list_id) REFERENCES collab_lists (id) ON DELETE CASCADE
+        )
+        """,
+    ],
+}
+
+V0_ROWS = {
+    DB_NAME: [
+        ("INSERT INTO accounts (id, full_name, email, username, password, security_question) "
+         "VALUES (?, ?, ?, ?, 'x', 'x')",
+         [(1, "Alice", "alice@example.com", "alice"), (2, "Bob", "bob@example.com", "bob")]),
+    ],
+    TASK_DB: [
+        # "ghost" was renamed away before ownership moved to ids, their task has no account
+        ("INSERT INTO tasks (id, username, name, priority, date, time, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+         [(1, "alice", "Buy milk", "low", None, None, "backlog"),
+          (2, "alice", "Pay rent", "high", "2024-05-01", None, "backlog"),
+          (3, "alice", "Call mom", "high", "2024-04-01", "09:00", "backlog"),
+          (4, "bob", "Fix bike", None, None, None, "backlog"),
+          (5, "alice", "File taxes", "mid", None, None, "completed"),
+          (6, "ghost", "Old chore", None, None, None, "backlog")]),
+    ],
+    COLLAB_DB: [
+        ("INSERT INTO collab_lists (id, list_name, description, owner_username) VALUES (?, ?, ?, ?)",
+         [(1, "Trip", "Summer trip", "alice")]),
+        ("INSERT INTO collab_members (id, list_id, member_username) VALUES (?, ?, ?)",
+         [(1, 1, "alice"), (2, 1, "bob"), (3, 1, "ghost")]),
+        ("INSERT INTO collab_tasks (id, list_id, name, priority, status, created_by) VALUES (?, ?, ?, ?, ?, ?)",
+         [(1, 1, "Book flights", "mid", "backlog", "bob"),
+          (2, 1, "Pack bags", "high", "backlog", "alice"),
+          (3, 1, "Rent a car", None, "in-progress", "ghost")]),
+    ],
+}
+
+
+def make_v0(db_file):
+    conn = sqlite3.connect(db_file)
+    with conn:
+        for sql in V0_SCHEMA[db_file]:
+            conn.execute(sql)
+        for sql, rows in V0_ROWS[db_file]:
+            conn.executemany(sql, rows)
+    conn.close()
+
+
+def upgrade_all():
+    # accounts first, migration 7 of the other files reads usernames from it
+    return [migrate(db_file, MIGRATIONS[db_file]) for db_file in (DB_NAME, TASK_DB, COLLAB_DB)]
+
+
+def open_db(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+@pytest.fixture
+def upgraded(workdir):
+    for db_file in (DB_NAME, TASK_DB, COLLAB_DB):
+        make_v0(db_file)
+    assert upgrade_all() == [(0, len(MIGRATIONS[db_file])) for db_file in (DB_NAME, TASK_DB, COLLAB_DB)]
+    return workdir
+
+
+def columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")]
+
+
+def test_fresh_files_reach_latest_version(workdir):
+    upgrade_all()
+    for db_file, migrations in MIGRATIONS.items():
+        conn = sqlite3.connect(db_file)
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(migrations)
+        conn.close()
+    # nothing left to apply the second time
+    assert upgrade_all() == [(len(MIGRATIONS[f]), len(MIGRATIONS[f])) for f in (DB_NAME, TASK_DB, COLLAB_DB)]
+
+
+def test_tasks_owned_by_account_id(upgraded):
+    conn = open_db(TASK_DB)
+    assert "username" not in columns(conn, "tasks")
+    owners = dict(conn.execute("SELECT id, user_id FROM tasks").fetchall())
+    assert owners == {1: 1, 2: 1, 3: 1, 4: 2, 5: 1, 6: 0}
+    conn.close()
+
+
+def test_collab_owners_members_and_creators(upgraded):
+    conn = open_db(COLLAB_DB)
+    assert "owner_username" not in columns(conn, "collab_lists")
+    assert "created_by" not in columns(conn, "collab_tasks")
+    assert conn.execute("SELECT owner_id FROM collab_lists WHERE id = 1").fetchone()[0] == 1
+    # the membership of a name without an account is dropped
+    members = conn.execute("SELECT user_id FROM collab_members WHERE list_id = 1 ORDER BY user_id").fetchall()
+    assert [row[0] for row in members] == [1, 2]
+    creators = dict(conn.execute("SELECT id, creator_id FROM collab_tasks").fetchall())
+    assert creators == {1: 2, 2: 1, 3: 0}
+    # the rebuilt table keeps its constraints
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO collab_members (list_id, user_id) VALUES (1, 2)")
+    conn.close()
+
+
+def test_positions_follow_the_old_board_order(upgraded):
+    conn = open_db(TASK_DB)
+    # priority, then date, then time, numbered per (owner, status) column
+    rows = conn.execute("SELECT id, position FROM tasks WHERE user_id = 1 AND status = 'backlog' "
+                        "ORDER BY position").fetchall()
+    assert [tuple(row) for row in rows] == [(3, 1.0), (2, 2.0), (1, 3.0)]
+    assert conn.execute("SELECT position FROM tasks WHERE id = 5").fetchone()[0] == 1.0
+    assert conn.execute("SELECT position FROM tasks WHERE id = 4").fetchone()[0] == 1.0
+    conn.close()
+
+    conn = open_db(COLLAB_DB)
+    rows = conn.execute("SELECT id FROM collab_tasks WHERE list_id = 1 AND status = 'backlog' "
+                        "ORDER BY position").fetchall()
+    assert [row[0] for row in rows] == [2, 1]
+    conn.close()
+
+
+def test_revisions_and_tombstones(upgraded):
+    conn = open_db(TASK_DB)
+    # later migrations rewrite every row (positions), which counts as a change:
+    # revs stay unique and the counter is at the newest one
+    revs = [row[0] for row in conn.execute("SELECT rev FROM tasks")]
+    counter = conn.execute("SELECT rev FROM change_counter").fetchone()[0]
+    assert len(set(revs)) == len(revs)
+    assert min(revs) > 6 and max(revs) == counter
+
+    with conn:
+        conn.execute("UPDATE tasks SET name = 'Buy oat milk' WHERE id = 1")
+        conn.execute("DELETE FROM tasks WHERE id = 4")
+    assert conn.execute("SELECT rev FROM tasks WHERE id = 1").fetchone()[0] == counter + 1
+    # the tombstone carries the owner's id, so the deleting user's sync sees it
+    tombstone = conn.execute("SELECT task_id, user_id, rev FROM tasks_deleted").fetchone()
+    assert tuple(tombstone) == (4, 2, counter + 2)
+    conn.close()
+
+    conn = open_db(COLLAB_DB)
+    revs = [row[0] for row in conn.execute("SELECT rev FROM collab_tasks")]
+    assert len(set(revs)) == len(revs)
+    assert max(revs) == conn.execute("SELECT rev FROM change_counter").fetchone()[0]
+    conn.close()
+
+
+def test_search_index_rebuilt_on_ids(upgraded):
+    conn = open_db(TASK_DB)
+
+    def search(terms, user_id):
+        return [row[0] for row in conn.execute(
+            "SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ? ORDER BY rowid",
+            (f'name : ({terms}) AND user_id : "{user_id}"',))]
+
+    assert search('"milk"*', 1) == [1]
+    assert search('"fix"*', 2) == [4]
+    assert search('"fix"*', 1) == []
+
+    # the triggers keep the index in step with renames
+    with conn:
+        conn.execute("UPDATE tasks SET name = 'Buy bread' WHERE id = 1")
+    assert search('"milk"*', 1) == []
+    assert search('"bread"*', 1) == [1]
+    conn.close()
+
+    conn = open_db(COLLAB_DB)
+    rows = conn.execute("SELECT rowid FROM collab_tasks_fts WHERE collab_tasks_fts MATCH ?",
+                        ('name : "flight"* AND list_id : "1"',)).fetchall()
+    assert [row[0] for row in rows] == [1]
+    conn.close()
+
+
+def test_completed_tasks_get_a_completion_time(upgraded):
+    conn = open_db(TASK_DB)
+    assert conn.execute("SELECT completed_at IS NOT NULL FROM tasks WHERE id = 5").fetchone()[0]
+    assert conn.execute("SELECT COUNT(*) FROM tasks WHERE completed_at IS NOT NULL").fetchone()[0] == 1
+    with conn:
+        conn.execute("UPDATE tasks SET status = 'completed' WHERE id = 1")
+        conn.execute("UPDATE tasks SET status = 'backlog' WHERE id = 5")
+    completed = dict(conn.execute("SELECT id, completed_at IS NOT NULL FROM tasks WHERE id IN (1, 5)").fetchall())
+    assert completed == {1: 1, 5: 0}
+    conn.close()
+
+
+def test_hot_queries_use_indexes(upgraded):
+    assert check_query_plans() == []
@@ -0,0 +1,107 @@
+import base64
+import json
+
+import pytest
+
+from boards import MAX_PAGE_SIZE, PAGE_SIZE, decode_cursor, encode_cursor, page_limit
+
+
+def token(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def add_tasks(client, count, url="/add_task"):
+    for index in range(count):
+        client.post(url, json={"name": f"Task {index}", "priority": "low"})
+
+
+def read_all(client, url, limit):
+    # follows next_cursor to the end, returns the names and the number of pages
+    names, pages, cursor = [], 0, None
+    while True:
+        query = f"{url}?limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+        body = client.get(query).get_json()
+        names.extend(task["name"] for task in body["tasks"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return names, pages
+
+
+def test_cursor_round_trip():
+    row = {"position": 2.5, "id": 7}
+    assert decode_cursor(encode_cursor(row)) == [2.5, 7]
+    assert decode_cursor(token([None, 3])) == [None, 3]
+
+
+@pytest.mark.parametrize("bad", [
+    "!!!",
+    token({"position": 1, "id": 2}),
+    token([1]),
+    token([1, 2, 3]),
+    token(["1", 2]),
+    token([True, 2]),
+    token([[1], 2]),
+    token([1, {"id": 2}]),
+])
+def test_bad_cursors_are_rejected(bad):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(bad)
+
+
+def test_page_limit_is_clamped():
+    assert page_limit(None) == PAGE_SIZE
+    assert page_limit("0") == 1
+    assert page_limit("-5") == 1
+    assert page_limit("10") == 10
+    assert page_limit(str(MAX_PAGE_SIZE + 1)) == MAX_PAGE_SIZE
+    with pytest.raises(ValueError):
+        page_limit("ten")
+
+
+def test_personal_pages_follow_the_cursor(login):
+    alice = login("alice")
+    add_tasks(alice, 5)
+
+    names, pages = read_all(alice, "/tasks", 2)
+    assert names == [f"Task {index}" for index in range(5)]
+    assert pages == 3
+
+    # a full last page has no cursor to an empty one
+    names, pages = read_all(alice, "/tasks", 5)
+    assert len(names) == 5 and pages == 1
+
+
+def test_personal_pages_only_hold_the_users_tasks(login):
+    alice, bob = login("alice"), login("bob")
+    add_tasks(alice, 3)
+    add_tasks(bob, 2)
+    assert read_all(bob, "/tasks", 1) == (["Task 0", "Task 1"], 2)
+
+
+@pytest.mark.parametrize("query", [
+    "cursor=!!!",
+    f"cursor={token(['x', 1])}",
+    f"cursor={token([1])}",
+    "limit=ten",
+    "status=done",
+])
+def test_bad_page_requests_are_400(login, query):
+    alice = login("alice")
+    add_tasks(alice, 1)
+    response = alice.get(f"/tasks?{query}")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_collab_pages_follow_the_cursor(collab):
+    alice, bob, _ = collab
+    add_tasks(bob, 3, "/add_collab_task/1")
+
+    assert read_all(alice, "/collaboration/1/tasks", 2) == (["Task 0", "Task 1", "Task 2"], 2)
+    assert alice.get(f"/collaboration/1/tasks?cursor={token([1, 'x'])}").status_code == 400
+
+
+def test_collab_pages_need_membership(collab):
+    _, _, carol = collab
+    assert carol.get("/collaboration/1/tasks").status_code == 403
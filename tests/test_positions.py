@@ -0,0 +1,151 @@
+import pytest
+
+from boards import POSITION_STEP
+from database import DB_NAME, TASK_DB, MIGRATIONS, migrate
+from db import get_cursor
+from positions import REBALANCE_WINDOW, SPREAD_STEP, InvalidMove, move, spread
+
+USER = 1
+
+
+@pytest.fixture
+def cursor(workdir):
+    for db_file in (DB_NAME, TASK_DB):
+        migrate(db_file, MIGRATIONS[db_file])
+    with get_cursor(TASK_DB) as cursor:
+        yield cursor
+
+
+def add_cards(cursor, positions, status="backlog", user_id=USER):
+    ids = []
+    for position in positions:
+        cursor.execute("INSERT INTO tasks (user_id, name, status, position) VALUES (?, 'card', ?, ?)",
+                       (user_id, status, position))
+        ids.append(cursor.lastrowid)
+    return ids
+
+
+def column(cursor, status="backlog"):
+    cursor.execute("SELECT id FROM tasks WHERE user_id = ? AND status = ? ORDER BY position, id", (USER, status))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def position(cursor, task_id):
+    cursor.execute("SELECT position FROM tasks WHERE id = ?", (task_id,))
+    return cursor.fetchone()[0]
+
+
+def test_move_between_two_cards(cursor):
+    a, b, c = add_cards(cursor, [1.0, 2.0, 3.0])
+    moved = move(cursor, "tasks", c, USER, "backlog", before=b, after=a)
+    assert moved == (1.5, False, False)
+    assert column(cursor) == [a, c, b]
+
+
+def test_move_to_either_end(cursor):
+    a, b, c = add_cards(cursor, [1.0, 2.0, 3.0])
+    assert move(cursor, "tasks", c, USER, "backlog", before=a).position == 1.0 - POSITION_STEP
+    assert move(cursor, "tasks", c, USER, "backlog", after=b).position == 2.0 + POSITION_STEP
+    # only one neighbour given: the card on the other side is looked up
+    assert move(cursor, "tasks", a, USER, "backlog", before=c).position == 2.5
+    assert column(cursor) == [b, a, c]
+
+
+def test_move_to_another_column(cursor):
+    a, b = add_cards(cursor, [1.0, 2.0])
+    assert move(cursor, "tasks", a, USER, "completed").position == POSITION_STEP
+    (done,) = add_cards(cursor, [5.0], "completed")
+    assert move(cursor, "tasks", b, USER, "completed", after=done).position == 5.0 + POSITION_STEP
+    assert column(cursor, "completed") == [a, done, b]
+    assert column(cursor) == []
+
+
+def test_repeated_bisection_spreads_the_column(cursor):
+    first, *cards = add_cards(cursor, [float(n) for n in range(1, 80)])
+    moves = [move(cursor, "tasks", card, USER, "backlog", after=first) for card in cards]
+
+    # every card went right after the first one, pushing the previous ones down
+    assert column(cursor) == [first, *reversed(cards)]
+    assert any(moved.crowded for moved in moves)
+    # the gap ran out of float precision at some point and was spread before the move
+    assert any(moved.spread for moved in moves)
+    positions = [position(cursor, card) for card in column(cursor)]
+    assert all(low < high for low, high in zip(positions, positions[1:]))
+
+
+@pytest.mark.parametrize("neighbours", [{"before": 2, "after": 2}, {"after": 3}, {"before": 3}])
+def test_bad_neighbours(cursor, neighbours):
+    add_cards(cursor, [1.0, 2.0, 3.0])
+    with pytest.raises(InvalidMove):
+        move(cursor, "tasks", 3, USER, "backlog", **neighbours)
+
+
+def test_neighbours_in_the_wrong_order(cursor):
+    a, b, c = add_cards(cursor, [1.0, 2.0, 3.0])
+    with pytest.raises(InvalidMove, match="must come before"):
+        move(cursor, "tasks", c, USER, "backlog", before=a, after=b)
+    assert position(cursor, c) == 3.0
+
+
+def test_tied_neighbours(cursor):
+    # same position, ordered by id on the board: there is no midpoint until they are spread
+    a, b, c = add_cards(cursor, [1.0, 1.0, 2.0])
+    moved = move(cursor, "tasks", c, USER, "backlog", before=b, after=a)
+    assert moved.spread
+    assert column(cursor) == [a, c, b]
+
+
+def test_tied_neighbours_in_the_wrong_order(cursor):
+    a, b, c = add_cards(cursor, [1.0, 1.0, 2.0])
+    with pytest.raises(InvalidMove, match="must come before"):
+        move(cursor, "tasks", c, USER, "backlog", before=a, after=b)
+    # the spread it tried kept the order (the routes roll it back with the failed write)
+    assert column(cursor) == [a, b, c]
+
+
+def test_neighbour_from_another_column(cursor):
+    a, b = add_cards(cursor, [1.0, 2.0])
+    (done,) = add_cards(cursor, [1.0], "completed")
+    with pytest.raises(InvalidMove, match="not in that column"):
+        move(cursor, "tasks", b, USER, "backlog", after=done)
+
+
+def test_task_of_another_board(cursor):
+    (theirs,) = add_cards(cursor, [1.0], user_id=2)
+    assert move(cursor, "tasks", theirs, USER, "backlog") is None
+    assert move(cursor, "tasks", 999, USER, "backlog") is None
+
+
+def test_spread_keeps_the_order(cursor):
+    # a crowded run in the middle of the column
+    crowded = [5.0 + n * 1e-9 for n in range(10)]
+    cards = add_cards(cursor, [1.0, 2.0, *crowded, 8.0, 9.0])
+    order = column(cursor)
+
+    # 3 cards on each side have no room between 5.0 and 5.0 + 1e-8, doubled to 6 they
+    # reach 1.0 and 9.0, the rest of the column
+    assert spread(cursor, "tasks", USER, "backlog", crowded[4], window=3) == 12
+    assert column(cursor) == order
+    positions = [position(cursor, card) for card in order]
+    gaps = [high - low for low, high in zip(positions, positions[1:])]
+    assert min(gaps) >= SPREAD_STEP
+    # the cards outside the window did not move
+    assert position(cursor, cards[0]) == 1.0 and position(cursor, cards[-1]) == 9.0
+
+
+def test_spread_at_the_start_of_a_column(cursor):
+    cards = add_cards(cursor, [1.0 + n * 1e-12 for n in range(5)])
+    assert spread(cursor, "tasks", USER, "backlog", 1.0) == 5
+    assert column(cursor) == cards
+    positions = [position(cursor, card) for card in cards]
+    assert positions == [POSITION_STEP * (n + 1) for n in range(5)]
+
+
+def test_spread_window_grows_until_there_is_room(cursor):
+    count = REBALANCE_WINDOW * 3
+    add_cards(cursor, [0.0, *(1.0 + n * 1e-12 for n in range(count)), 1.01])
+    order = column(cursor)
+    spread(cursor, "tasks", USER, "backlog", 1.0 + 1e-12 * (count // 2))
+    assert column(cursor) == order
+    positions = [position(cursor, card) for card in order]
+    assert min(high - low for low, high in zip(positions, positions[1:])) >= SPREAD_STEP
@@ -0,0 +1,119 @@
+import pytest
+
+from search import MAX_SEARCH_OFFSET, MAX_TERMS, _phrase, fts_query
+
+
+def search(client, q, **args):
+    return client.get("/search", query_string={"q": q, **args})
+
+
+def found(client, q, **args):
+    return [(result["board"], result["name"]) for result in search(client, q, **args).get_json()["results"]]
+
+
+def add_task(client, name):
+    client.post("/add_task", json={"name": name, "priority": "low"})
+
+
+def add_collab_task(client, list_id, name):
+    client.post(f"/add_collab_task/{list_id}", json={"name": name, "priority": "low"})
+
+
+def test_terms_are_quoted_prefixes():
+    assert fts_query("gro caf") == '"gro"* "caf"*'
+    assert fts_query('milk" OR name:* NEAR(') == '"milk"* "OR"* "name"* "NEAR"*'
+    assert fts_query("  -*()  ") == ""
+    assert fts_query(" ".join(f"w{index}" for index in range(20))).count("*") == MAX_TERMS
+
+
+def test_scope_values_are_quoted():
+    assert _phrase(7) == '"7"'
+    assert _phrase('a"b') == '"a""b"'
+
+
+def test_prefix_matches(login):
+    alice = login("alice")
+    add_task(alice, "Buy groceries at the café")
+    add_task(alice, "Call the garage")
+
+    assert found(alice, "gro caf") == [("personal", "Buy groceries at the café")]
+    assert found(alice, "ga") == [("personal", "Call the garage")]
+    assert found(alice, "grocery") == []
+
+
+@pytest.mark.parametrize("q, names", [
+    ('"milk', ["Buy milk"]),
+    ("milk)", ["Buy milk"]),
+    ("milk*", ["Buy milk"]),
+    ("^milk", ["Buy milk"]),
+    # operators and column filters are plain words that have to match too
+    ("buy OR milk", []),
+    ("NOT milk", []),
+    ("name:milk", []),
+])
+def test_fts_syntax_is_searched_as_words(login, q, names):
+    alice = login("alice")
+    add_task(alice, "Buy milk")
+    response = search(alice, q)
+    assert response.status_code == 200
+    assert [result["name"] for result in response.get_json()["results"]] == names
+
+
+def test_empty_query(login):
+    alice = login("alice")
+    add_task(alice, "Buy milk")
+    assert search(alice, "").get_json() == {"results": [], "next_offset": None}
+    assert search(alice, "()*").get_json()["results"] == []
+
+
+def test_highlight_is_escaped(login):
+    alice = login("alice")
+    add_task(alice, "<b>milk</b> & bread")
+    [result] = search(alice, "milk").get_json()["results"]
+    assert result["highlight"] == "&lt;b&gt;<mark>milk</mark>&lt;/b&gt; &amp; bread"
+
+
+def test_only_the_users_tasks_and_lists(collab):
+    alice, bob, carol = collab
+    add_task(alice, "Pack alice's bag")
+    add_task(bob, "Pack bob's bag")
+    add_collab_task(alice, 1, "Pack the tent")
+    carol.post("/create_collaboration", data={"collab_name": "Other", "collab_description": "",
+                                              "collab_members": ""})
+    add_collab_task(carol, 2, "Pack the car")
+
+    assert sorted(found(alice, "pack")) == [("collaboration", "Pack the tent"), ("personal", "Pack alice's bag")]
+    assert sorted(found(bob, "pack")) == [("collaboration", "Pack the tent"), ("personal", "Pack bob's bag")]
+    assert found(carol, "pack") == [("collaboration", "Pack the car")]
+
+    [result] = search(bob, "tent").get_json()["results"]
+    assert (result["list_id"], result["list_name"], result["created_by"]) == (1, "Trip", "alice")
+
+
+def test_offset_pages(login):
+    alice = login("alice")
+    for index in range(5):
+        add_task(alice, f"Milk run {index}")
+
+    names, offset = [], 0
+    while offset is not None:
+        body = search(alice, "milk", offset=offset, limit=2).get_json()
+        assert len(body["results"]) <= 2
+        names += [result["name"] for result in body["results"]]
+        offset = body["next_offset"]
+    assert sorted(names) == [f"Milk run {index}" for index in range(5)]
+
+
+@pytest.mark.parametrize("args", [{"offset": -1}, {"offset": MAX_SEARCH_OFFSET + 1}, {"offset": "x"},
+                                  {"limit": "x"}])
+def test_bad_paging_is_400(login, args):
+    alice = login("alice")
+    assert search(alice, "milk", **args).status_code == 400
+
+
+def test_offset_limits_are_inclusive(login):
+    alice = login("alice")
+    add_task(alice, "Buy milk")
+    body = search(alice, "milk", offset=MAX_SEARCH_OFFSET, limit=500).get_json()
+    assert body == {"results": [], "next_offset": None}
+    assert len(search(alice, "milk", limit=0).get_json()["results"]) == 1
@@ -0,0 +1,149 @@
+import time
+
+import pytest
+
+from archive import archive_all
+
+
+def sync(client, since=0, **args):
+    query = "&".join(f"{key}={value}" for key, value in {"since": since, **args}.items())
+    return client.get(f"/sync?{query}")
+
+
+def add_task(client, name):
+    return client.post("/add_task", json={"name": name, "priority": "low"}).get_json()["id"]
+
+
+def archive_completed():
+    # everything completed so far, as if the archive window had passed
+    return archive_all(days=0, now=time.time() + 60)
+
+
+def test_first_sync_returns_the_board(login):
+    alice = login("alice")
+    ids = [add_task(alice, name) for name in ("Buy milk", "Pay rent")]
+
+    body = sync(alice).get_json()
+    assert sorted(task["id"] for task in body["tasks"]) == ids
+    assert body["deleted"] == [] and body["more"] is False
+    assert body["rev"] > 0
+
+    # nothing new since then
+    again = sync(alice, body["rev"]).get_json()
+    assert again == {"rev": body["rev"], "tasks": [], "deleted": [], "more": False}
+
+
+def test_changes_and_deletes_after_a_revision(login):
+    alice = login("alice")
+    milk, rent, mom = (add_task(alice, name) for name in ("Buy milk", "Pay rent", "Call mom"))
+    rev = sync(alice).get_json()["rev"]
+
+    alice.put(f"/edit_task/{milk}", json={"name": "Buy oat milk", "priority": "low"})
+    alice.put(f"/update_task_status/{rent}", json={"status": "completed"})
+    alice.delete(f"/delete_task/{mom}")
+
+    body = sync(alice, rev).get_json()
+    changed = {task["id"]: task for task in body["tasks"]}
+    assert set(changed) == {milk, rent}
+    assert changed[milk]["name"] == "Buy oat milk"
+    assert changed[rent]["status"] == "completed"
+    assert body["deleted"] == [mom]
+    assert body["rev"] > rev
+
+
+def test_only_the_users_own_changes(login):
+    alice, bob = login("alice"), login("bob")
+    add_task(alice, "Buy milk")
+    theirs = add_task(bob, "Fix bike")
+    bob.delete(f"/delete_task/{theirs}")
+
+    body = sync(alice).get_json()
+    assert [task["name"] for task in body["tasks"]] == ["Buy milk"]
+    assert body["deleted"] == []
+
+
+def test_more_pages_through_every_change(login):
+    alice = login("alice")
+    ids = [add_task(alice, f"Task {index}") for index in range(5)]
+    alice.delete(f"/delete_task/{ids[0]}")
+
+    seen, deleted, since, pages = [], [], 0, 0
+    while True:
+        body = sync(alice, since, limit=2).get_json()
+        assert body["rev"] > since
+        seen += [task["id"] for task in body["tasks"]]
+        deleted += body["deleted"]
+        since = body["rev"]
+        pages += 1
+        if not body["more"]:
+            break
+
+    # the deleted task's last change is its tombstone, nothing before it is sent again
+    assert sorted(seen) == ids[1:]
+    assert deleted == [ids[0]]
+    assert pages == 3
+    assert sync(alice, since).get_json()["tasks"] == []
+
+
+def test_revision_ahead_of_the_server_asks_for_a_reset(login):
+    alice = login("alice")
+    add_task(alice, "Buy milk")
+    rev = sync(alice).get_json()["rev"]
+
+    response = sync(alice, rev + 100)
+    assert response.status_code == 409
+    assert response.get_json()["reset"] is True
+
+
+@pytest.mark.parametrize("args", [{"since": "-1"}, {"since": "abc"}, {"limit": "x"}, {"list_id": "abc"}])
+def test_bad_parameters(login, args):
+    alice = login("alice")
+    assert sync(alice, **args).status_code == 400
+
+
+def test_archived_tasks_sync_as_deletes_until_restored(login):
+    alice = login("alice")
+    milk, rent = add_task(alice, "Buy milk"), add_task(alice, "Pay rent")
+    alice.put(f"/update_task_status/{milk}", json={"status": "completed"})
+    before = sync(alice).get_json()["rev"]
+
+    assert archive_completed()["tasks"] == 1
+    body = sync(alice, before).get_json()
+    assert body["tasks"] == [] and body["deleted"] == [milk]
+    archived = body["rev"]
+
+    assert alice.post(f"/archive/tasks/{milk}/restore").status_code == 200
+    body = sync(alice, archived).get_json()
+    assert [(task["id"], task["status"]) for task in body["tasks"]] == [(milk, "completed")]
+    assert body["deleted"] == []
+    # a client that never saw the archiving gets the task back as a plain change
+    body = sync(alice, before).get_json()
+    assert [task["id"] for task in body["tasks"]] == [milk] and body["deleted"] == []
+    assert rent not in [task["id"] for task in body["tasks"]]
+
+
+def test_collab_sync(collab):
+    alice, bob, carol = collab
+    task_id = bob.post("/add_collab_task/1", json={"name": "Pack bags", "priority": "low"}).get_json()["id"]
+
+    body = sync(alice, list_id=1).get_json()
+    assert [(task["id"], task["created_by"]) for task in body["tasks"]] == [(task_id, "bob")]
+
+    bob.delete(f"/delete_collab_task/{task_id}")
+    assert sync(alice, body["rev"], list_id=1).get_json()["deleted"] == [task_id]
+    assert sync(carol, list_id=1).status_code == 403
+
+
+def test_collab_archive_tombstones(collab):
+    alice, bob, _ = collab
+    task_id = bob.post("/add_collab_task/1", json={"name": "Pack bags", "priority": "low"}).get_json()["id"]
+    bob.put(f"/update_collab_task_status/{task_id}", json={"status": "completed"})
+    rev = sync(alice, list_id=1).get_json()["rev"]
+
+    assert archive_completed()["collab_tasks"] == 1
+    body = sync(alice, rev, list_id=1).get_json()
+    assert body["deleted"] == [task_id]
+
+    assert alice.post(f"/collaboration/1/archive/{task_id}/restore").status_code == 200
+    body = sync(bob, body["rev"], list_id=1).get_json()
+    assert [task["id"] for task in body["tasks"]] == [task_id] and body["deleted"] == []
@@ -0,0 +1,71 @@
+import pytest
+
+from boards import field_error
+
+BAD_FIELDS = [
+    ({"priority": "<b>high</b>"}, "Invalid priority"),
+    ({"date": "<img src=x onerror=alert(1)>"}, "Invalid date, expected YYYY-MM-DD"),
+    ({"date": "2024-13-01"}, "Invalid date, expected YYYY-MM-DD"),
+    ({"date": "1/5/2024"}, "Invalid date, expected YYYY-MM-DD"),
+    ({"time": "24:00"}, "Invalid time, expected HH:MM"),
+    ({"time": "09:00<script>"}, "Invalid time, expected HH:MM"),
+    ({"time": ["09:00"]}, "Invalid time, expected HH:MM"),
+]
+
+
+@pytest.mark.parametrize("data", [
+    {},
+    {"priority": None, "date": None, "time": None},
+    # what the board sends when the inputs are left empty
+    {"priority": "low", "date": "", "time": ""},
+    {"priority": "high", "date": "2024-02-29", "time": "23:59"},
+])
+def test_valid_fields(data):
+    assert field_error(data) is None
+
+
+@pytest.mark.parametrize("data, error", BAD_FIELDS)
+def test_invalid_fields(data, error):
+    assert field_error(data) == error
+
+
+def personal_names(client):
+    return [task["name"] for task in client.get("/tasks").get_json()["tasks"]]
+
+
+@pytest.mark.parametrize("fields, error", BAD_FIELDS)
+def test_personal_writes_refuse_bad_fields(login, fields, error):
+    alice = login("alice")
+    response = alice.post("/add_task", json={"name": "Buy milk", **fields})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == error
+    assert personal_names(alice) == []
+
+    task_id = alice.post("/add_task", json={"name": "Buy milk", "priority": "low"}).get_json()["id"]
+    response = alice.put(f"/edit_task/{task_id}", json={"name": "Buy oat milk", "priority": "low", **fields})
+    assert response.status_code == 400
+    assert personal_names(alice) == ["Buy milk"]
+
+
+@pytest.mark.parametrize("fields, error", BAD_FIELDS)
+def test_collab_writes_refuse_bad_fields(collab, fields, error):
+    alice, bob, _ = collab
+    response = bob.post("/add_collab_task/1", json={"name": "Pack bags", **fields})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == error
+
+    task_id = bob.post("/add_collab_task/1", json={"name": "Pack bags", "priority": "low"}).get_json()["id"]
+    response = bob.put(f"/edit_collab_task/{task_id}", json={"name": "Pack", "priority": "low", **fields})
+    assert response.status_code == 400
+    tasks = alice.get("/collaboration/1/tasks").get_json()["tasks"]
+    assert [(task["name"], task["date"], task["time"]) for task in tasks] == [("Pack bags", None, None)]
+
+
+def test_writes_store_valid_fields(collab):
+    alice, bob, _ = collab
+    task_id = alice.post("/add_task", json={"name": "Buy milk", "priority": "mid",
+                                            "date": "2024-05-01", "time": "09:30"}).get_json()["id"]
+    assert alice.put(f"/edit_task/{task_id}", json={"name": "Buy milk", "priority": "mid",
+                                                    "date": "", "time": ""}).status_code == 200
+    assert bob.post("/add_collab_task/1", json={"name": "Pack bags", "priority": "high",
+                                                "date": "2024-05-01", "time": "09:30"}).status_code == 200
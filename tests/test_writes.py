@@ -0,0 +1,112 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from db import get_cursor
+from writes import GroupWriter, write
+
+DB_FILE = "writes.db"
+
+
+@pytest.fixture
+def db(workdir):
+    with get_cursor(DB_FILE) as cursor:
+        cursor.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    return DB_FILE
+
+
+def names(db_file):
+    with get_cursor(db_file) as cursor:
+        cursor.execute("SELECT name FROM items ORDER BY name")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def insert(*values):
+    def fn(cursor):
+        for value in values:
+            cursor.execute("INSERT INTO items (name) VALUES (?)", (value,))
+        return cursor.lastrowid
+    return fn
+
+
+def run_grouped(writer, jobs):
+    # holds the writer until every job is queued, so they are committed as one group
+    results = [None] * len(jobs)
+
+    def run(index, fn):
+        try:
+            results[index] = ("ok", writer.run(fn))
+        except Exception as e:
+            results[index] = ("error", e)
+
+    threads = [threading.Thread(target=run, args=(index, fn)) for index, fn in enumerate(jobs)]
+    with writer._writer:
+        # one at a time, so the queue holds the jobs in the order given
+        for queued, thread in enumerate(threads, 1):
+            thread.start()
+            deadline = time.monotonic() + 5
+            while writer.depth() < queued and time.monotonic() < deadline:
+                time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_write_returns_the_result(db):
+    assert write(db, lambda cursor: cursor.execute("INSERT INTO items (name) VALUES ('a') RETURNING id").fetchone()[0]) == 1
+    assert names(db) == ["a"]
+
+
+def test_failing_lone_write_is_rolled_back(db):
+    with pytest.raises(sqlite3.IntegrityError):
+        write(db, insert("a", "a"))
+    assert names(db) == []
+
+
+def test_failing_job_rolls_back_only_its_savepoint(db):
+    writer = GroupWriter(db)
+    results = run_grouped(writer, [insert("a"), insert("b", "a"), insert("c")])
+
+    assert [kind for kind, _ in results] == ["ok", "error", "ok"]
+    assert isinstance(results[1][1], sqlite3.IntegrityError)
+    # the failed job's first insert ("b") went with its savepoint
+    assert names(db) == ["a", "c"]
+    assert writer.batches == 1 and writer.jobs == 3
+
+
+def test_exception_from_job_code_reaches_its_caller(db):
+    class Refused(Exception):
+        pass
+
+    def refuse(cursor):
+        insert("x")(cursor)
+        raise Refused()
+
+    results = run_grouped(GroupWriter(db), [refuse, insert("y")])
+    assert isinstance(results[0][1], Refused)
+    assert names(db) == ["y"]
+
+
+def test_concurrent_writes_all_commit(db):
+    writer = GroupWriter(db)
+    errors = []
+
+    def work(thread):
+        for index in range(50):
+            try:
+                writer.run(insert(f"{thread}-{index}"))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(names(db)) == 400
+    assert writer.jobs == 400 and writer.batches <= 400
+    assert writer.depth() == 0
@@ -0,0 +1,183 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:  # windows: processes fall back to sqlite's busy_timeout alone
+    fcntl = None
+
+from db import connect, get_cursor
+from metrics import record_query
+
+# mutations are queued per database file in each process and committed in groups: one
+# waiting request at a time holds the writer (lock + connection) and commits everything
+# queued so far as one transaction, the others just collect their result. so the workers
+# take sqlite's write lock once per group instead of once per request, and a lone write
+# runs straight away in its own thread. WRITE_QUEUE=0 gives every write its own transaction
+WRITE_QUEUE = os.environ.get("WRITE_QUEUE", "1") != "0"
+WRITE_BATCH_SIZE = max(1, int(os.environ.get("WRITE_BATCH_SIZE", "64")))
+# seconds the writer waits for more jobs before committing. 0 groups whatever queued up
+# while the previous group was committing, which costs a lone writer nothing
+WRITE_BATCH_DELAY = float(os.environ.get("WRITE_BATCH_DELAY", "0"))
+# seconds a request waits for the writer before giving up (if its write has not started)
+WRITE_TIMEOUT = float(os.environ.get("WRITE_TIMEOUT", "10"))
+
+
+class GroupWriter:
+    def __init__(self, db_file, max_batch=WRITE_BATCH_SIZE, max_delay=WRITE_BATCH_DELAY):
+        self.db_file = db_file
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.jobs = 0
+        self._pending = deque()
+        self._pending_lock = threading.Lock()
+        self._writer = threading.Lock()
+        self._conn = None
+        self._lock_file = None
+
+    def depth(self):
+        return len(self._pending)
+
+    def run(self, fn, timeout=WRITE_TIMEOUT):
+        job = (fn, Future())
+        future = job[1]
+        with self._pending_lock:
+            self._pending.append(job)
+
+        deadline = time.monotonic() + timeout
+        while not future.done():
+            if not self._writer.acquire(timeout=max(0, deadline - time.monotonic())):
+                with self._pending_lock:
+                    try:
+                        self._pending.remove(job)
+                    except ValueError:
+                        # already taken by the current writer, it finishes soon
+                        return future.result()
+                raise sqlite3.OperationalError("database is locked")
+            try:
+                # an earlier writer may have committed this job while we waited
+                if not future.done():
+                    self._commit_pending()
+            finally:
+                self._writer.release()
+        return future.result()
+
+    def _commit_pending(self):
+        if self.max_delay:
+            time.sleep(self.max_delay)
+        with self._pending_lock:
+            batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+        if batch:
+            self._commit(batch)
+
+    def _lock_processes(self):
+        # the writers of all gunicorn workers take turns on a lock file next to the database.
+        # blocked ones are woken by the kernel as soon as it is free, sqlite's busy handler
+        # polls with growing sleeps instead, so under load one worker can miss its turn for seconds
+        if fcntl is None:
+            return False
+        if self._lock_file is None:
+            self._lock_file = open(self.db_file + "-writer", "a")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        return True
+
+    def _commit(self, batch):
+        # in a group every job gets a savepoint, a failing job is rolled back alone and
+        # the others still commit. only a failed BEGIN or COMMIT fails the whole group
+        grouped = len(batch) > 1
+        outcomes = []
+        conn = self._conn
+        locked = False
+        try:
+            if conn is None:
+                # untimed: a group runs in one request's thread but holds other requests' statements
+                conn = self._conn = connect(self.db_file, sqlite3.Connection)
+            locked = self._lock_processes()
+            # IMMEDIATE takes the write lock before any job reads, waiting out other
+            # processes through busy_timeout instead of failing on a stale read snapshot
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                cursor = conn.cursor()
+                try:
+                    if grouped:
+                        cursor.execute("SAVEPOINT job")
+                    outcomes.append((future, None, fn(cursor)))
+                    if grouped:
+                        cursor.execute("RELEASE job")
+                except Exception as e:
+                    if not grouped:
+                        raise
+                    cursor.execute("ROLLBACK TO job")
+                    cursor.execute("RELEASE job")
+                    outcomes.append((future, e, None))
+                finally:
+                    cursor.close()
+            conn.commit()
+        except Exception as e:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            if locked:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+        self.batches += 1
+        self.jobs += len(batch)
+        for future, error, result in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+_writers_pid = os.getpid()
+
+
+def _get_writer(db_file):
+    global _writers_pid
+
+    with _writers_lock:
+        # gunicorn forks workers, never share a writer connection across processes
+        if _writers_pid != os.getpid():
+            _writers.clear()
+            _writers_pid = os.getpid()
+
+        writer = _writers.get(db_file)
+        if writer is None:
+            writer = _writers[db_file] = GroupWriter(db_file)
+        return writer
+
+
+def write(db_file, fn):
+    # runs fn(cursor) in a write transaction and returns what it returns, exceptions
+    # raised by fn are raised here. fn must only use the cursor it is given: it may
+    # share the transaction with other requests' writes, so no commits and no get_cursor
+    if not WRITE_QUEUE:
+        with get_cursor(db_file) as cursor:
+            return fn(cursor)
+
+    started = time.perf_counter()
+    try:
+        return _get_writer(db_file).run(fn)
+    finally:
+        # the wait for the group counts as one statement in Server-Timing
+        record_query(f"-- write to {db_file}", time.perf_counter() - started)
+
+
+def stats():
+    with _writers_lock:
+        writers = list(_writers.values())
+    return {
+        "batches": sum(writer.batches for writer in writers),
+        "jobs": sum(writer.jobs for writer in writers),
+        "queued": sum(writer.depth() for writer in writers),
+    }